@@ -1,5 +1,5 @@
-from django.contrib import admin
-from .models import AvailableTimeSlot, Appointment, AppointmentPrice
+from django.contrib import admin, messages
+from .models import AvailableTimeSlot, Appointment, AppointmentPrice, AvailabilitySnapshot, DigestEvent, EmailEvent, EmailEventCount, EmailOutbox, ScheduleRule
 
 @admin.register(AvailableTimeSlot)
 class AvailableTimeSlotAdmin(admin.ModelAdmin):
@@ -8,12 +8,50 @@ class AvailableTimeSlotAdmin(admin.ModelAdmin):
     search_fields = ['psychologist__first_name', 'psychologist__last_name', 'psychologist__email']
     date_hierarchy = 'start_time'
 
+@admin.register(ScheduleRule)
+class ScheduleRuleAdmin(admin.ModelAdmin):
+    list_display = ['id', 'psychologist', 'weekdays', 'day_start', 'day_end', 'session_minutes', 'start_date', 'end_date']
+    list_filter = ['start_date']
+    search_fields = ['psychologist__first_name', 'psychologist__last_name', 'psychologist__email']
+
+    # Silinen kuralın alınmamış gelecek slotları da silinir (API ile aynı davranış)
+    def delete_model(self, request, obj):
+        from .scheduling import retract_schedule_rule
+        retract_schedule_rule(obj)
+
+    def delete_queryset(self, request, queryset):
+        from .scheduling import retract_schedule_rule
+        for rule in queryset:
+            retract_schedule_rule(rule)
+
+@admin.register(AvailabilitySnapshot)
+class AvailabilitySnapshotAdmin(admin.ModelAdmin):
+    # Özet otomatik güncellenir; elle düzenlenmez (bkz. rebuild_availability_snapshots komutu)
+    list_display = ['psychologist', 'next_available_at', 'updated_at']
+    readonly_fields = ['psychologist', 'free_slots', 'next_available_at', 'updated_at']
+
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
-    list_display = ['id', 'patient', 'time_slot', 'created_at']
-    list_filter = ['created_at']
+    list_display = ['id', 'patient', 'time_slot', 'status', 'created_at']
+    list_filter = ['status', 'created_at']
     search_fields = ['patient__first_name', 'patient__last_name', 'patient__email']
     date_hierarchy = 'created_at'
+    actions = ['cancel_selected']
+
+    @admin.action(description='Seçili randevuları iptal et (slotlar serbest bırakılır)')
+    def cancel_selected(self, request, queryset):
+        # Toplu iptal servisi: tek transaction, set-based UPDATE, tek parti email
+        # Geçmiş ve zaten iptal edilmiş randevular atlanır
+        from .cancellation_service import cancel_upcoming_appointments
+        cancelled_ids, skipped_ids = cancel_upcoming_appointments(queryset, cancelled_by_admin=True)
+        self.message_user(request, f"{len(cancelled_ids)} randevu iptal edildi.", messages.SUCCESS)
+        if skipped_ids:
+            self.message_user(
+                request, f"{len(skipped_ids)} randevu geçmişte veya zaten iptal edilmiş olduğu için atlandı.", messages.WARNING
+            )
 
 @admin.register(AppointmentPrice)
 class AppointmentPriceAdmin(admin.ModelAdmin):
@@ -29,3 +67,47 @@ class AppointmentPriceAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         # Fiyat ayari silinemesin (silinirse problem olur)
         return False
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    # Kuyruk 'send_outbox_emails' komutu tarafından işlenir; burada sadece izlenir
+    list_display = ['id', 'subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['subject']
+    readonly_fields = [field.name for field in EmailOutbox._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(DigestEvent)
+class DigestEventAdmin(admin.ModelAdmin):
+    # Olaylar 'send_psychologist_digests' komutu ile özet email'inde gönderilir; burada sadece izlenir
+    list_display = ['id', 'psychologist', 'kind', 'created_at', 'sent_at']
+    list_filter = ['kind', 'sent_at']
+    search_fields = ['psychologist__email']
+    readonly_fields = [field.name for field in DigestEvent._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(EmailEvent)
+class EmailEventAdmin(admin.ModelAdmin):
+    # SendGrid event webhook'u ile eklenir, değiştirilmez (bkz. appointments/email_events.py)
+    list_display = ['id', 'email', 'event', 'timestamp', 'reason']
+    list_filter = ['event']
+    search_fields = ['email', 'sg_message_id']
+    readonly_fields = [field.name for field in EmailEvent._meta.fields]
+    show_full_result_count = False  # Büyük tabloda COUNT(*) yapılmasın
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(EmailEventCount)
+class EmailEventCountAdmin(admin.ModelAdmin):
+    list_display = ['email', 'event', 'count', 'last_event_at']
+    list_filter = ['event']
+    search_fields = ['email']
+    readonly_fields = [field.name for field in EmailEventCount._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
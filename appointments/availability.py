@@ -0,0 +1,188 @@
+"""
+Sanal müsaitlik motoru (SLOT_ENGINE = 'virtual')
+
+Müsait zamanlar AvailableTimeSlot satırı olarak saklanmaz; ScheduleRule'ların
+ürettiği çalışma saatlerinden, dolu (randevu alınmış) slotlar çıkarılarak
+anlık hesaplanır. Satır sadece randevu alındığı anda oluşturulur
+(bkz. materialize_virtual_slot). Böylece slot tablosu sunulan kapasiteyle
+değil, alınan randevu sayısıyla orantılı büyür.
+"""
+import heapq
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import AvailableTimeSlot, ScheduleRule
+from .scheduling import iter_rule_intervals, slot_has_overlap
+
+
+class SlotUnavailableError(Exception):
+    """İstenen sanal slot sunulmuyor veya dolu"""
+
+
+class FreeSlot(NamedTuple):
+    id: Optional[int]          # Sanal slotlarda None
+    psychologist: int
+    start_time: object
+    end_time: object
+    is_booked: bool = False
+    virtual: bool = True
+
+
+def is_virtual_engine():
+    return getattr(settings, 'SLOT_ENGINE', 'materialized') == 'virtual'
+
+
+def _subtract(offered, busy):
+    """
+    Sıralı 'offered' akışından, sıralı 'busy' aralıklarıyla kesişenleri çıkarır.
+    Aynı psikoloğun birden fazla kuralı örtüşüyorsa tekrar eden aralıklar da atlanır.
+    """
+    index = 0
+    last_end = None
+    for start, end in offered:
+        while index < len(busy) and busy[index][1] <= start:
+            index += 1
+        if index < len(busy) and busy[index][0] < end:
+            continue
+        if last_end is not None and start < last_end:
+            continue
+        last_end = end
+        yield start, end
+
+
+def _rules_for_window(window_start, window_end, psychologist_id=None):
+    # Saat dilimi farkları için pencereyi bir gün genişlet
+    rules = ScheduleRule.objects.filter(
+        start_date__lte=(window_end + timedelta(days=1)).date(),
+        end_date__gte=(window_start - timedelta(days=1)).date(),
+    )
+    if psychologist_id is not None:
+        rules = rules.filter(psychologist_id=psychologist_id)
+    return rules
+
+
+def iter_free_slots(window_start, window_end, psychologist_id=None):
+    """
+    Pencere içindeki müsait zamanları başlangıç zamanına göre sıralı FreeSlot olarak üretir:
+    (kuralların ürettiği aralıklar - pencereyle kesişen tüm slotlar) + boş gerçek slotlar.
+    İki sorgu atılır: kurallar ve pencereyle kesişen slotlar.
+    """
+    rules_by_psychologist = defaultdict(list)
+    for rule in _rules_for_window(window_start, window_end, psychologist_id):
+        rules_by_psychologist[rule.psychologist_id].append(rule)
+
+    slots = AvailableTimeSlot.objects.filter(end_time__gt=window_start, start_time__lt=window_end)
+    if psychologist_id is not None:
+        slots = slots.filter(psychologist_id=psychologist_id)
+
+    busy_by_psychologist = defaultdict(list)
+    real_free = []
+    for slot_id, slot_psychologist_id, start, end, is_booked in slots.order_by('start_time').values_list(
+        'id', 'psychologist_id', 'start_time', 'end_time', 'is_booked'
+    ):
+        # Gerçek slotların hepsi (dolu veya boş) sanal aralıkları kapatır
+        busy_by_psychologist[slot_psychologist_id].append((start, end))
+        if not is_booked and start >= window_start:
+            real_free.append(FreeSlot(slot_id, slot_psychologist_id, start, end, False, False))
+
+    streams = [real_free]
+    for rule_psychologist_id, rules in rules_by_psychologist.items():
+        offered = heapq.merge(*(iter_rule_intervals(rule, window_start, window_end) for rule in rules))
+        free = _subtract(offered, busy_by_psychologist[rule_psychologist_id])
+        streams.append(
+            FreeSlot(None, rule_psychologist_id, start, end)
+            for start, end in free
+            if start >= window_start
+        )
+
+    return heapq.merge(*streams, key=lambda slot: (slot.start_time, slot.psychologist))
+
+
+def default_window():
+    """Varsayılan pencere: şimdiden VIRTUAL_SLOT_HORIZON_DAYS gün sonrasına"""
+    now = timezone.now()
+    return now, now + timedelta(days=getattr(settings, 'VIRTUAL_SLOT_HORIZON_DAYS', 30))
+
+
+def _is_offered(psychologist_id, start_time, end_time):
+    """Verilen aralık psikoloğun kurallarından biri tarafından tam olarak sunuluyor mu?"""
+    for rule in _rules_for_window(start_time, end_time, psychologist_id):
+        for start, end in iter_rule_intervals(rule, start_time, end_time):
+            if start == start_time and end == end_time:
+                return True
+    return False
+
+
+def materialize_virtual_slot(psychologist_id, start_time, end_time):
+    """
+    Sanal slotu randevu anında dolu (is_booked=True) bir AvailableTimeSlot satırına dönüştürür.
+    Çağıran transaction.atomic() içinde olmalıdır. Çakışma kontrolü manuel slot
+    oluşturma ile aynıdır (PostgreSQL: EXCLUDE constraint, diğerleri: kayıt sonrası kontrol),
+    bu yüzden aynı sanal slotu eşzamanlı alan iki hastadan sadece biri başarılı olur.
+    """
+    if start_time <= timezone.now():
+        raise SlotUnavailableError("Geçmiş bir zaman için randevu alınamaz.")
+    if not _is_offered(psychologist_id, start_time, end_time):
+        raise SlotUnavailableError("Bu zaman aralığı psikoloğun çalışma saatleri içinde sunulmuyor.")
+
+    try:
+        with transaction.atomic():
+            slot = AvailableTimeSlot.objects.create(
+                psychologist_id=psychologist_id,
+                start_time=start_time,
+                end_time=end_time,
+                is_booked=True,
+            )
+            if slot_has_overlap(slot):
+                raise SlotUnavailableError("Bu zaman slotu zaten dolu. Lütfen başka bir slot seçin.")
+    except IntegrityError:
+        raise SlotUnavailableError("Bu zaman slotu zaten dolu. Lütfen başka bir slot seçin.")
+    return slot
+
+
+# Takvim bitmap'inde bir bitin temsil ettiği süre
+BITMAP_UNIT_MINUTES = 15
+BITMAP_UNITS_PER_DAY = 24 * 60 // BITMAP_UNIT_MINUTES
+
+
+def _free_intervals(window_start, window_end, psychologist_id=None):
+    """Pencereyle kesişen müsait aralıklar (motorlardan bağımsız)"""
+    if is_virtual_engine():
+        return ((slot.start_time, slot.end_time) for slot in iter_free_slots(window_start, window_end, psychologist_id))
+    slots = AvailableTimeSlot.objects.filter(is_booked=False, end_time__gt=window_start, start_time__lt=window_end)
+    if psychologist_id is not None:
+        slots = slots.filter(psychologist_id=psychologist_id)
+    return slots.values_list('start_time', 'end_time').iterator()
+
+
+def availability_bitmap(start_date, end_date, tz, psychologist_id=None):
+    """
+    start_date..end_date (dahil) günleri için müsaitlik bitmask'leri (gün başına bir int).
+    Bit k (en anlamlı bitten başlayarak), o günün yerel gece yarısından itibaren k. 15 dakikalık
+    dilimin TAMAMEN bir boş slot içinde olduğunu gösterir. Slotlar tek aralık sorgusuyla okunur.
+    """
+    day_count = (end_date - start_date).days + 1
+    midnights = [
+        datetime.combine(start_date + timedelta(days=i), time.min, tzinfo=tz)
+        for i in range(day_count + 1)
+    ]
+    unit = timedelta(minutes=BITMAP_UNIT_MINUTES)
+    masks = [0] * day_count
+
+    for start, end in _free_intervals(midnights[0], midnights[-1], psychologist_id):
+        for day in range(max(0, bisect_right(midnights, start) - 1), day_count):
+            day_start, day_end = midnights[day], midnights[day + 1]
+            if end <= day_start:
+                break
+            # Dilimin tamamı slot içinde olmalı: başlangıç yukarı, bitiş aşağı yuvarlanır
+            first = max(0, -((day_start - start) // unit))
+            last = min(BITMAP_UNITS_PER_DAY, (min(end, day_end) - day_start) // unit)
+            for k in range(first, last):
+                masks[day] |= 1 << (BITMAP_UNITS_PER_DAY - 1 - k)
+    return masks
@@ -0,0 +1,114 @@
+"""
+Randevu alma servisi
+
+Randevu oluşturmanın tüm yan etkileri view'dan açıkça çağrılan tek bir yerde toplanır:
+slot rezervasyonu, randevu ve ödeme kaydı tek transaction içinde, bilinen sayıda sorgu ile
+yazılır; email bildirimleri commit'ten sonra gönderilir (randevu geri alınırsa email gitmez)
+ya da EMAIL_DELIVERY='outbox' ise aynı transaction'da kuyruğa yazılır (bkz. email_service.schedule_notification).
+
+Sorgu bütçesi (materialized motor, saatlik ücret önbellekte):
+  1. UPDATE slot (koşullu rezervasyon)
+  2. SELECT slot + psikolog
+  3. INSERT randevu
+  4. INSERT ödeme
+(+ transaction/savepoint komutları). Sayı randevu/slot sayısından bağımsızdır
+(bkz. tests.BookingServiceTests). Müsaitlik özeti transaction içinde kilitlenmez,
+commit'ten sonra güncellenir (bkz. snapshots.slots_changed).
+
+Eski davranış (post_save signal'inin ödeme kaydı oluşturup email göndermesi)
+BOOKING_SIGNAL_SIDE_EFFECTS=True ile açılabilir; bu durumda servis ödeme ve
+bildirim adımlarını signal'e bırakır.
+"""
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .availability import SlotUnavailableError, materialize_virtual_slot
+from .email_service import schedule_notification, send_appointment_created_email
+from .models import Appointment, AvailableTimeSlot
+from .snapshots import slots_changed
+
+logger = logging.getLogger(__name__)
+
+SLOT_TAKEN_MESSAGE = "Bu zaman slotu zaten dolu. Lütfen başka bir slot seçin."
+
+
+def signal_side_effects_enabled():
+    """Randevu post_save signal'i ödeme kaydı ve email işini hâlâ yapıyor mu?"""
+    return getattr(settings, 'BOOKING_SIGNAL_SIDE_EFFECTS', False)
+
+
+def claim_slot(time_slot_id):
+    """
+    Slotu tek bir koşullu UPDATE ile rezerve eder (compare-and-set):
+    UPDATE ... SET is_booked=true WHERE id=? AND is_booked=false
+    Eşzamanlı iki istekten sadece birinin UPDATE'i satır etkiler, diğeri
+    SlotUnavailableError alır. Çağıran transaction.atomic() içinde olmalıdır.
+    """
+    claimed = AvailableTimeSlot.objects.filter(id=time_slot_id, is_booked=False).update(is_booked=True)
+    if not claimed:
+        # Hangi hatanın döneceğini belirlemek için slotun varlığını kontrol et
+        if AvailableTimeSlot.objects.filter(id=time_slot_id).exists():
+            raise SlotUnavailableError(SLOT_TAKEN_MESSAGE)
+        raise SlotUnavailableError("Geçersiz zaman slotu ID'si. Belirtilen slot bulunamadı.")
+    # Email servisi psikoloğu kullandığı için birlikte getir
+    slot = AvailableTimeSlot.objects.select_related('psychologist').get(id=time_slot_id)
+    # Koşullu UPDATE signal tetiklemez; slot commit'ten sonra müsaitlik özetinden çıkarılır
+    slots_changed(slot.psychologist_id, [slot])
+    return slot
+
+
+class BookingService:
+    """
+    Hasta adına randevu oluşturur.
+
+    Kullanım:
+        appointment = BookingService(patient).book(time_slot_id=12, notes="...")
+        appointment = BookingService(patient).book(psychologist_id=3, start_time=..., end_time=...)  # sanal motor
+
+    Slot alınamazsa SlotUnavailableError fırlatılır ve hiçbir şey yazılmaz.
+    """
+
+    def __init__(self, patient):
+        self.patient = patient
+
+    def book(self, time_slot_id=None, psychologist_id=None, start_time=None, end_time=None, notes=None):
+        with_side_effects = not signal_side_effects_enabled()
+        try:
+            with transaction.atomic():
+                if time_slot_id is None:
+                    # Sanal slot: satır randevu anında oluşturulur (bkz. appointments/availability.py)
+                    slot = materialize_virtual_slot(psychologist_id, start_time, end_time)
+                else:
+                    slot = claim_slot(time_slot_id)
+
+                # save() fiyatı ve ödeme son tarihini bellekte hesaplar (bkz. Appointment.save)
+                appointment = Appointment(
+                    patient=self.patient,
+                    time_slot=slot,
+                    status='pending_payment',
+                    notes=notes,
+                )
+                appointment.save()
+
+                if with_side_effects:
+                    self._create_payment(appointment)
+                    schedule_notification(lambda: send_appointment_created_email(appointment))
+        except IntegrityError:
+            # Slotta hâlâ aktif bir randevu kaydı var (appt_active_slot_uniq) - transaction geri alındı
+            raise SlotUnavailableError(SLOT_TAKEN_MESSAGE)
+
+        logger.info(f"Randevu olusturuldu - ID: {appointment.id}, Slot: {slot.id}")
+        return appointment
+
+    def _create_payment(self, appointment):
+        from payments.models import Payment
+        # OneToOne ataması appointment.payment önbelleğini de doldurur; yanıt için ek sorgu gerekmez
+        return Payment.objects.create(
+            appointment=appointment,
+            patient=self.patient,
+            amount=appointment.price,
+            currency='TRY',
+            status='pending',
+        )
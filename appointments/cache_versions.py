@@ -0,0 +1,74 @@
+"""
+Paylaşılan sürüm sayaçları
+
+Süreç içi (process-local) önbelleklerin, diğer gunicorn worker'larında yapılan
+değişiklikleri fark etmesi için kullanılır. Sayaçlar Django cache'inde tutulur:
+REDIS_URL tanımlıysa tüm worker'lar aynı sayacı görür; tanımlı değilse
+LocMemCache kullanılır ve sayaç sadece o süreç içinde geçerlidir. Sayaçlara
+güvenen kodlar bu durumu versions_shared() ile kontrol eder.
+
+Her sayacın yanında son artırılma zamanı da tutulur (HTTP Last-Modified için).
+"""
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+KEY_PREFIX = 'version:'
+MODIFIED_KEY_PREFIX = 'modified:'
+
+
+def _key(name):
+    return f'{KEY_PREFIX}{name}'
+
+
+def _modified_key(name):
+    return f'{MODIFIED_KEY_PREFIX}{name}'
+
+
+def versions_shared():
+    """Sayaçlar tüm worker süreçlerinde aynı mı? (LocMemCache / DummyCache süreç içidir)"""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def get_version(name):
+    """Sayacın güncel değerini döndürür (yoksa 1 ile başlatır)"""
+    version = cache.get(_key(name))
+    if version is None:
+        cache.add(_key(name), 1, timeout=None)
+        version = cache.get(_key(name), 1)
+    return version
+
+
+def bump_version(name):
+    """Sayacı atomik olarak bir artırır ve yeni değeri döndürür"""
+    try:
+        version = cache.incr(_key(name))
+    except ValueError:
+        # Anahtar henüz yok (veya cache temizlenmiş)
+        cache.add(_key(name), 1, timeout=None)
+        version = cache.incr(_key(name))
+    cache.set(_modified_key(name), time.time(), timeout=None)
+    return version
+
+
+def get_versions(*names):
+    """
+    Birden fazla sayacın {isim: (sürüm, son değişiklik zamanı)} değerleri.
+    Tek cache okuması (get_many) yapılır; hiç artırılmamış sayaçlar başlatılır.
+    """
+    keys = [key for name in names for key in (_key(name), _modified_key(name))]
+    values = cache.get_many(keys)
+    result = {}
+    for name in names:
+        version = values.get(_key(name))
+        modified = values.get(_modified_key(name))
+        if version is None:
+            version = get_version(name)
+        if modified is None:
+            # Bilinmiyorsa şimdiki zaman kabul edilir (istemci bir kez tam cevap alır)
+            modified = time.time()
+            cache.add(_modified_key(name), modified, timeout=None)
+        result[name] = (version, modified)
+    return result
@@ -0,0 +1,143 @@
+"""
+Toplu randevu iptali
+
+Randevular satır satır yüklenip kaydedilmez: randevu, slot ve ödeme durumları
+tek transaction içinde set-based UPDATE'lerle değiştirilir, email'ler commit'ten
+sonra tek partide gönderilir. Kullanıldığı yerler:
+- Süresi dolan ödeme bekletmeleri (release_expired_holds komutu)
+- Toplu iptal (POST /api/v1/appointments/bulk-cancel/ ve admin paneli aksiyonu; sadece gelecekteki randevular)
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache_versions import bump_version
+from .conditional import SLOTS_RESOURCE
+from .email_service import schedule_notification, send_appointments_cancelled_emails
+from .models import Appointment, AvailableTimeSlot
+from .snapshots import slots_changed
+
+logger = logging.getLogger(__name__)
+
+# Bir transaction'da serbest bırakılacak en fazla ödeme bekletmesi
+HOLD_RELEASE_BATCH_SIZE = 500
+
+
+def _lock_for_update(queryset, skip_locked=False):
+    """Sadece randevu satırlarını kilitle (JOIN edilen slot/ödeme satırları değil)"""
+    features = connection.features
+    return queryset.select_for_update(
+        skip_locked=skip_locked and features.has_select_for_update_skip_locked,
+        of=('self',) if features.has_select_for_update_of else (),
+    )
+
+
+def _notify_cancelled(appointment_ids, cancelled_by_admin=False, hold_expired=False):
+    """İptal email'leri: tek sorgu ile yükle, tek partide gönder"""
+    appointments = Appointment.objects.filter(id__in=appointment_ids).select_related('patient', 'time_slot__psychologist')
+    send_appointments_cancelled_emails(list(appointments), cancelled_by_admin=cancelled_by_admin, hold_expired=hold_expired)
+
+
+def cancel_locked_rows(rows, now=None, cancelled_by_admin=False, hold_expired=False):
+    """
+    Kilitlenmiş randevu satırlarını iptal eder. Çağıran transaction.atomic() içinde olmalıdır.
+    rows: [(appointment_id, time_slot_id, psychologist_id, slot_start, slot_end), ...]
+    - Randevular: status='cancelled' (tek UPDATE)
+    - Ödemeler: tamamlanmamış/iade edilmemiş olanlar 'cancelled' (tek UPDATE)
+    - Slotlar: seansı henüz başlamamış olanlar tekrar müsait (tek UPDATE) + müsaitlik özeti
+    - Email'ler: commit'ten sonra tek parti (outbox modunda aynı transaction'da kuyruğa)
+    İptal edilen randevu ID'lerini döndürür.
+    """
+    from payments.models import Payment
+
+    now = now or timezone.now()
+    appointment_ids = [row[0] for row in rows]
+    if not appointment_ids:
+        return []
+
+    Appointment.objects.filter(id__in=appointment_ids).update(status='cancelled')
+    Payment.objects.filter(appointment_id__in=appointment_ids).exclude(
+        status__in=['completed', 'refunded']
+    ).update(status='cancelled', updated_at=now)
+
+    # Geçmiş randevuların slotu değiştirilmez (perform_destroy ile aynı kural)
+    freed = [row for row in rows if row[3] > now]
+    AvailableTimeSlot.objects.filter(id__in=[row[1] for row in freed]).update(is_booked=False)
+    freed_by_psychologist = defaultdict(list)
+    for _, slot_id, psychologist_id, start_time, end_time in freed:
+        freed_by_psychologist[psychologist_id].append((slot_id, start_time, end_time))
+    # Toplu UPDATE signal tetiklemez: müsaitlik özetini ve slot sürümünü (ETag) elle güncelle
+    for psychologist_id, slots in freed_by_psychologist.items():
+        slots_changed(psychologist_id, slots)
+    transaction.on_commit(lambda: bump_version(SLOTS_RESOURCE))
+
+    schedule_notification(
+        lambda: _notify_cancelled(appointment_ids, cancelled_by_admin=cancelled_by_admin, hold_expired=hold_expired)
+    )
+    return appointment_ids
+
+
+ROW_FIELDS = ('id', 'time_slot_id', 'time_slot__psychologist_id', 'time_slot__start_time', 'time_slot__end_time')
+
+
+def cancel_appointments(queryset, cancelled_by_admin=True):
+    """
+    Verilen randevu sorgusundaki iptal edilmemiş randevuları tek transaction'da iptal eder.
+    İptal edilen randevu ID'lerini döndürür.
+    """
+    with transaction.atomic():
+        rows = list(_lock_for_update(queryset.exclude(status='cancelled')).values_list(*ROW_FIELDS))
+        return cancel_locked_rows(rows, cancelled_by_admin=cancelled_by_admin)
+
+
+def cancel_upcoming_appointments(queryset, cancelled_by_admin=True, now=None):
+    """
+    Toplu iptal (API ve admin aksiyonu): sadece seansı henüz başlamamış randevular iptal edilir.
+    Geçmiş/tamamlanmış (ödenmiş ve seansı geçmiş) ve zaten iptal edilmiş randevulara dokunulmaz.
+    (iptal edilen, atlanan) randevu ID listelerini döndürür.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        cancelled_ids = cancel_appointments(queryset.filter(time_slot__start_time__gt=now), cancelled_by_admin)
+        skipped_ids = sorted(set(queryset.values_list('id', flat=True)) - set(cancelled_ids))
+    return cancelled_ids, skipped_ids
+
+
+def expired_holds(now=None):
+    """
+    Ödeme süresi dolmuş bekletmeler ('appt_hold_expiry_idx' kısmi indeksi).
+    Ödemesi tamamlanmış veya iyzico formu yakın zamanda açılmış (processing) randevular hariç.
+    """
+    now = now or timezone.now()
+    grace = timedelta(minutes=getattr(settings, 'PAYMENT_PROCESSING_GRACE_MINUTES', 30))
+    return (
+        Appointment.objects
+        .filter(status='pending_payment', hold_expires_at__lte=now)
+        .exclude(payment__status='completed')
+        .exclude(payment__status='processing', payment__updated_at__gt=now - grace)
+        .order_by('hold_expires_at', 'id')
+    )
+
+
+def release_expired_holds(batch_size=HOLD_RELEASE_BATCH_SIZE, now=None):
+    """
+    Süresi dolan ödeme bekletmelerini partiler halinde serbest bırakır.
+    Her parti ayrı bir transaction'dır; PostgreSQL'de kilitli satırlar atlanır (SKIP LOCKED),
+    böylece birden fazla sweeper veya eşzamanlı ödeme callback'i birbirini beklemez.
+    Serbest bırakılan randevu sayısını döndürür.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = list(_lock_for_update(expired_holds(now), skip_locked=True).values_list(*ROW_FIELDS)[:batch_size])
+            cancel_locked_rows(rows, now=now, hold_expired=True)
+        released += len(rows)
+        if rows:
+            logger.info(f"⏰ {len(rows)} ödeme bekletmesi serbest bırakıldı")
+        if len(rows) < batch_size:
+            return released
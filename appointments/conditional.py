@@ -0,0 +1,78 @@
+"""
+Koşullu GET (ETag / Last-Modified) desteği
+
+Sık sorgulanan okuma endpoint'leri (slot listesi, fiyat ayarı) için cevap,
+ilgili kaynakların sürüm sayaçlarından türetilen bir ETag ile işaretlenir.
+İstemci If-None-Match / If-Modified-Since gönderirse ve sürüm değişmediyse,
+ORM'e veya serializer'lara hiç dokunulmadan 304 döner (tek cache okuması).
+
+Sayaçlar signals.py'de ilgili modeller kaydedildiğinde/silindiğinde,
+transaction commit edildikten sonra artırılır.
+
+Koşullu cevaplar sadece sayaçlar tüm worker'larca paylaşılıyorsa (REDIS_URL) verilir.
+LocMemCache'te bir worker'daki değişiklik diğerlerinin sayacını artırmaz; eski ETag ile
+304 dönülmemesi için ETag üretilmez ve view her istekte normal çalışır.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .cache_versions import get_versions, versions_shared
+from .pricing import VERSION_NAME as PRICE_RESOURCE
+
+# Müsait slotlar (slot, randevu ve çalışma kuralı değişikliklerinden etkilenir)
+SLOTS_RESOURCE = 'slots'
+
+# Zaman penceresi 'şimdi'ye bağlı olan cevaplarda (varsayılan from=now) ETag'e eklenen süre dilimi
+TIME_BUCKET_SECONDS = 60
+
+
+def _resource_state(request, names, time_bucket):
+    """Sürüm bilgisi istek başına bir kez okunur (ETag ve Last-Modified aynı değeri kullanır)"""
+    cache_attr = '_resource_versions'
+    state = getattr(request, cache_attr, None)
+    if state is None:
+        versions = get_versions(*names)
+        modified = max(modified for _, modified in versions.values())
+        parts = [f'{name}:{version}' for name, (version, _) in sorted(versions.items())]
+        if time_bucket:
+            bucket = int(time.time() // TIME_BUCKET_SECONDS)
+            parts.append(f'bucket:{bucket}')
+            modified = max(modified, bucket * TIME_BUCKET_SECONDS)
+        # Aynı sürümde farklı query parametreleri farklı cevap üretir
+        parts.append(request.get_full_path())
+        etag = hashlib.md5('|'.join(parts).encode()).hexdigest()
+        state = (etag, modified)
+        setattr(request, cache_attr, state)
+    return state
+
+
+def versioned_condition(*names, time_bucket=False):
+    """
+    ViewSet metodları için koşullu GET dekoratörü.
+    Örnek: @versioned_condition(SLOTS_RESOURCE, time_bucket=True)
+    """
+    def etag_func(request, *args, **kwargs):
+        return _resource_state(request, names, time_bucket)[0]
+
+    def last_modified_func(request, *args, **kwargs):
+        modified = _resource_state(request, names, time_bucket)[1]
+        return datetime.fromtimestamp(modified, tz=timezone.utc)
+
+    conditional = condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+    def decorator(view_func):
+        conditional_view = conditional(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not versions_shared():
+                return view_func(request, *args, **kwargs)
+            return conditional_view(request, *args, **kwargs)
+        return wrapper
+
+    return method_decorator(decorator)
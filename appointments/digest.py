@@ -0,0 +1,124 @@
+"""
+Psikolog özet (digest) email'leri
+
+Özet modunu açan psikologlar (CustomUser.email_digest=True) her randevu, iptal, taşıma ve
+ödeme için ayrı email almaz. email_service psikolog email'ini hazırlamak yerine olayı
+DigestEvent tablosuna yazar (render ve API çağrısı yok). 'send_psychologist_digests'
+komutu her PSYCHOLOGIST_DIGEST_MINUTES dakikada bir:
+
+1. Gönderilmemiş olayları psikologlarıyla birlikte tek sorguda alır (psikoloğa göre sıralı)
+   ve tek UPDATE ile sent_at yazarak işaretler (PostgreSQL'de SKIP LOCKED).
+2. Psikolog başına tek özet email'i hazırlar ve hepsini tek gönderimde yollar:
+   - EMAIL_DELIVERY='outbox': email'ler işaretleme ile aynı transaction'da outbox'a yazılır.
+   - Diğer modlar: tek email bağlantısıyla gönderilir; gönderilemeyen özetlerin olayları
+     tek UPDATE ile geri alınır ve sonraki çalıştırmada tekrar denenir.
+"""
+import logging
+from itertools import groupby
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import DigestEvent
+from .notifications import render_message
+
+logger = logging.getLogger(__name__)
+
+
+def digest_enabled(psychologist):
+    """Psikolog bildirimlerini özet olarak mı alıyor?"""
+    return getattr(psychologist, 'email_digest', False)
+
+
+def digest_event(kind, ctx, **details):
+    """Olayı kaydedilmek üzere hazırlar (kaydetmez). ctx: NotificationContext"""
+    return DigestEvent(
+        psychologist=ctx.psychologist,
+        kind=kind,
+        details={
+            'patient_name': ctx.patient_name,
+            'patient_email': ctx.patient.email,
+            'patient_phone': ctx.patient.phone_number or 'Belirtilmemiş',
+            'appointment_datetime': ctx.appointment_datetime,
+            **details,
+        },
+    )
+
+
+def record_events(events):
+    """Hazırlanan olayları tek INSERT ile yazar. Çağıranın transaction'ında çalışır."""
+    if not events:
+        return
+    # Savepoint: yazma hatası çağıranın transaction'ını bozmasın
+    with transaction.atomic():
+        DigestEvent.objects.bulk_create(events)
+    logger.info(f"🗂️ {len(events)} bildirim psikolog ozetine eklendi")
+
+
+def pending_events():
+    """Gönderilmemiş olaylar, psikoloğa göre gruplanmış sırada ('digest_pending_idx')"""
+    return (
+        DigestEvent.objects
+        .filter(sent_at__isnull=True)
+        .select_related('psychologist')
+        .order_by('psychologist_id', 'created_at', 'id')
+    )
+
+
+def render_digest(psychologist, events):
+    kinds = dict(DigestEvent.KIND_CHOICES)
+    counts = {}
+    for event in events:
+        counts[event.kind] = counts.get(event.kind, 0) + 1
+    context = {
+        'psychologist_name': psychologist.first_name or psychologist.email,
+        'event_count': len(events),
+        'counts': [(kinds[kind], count) for kind, count in counts.items()],
+        'events': [{'kind': event.kind, 'label': kinds[event.kind], **event.details} for event in events],
+    }
+    return render_message(
+        'psychologist_digest',
+        f'Randevu Özeti - {len(events)} yeni bildirim',
+        context,
+        psychologist.email,
+    )
+
+
+def flush_digests(now=None):
+    """
+    Biriken olayları psikolog başına tek özet email'i olarak gönderir.
+    (gönderilen özet email'i, özetlenen olay) sayılarını döndürür.
+    """
+    from .outbox import enqueue_messages, send_each
+
+    now = now or timezone.now()
+    outbox_mode = getattr(settings, 'EMAIL_DELIVERY', 'thread') == 'outbox'
+    with transaction.atomic():
+        events = pending_events()
+        if connection.features.has_select_for_update_skip_locked:
+            events = events.select_for_update(skip_locked=True, of=('self',))
+        events = list(events)
+        if not events:
+            return 0, 0
+        DigestEvent.objects.filter(id__in=[event.id for event in events]).update(sent_at=now)
+
+        digests = []  # (mesaj, olay id'leri)
+        for _, group in groupby(events, key=lambda event: event.psychologist_id):
+            group = list(group)
+            psychologist = group[0].psychologist
+            if psychologist.email:
+                digests.append((render_digest(psychologist, group), [event.id for event in group]))
+        if outbox_mode and digests:
+            enqueue_messages([message for message, _ in digests])
+    if outbox_mode or not digests:
+        return len(digests), len(events)
+
+    ids_by_message = {id(message): ids for message, ids in digests}
+    failed = [ids_by_message[id(message)] for message, error in send_each([message for message, _ in digests]) if error]
+    failed_ids = [event_id for ids in failed for event_id in ids]
+    if failed_ids:
+        # Gönderilemeyen özetlerin olayları sonraki çalıştırmada tekrar denenir
+        DigestEvent.objects.filter(id__in=failed_ids, sent_at=now).update(sent_at=None)
+        logger.warning(f"⚠️ {len(failed)} ozet email'i gonderilemedi, sonraki calistirmada tekrar denenecek")
+    return len(digests) - len(failed), len(events) - len(failed_ids)
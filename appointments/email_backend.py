@@ -1,96 +1,226 @@
 """
 SendGrid Email Backend - Django email gönderimi için custom backend
 Render'da SMTP portu bloklu olduğu için SendGrid API kullanıyoruz
+
+İstekler SendGrid v3 /mail/send endpoint'ine doğrudan gönderilir:
+- Her thread kendi kalıcı (keep-alive) HTTPS bağlantısını kullanır; bağlantı email başına
+  yeniden kurulmaz (sendgrid kütüphanesinin urllib istemcisi her istekte yeni bağlantı açar).
+- Aynı içeriğe (gönderen, konu, metin, HTML) sahip mesajlar tek istekte, alıcı başına bir
+  'personalization' ile gönderilir (istek başına en fazla SENDGRID_MAX_PERSONALIZATIONS).
+  Mesajda 'substitutions' sözlüğü varsa alıcıya özel yer tutucular olarak eklenir; böylece
+  aynı şablondan üretilen kişisel email'ler de tek istekte gönderilebilir.
+- SENDGRID_API_HOST ile farklı bir sunucu (ör. yerel test sunucusu) kullanılabilir.
 """
+import http.client
+import json
 import logging
+import threading
+from urllib.parse import urlsplit
+
 from django.core.mail.backends.base import BaseEmailBackend
 from django.conf import settings
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
 
 logger = logging.getLogger(__name__)
 
+SENDGRID_API_HOST = 'https://api.sendgrid.com'
+SENDGRID_SEND_PATH = '/v3/mail/send'
+# SendGrid v3 API sınırı: istek başına en fazla 1000 personalization
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+
+
+class SendGridTransport:
+    """
+    SendGrid API'ye kalıcı bağlantı. http.client bağlantıları thread-safe olmadığı için
+    her thread kendi örneğini kullanır (bkz. get_transport).
+    """
+
+    def __init__(self, api_key, host=SENDGRID_API_HOST, timeout=10):
+        parts = urlsplit(host if '://' in host else f'https://{host}')
+        self.api_key = api_key
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._connection = None
+        self.requests = 0  # Gönderilen HTTP isteği sayısı
+        self.connects = 0  # Açılan TCP/TLS bağlantısı sayısı
+
+    def _connect(self):
+        connection_class = http.client.HTTPConnection if self.scheme == 'http' else http.client.HTTPSConnection
+        self._connection = connection_class(self.netloc, timeout=self.timeout)
+        self.connects += 1
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def post(self, path, payload):
+        """JSON gövdeyi POST eder, (status, yanıt gövdesi) döndürür"""
+        body = json.dumps(payload).encode('utf-8')
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive',
+        }
+        # Sunucu boşta kalan bağlantıyı kapatmış olabilir: istek yeniden kullanılan bağlantıya
+        # yazılamadıysa bir kez yeni bağlantıyla denenir. İstek gönderildikten sonraki hatalar
+        # (ör. yanıt okunurken RemoteDisconnected) tekrar denenmez: SendGrid isteği kabul etmiş
+        # olabilir, tekrar göndermek email'leri iki kez gönderir. Bu hatalar çağırana (outbox,
+        # hatırlatma işi) bildirilir.
+        for attempt in range(2):
+            reused = self._connection is not None
+            connection = self._connection or self._connect()
+            try:
+                connection.request('POST', self.base_path + path, body=body, headers=headers)
+            except (http.client.CannotSendRequest, ConnectionError) as e:
+                self.close()
+                if attempt or not reused:
+                    raise
+                logger.info(f"SendGrid baglantisi yenileniyor: {str(e)}")
+                continue
+            except Exception:
+                self.close()
+                raise
+            try:
+                response = connection.getresponse()
+                response_body = response.read()
+            except Exception:
+                self.close()
+                raise
+            self.requests += 1
+            if response.will_close:
+                self.close()
+            return response.status, response_body
+
+
+_local = threading.local()
+
+
+def get_transport(api_key, host=None):
+    """Thread başına tek SendGrid bağlantısı (süreç boyunca yeniden kullanılır)"""
+    host = host or getattr(settings, 'SENDGRID_API_HOST', SENDGRID_API_HOST)
+    transports = getattr(_local, 'transports', None)
+    if transports is None:
+        transports = _local.transports = {}
+    transport = transports.get((host, api_key))
+    if transport is None:
+        transport = transports[(host, api_key)] = SendGridTransport(api_key, host)
+    return transport
+
+
+def _html_body(email_message):
+    # Eğer html_message parametresi varsa onu kullan
+    if getattr(email_message, 'html_message', None):
+        return email_message.html_message
+    for content, mimetype in getattr(email_message, 'alternatives', None) or []:
+        if mimetype == 'text/html':
+            return content
+    return None
+
+
+def _personalization(email_message):
+    personalization = {'to': [{'email': email} for email in email_message.to]}
+    if email_message.cc:
+        personalization['cc'] = [{'email': email} for email in email_message.cc]
+    if email_message.bcc:
+        personalization['bcc'] = [{'email': email} for email in email_message.bcc]
+    substitutions = getattr(email_message, 'substitutions', None)
+    if substitutions:
+        personalization['substitutions'] = {key: str(value) for key, value in substitutions.items()}
+    return personalization
+
 
 class SendGridBackend(BaseEmailBackend):
     """
     SendGrid API kullanarak email gönderen Django email backend
     """
-    
+
     def __init__(self, fail_silently=False, **kwargs):
         super().__init__(fail_silently=fail_silently, **kwargs)
         self.api_key = getattr(settings, 'SENDGRID_API_KEY', None)
         self.from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', None)
-        
+
         if not self.api_key:
             logger.warning("⚠️ SENDGRID_API_KEY ayarlanmamış, email gönderilemeyecek")
-            self.sendgrid_client = None
-        else:
+
+    def _groups(self, email_messages):
+        """Aynı içerikli mesajları tek istekte gönderilecek partilere ayırır"""
+        groups = {}
+        for email_message in email_messages:
+            if not email_message.recipients():
+                continue
+            key = (
+                email_message.from_email or self.from_email,
+                email_message.subject,
+                email_message.body or '',
+                _html_body(email_message) or '',
+                tuple(email_message.reply_to),
+            )
+            chunks = groups.setdefault(key, [([], set())])
+            chunk, seen = chunks[-1]
+            recipients = email_message.recipients()
+            # Bir adres istekte yalnızca bir personalization'da yer alabilir
+            if len(chunk) >= SENDGRID_MAX_PERSONALIZATIONS or seen.intersection(recipients):
+                chunk, seen = [], set()
+                chunks.append((chunk, seen))
+            chunk.append(email_message)
+            seen.update(recipients)
+        return [(key, chunk) for key, chunks in groups.items() for chunk, _ in chunks]
+
+    def _payload(self, key, chunk):
+        from_email, subject, body_text, body_html, reply_to = key
+        content = []
+        # SendGrid text/plain içeriğin HTML'den önce gelmesini ister
+        if body_text:
+            content.append({'type': 'text/plain', 'value': body_text})
+        if body_html:
+            content.append({'type': 'text/html', 'value': body_html})
+        payload = {
+            'personalizations': [_personalization(message) for message in chunk],
+            'from': {'email': from_email},
+            'subject': subject,
+            'content': content,
+        }
+        if reply_to:
+            payload['reply_to'] = {'email': reply_to[0]}
+        return payload
+
+    def deliver(self, email_messages):
+        """
+        Mesajları gruplayarak gönderir; [(mesaj, hata mesajı veya None), ...] döndürür.
+        Bir istek başarısız olursa sadece o istekteki mesajlar hatalı sayılır.
+        """
+        results = []
+        transport = get_transport(self.api_key)
+        for key, chunk in self._groups(email_messages):
             try:
-                self.sendgrid_client = SendGridAPIClient(api_key=self.api_key)
-                logger.info("✅ SendGrid client başarıyla oluşturuldu")
+                status, response_body = transport.post(SENDGRID_SEND_PATH, self._payload(key, chunk))
+                error = None if 200 <= status < 300 else f"SendGrid API hatası: {status} - {response_body[:500]!r}"
             except Exception as e:
-                logger.error(f"❌ SendGrid client oluşturulamadı: {str(e)}", exc_info=True)
-                self.sendgrid_client = None
-    
+                error = f"SendGrid isteği başarısız: {str(e)}"
+            if error:
+                logger.error(f"❌ {error}")
+            else:
+                logger.info(f"✅ Email başarıyla gönderildi: {len(chunk)} mesaj, tek istek")
+            results.extend((message, error) for message in chunk)
+        return results
+
     def send_messages(self, email_messages):
         """
-        Django email mesajlarını SendGrid API üzerinden gönderir
+        Django email mesajlarını SendGrid API üzerinden gönderir; gönderilen mesaj sayısını döndürür.
+        Bazı istekler başarısız olursa gönderilenlerin sayısı döner (hatalar loglanır);
+        hiçbir mesaj gönderilemediyse fail_silently=False iken hata fırlatılır.
         """
-        if not self.sendgrid_client:
+        if not self.api_key:
             if not self.fail_silently:
                 raise Exception("SendGrid API key ayarlanmamış")
             return 0
-        
-        sent_count = 0
-        
-        for email_message in email_messages:
-            try:
-                # Django EmailMessage objesinden bilgileri al
-                from_email = email_message.from_email or self.from_email
-                to_emails = email_message.to
-                subject = email_message.subject
-                
-                # Plain text ve HTML content
-                body_text = email_message.body
-                body_html = None
-                
-                # HTML alternatif var mı?
-                if hasattr(email_message, 'alternatives') and email_message.alternatives:
-                    for content, mimetype in email_message.alternatives:
-                        if mimetype == 'text/html':
-                            body_html = content
-                            break
-                
-                # Eğer html_message parametresi varsa onu kullan
-                if hasattr(email_message, 'html_message') and email_message.html_message:
-                    body_html = email_message.html_message
-                
-                # SendGrid Mail objesi oluştur
-                message = Mail(
-                    from_email=Email(from_email),
-                    to_emails=[To(email) for email in to_emails],
-                    subject=subject,
-                    plain_text_content=Content("text/plain", body_text) if body_text else None,
-                    html_content=Content("text/html", body_html) if body_html else None,
-                )
-                
-                # Email'i gönder
-                response = self.sendgrid_client.send(message)
-                
-                # Başarı kontrolü (2xx status code)
-                if 200 <= response.status_code < 300:
-                    logger.info(f"✅ Email başarıyla gönderildi: {to_emails}")
-                    sent_count += 1
-                else:
-                    error_msg = f"SendGrid API hatası: {response.status_code} - {response.body}"
-                    logger.error(f"❌ {error_msg}")
-                    if not self.fail_silently:
-                        raise Exception(error_msg)
-                        
-            except Exception as e:
-                logger.error(f"❌ Email gönderilirken hata: {str(e)}", exc_info=True)
-                if not self.fail_silently:
-                    raise
-        
-        return sent_count
 
+        results = self.deliver(email_messages)
+        errors = [error for _, error in results if error]
+        sent = len(results) - len(errors)
+        if errors and not sent and not self.fail_silently:
+            raise Exception(errors[0])
+        return sent
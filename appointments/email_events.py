@@ -0,0 +1,183 @@
+"""
+SendGrid event webhook: teslimat olaylarının toplu kaydı
+
+SendGrid olayları (processed, delivered, bounce, dropped, ...) tek istekte binlerce olaylık
+JSON dizisi olarak gönderir. İstek imzası SENDGRID_EVENT_WEBHOOK_PUBLIC_KEY (Mail Settings >
+Signed Event Webhook'taki doğrulama anahtarı) ile doğrulanır. Her istekte:
+- Olaylar toplu INSERT ... ON CONFLICT (sg_event_id) DO NOTHING RETURNING ile EmailEvent
+  tablosuna eklenir; daha önce alınan olaylar (SendGrid tekrar denemesi, eşzamanlı aynı istek)
+  atlanır. Neyin yeni olduğuna ayrı bir SELECT ile değil, INSERT'in döndürdüğü satırlarla karar
+  verilir (SELECT ile INSERT arasındaki yarışta olay iki kez sayılmaz).
+- COUNTED_EVENTS türündeki, gerçekten eklenen olaylar için alıcı/olay sayaçları (EmailEventCount)
+  tek UPDATE ile artırılır. Bounce sayıları ham tablo taranmadan okunur (bkz. event_counts).
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.db.models.functions import Greatest
+
+from .models import EmailEvent, EmailEventCount
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'X-Twilio-Email-Event-Webhook-Signature'
+TIMESTAMP_HEADER = 'X-Twilio-Email-Event-Webhook-Timestamp'
+# Alıcı bazında sayılan (teslim edilemeyen) olay türleri
+COUNTED_EVENTS = ('bounce', 'dropped', 'spamreport')
+
+
+@lru_cache(maxsize=4)
+def _verifier(public_key):
+    from sendgrid.helpers.eventwebhook import EventWebhook
+    return EventWebhook(public_key)
+
+
+def verify_signature(payload, signature, timestamp):
+    """
+    İsteğin SendGrid tarafından imzalandığını doğrular (ECDSA, timestamp + ham gövde).
+    Doğrulama anahtarı tanımlı değilse hiçbir istek kabul edilmez.
+    """
+    public_key = getattr(settings, 'SENDGRID_EVENT_WEBHOOK_PUBLIC_KEY', '')
+    if not public_key:
+        logger.warning("⚠️ SENDGRID_EVENT_WEBHOOK_PUBLIC_KEY ayarlanmamış, event webhook istekleri reddediliyor")
+        return False
+    if not signature or not timestamp:
+        return False
+    try:
+        return _verifier(public_key).verify_signature(payload.decode('utf-8'), signature, timestamp)
+    except (ValueError, TypeError) as e:
+        # Bozuk base64 imza / anahtar veya UTF-8 olmayan gövde
+        logger.warning(f"⚠️ Event webhook imzası çözümlenemedi: {str(e)}")
+        return False
+
+
+def _event_id(event):
+    """sg_event_id yoksa olay içeriğinden türetilir (tekrar gönderimde aynı değer)"""
+    if event.get('sg_event_id'):
+        return str(event['sg_event_id'])[:100]
+    canonical = json.dumps(event, sort_keys=True, separators=(',', ':'))
+    return 'sha1:' + hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def parse_events(events):
+    """SendGrid olay dizisini EmailEvent nesnelerine çevirir (kaydetmez); geçersiz olaylar atlanır"""
+    rows = {}
+    for event in events:
+        if not isinstance(event, dict) or not event.get('email') or not event.get('event'):
+            continue
+        try:
+            timestamp = datetime.fromtimestamp(int(event.get('timestamp')), tz=dt_timezone.utc)
+        except (TypeError, ValueError, OverflowError, OSError):
+            continue
+        row = EmailEvent(
+            sg_event_id=_event_id(event),
+            sg_message_id=str(event.get('sg_message_id') or '')[:255],
+            email=str(event['email'])[:254].lower(),
+            event=str(event['event'])[:20],
+            timestamp=timestamp,
+            reason=str(event.get('reason') or event.get('response') or '')[:255],
+        )
+        # Aynı istekte tekrarlanan olay bir kez yazılır
+        rows.setdefault(row.sg_event_id, row)
+    return list(rows.values())
+
+
+def _increment_counts(rows):
+    """Yeni olaylar için (alıcı, olay) sayaçlarını artırır: INSERT (yoksa) + tek UPDATE"""
+    tallies = {}
+    for row in rows:
+        count, last = tallies.get((row.email, row.event), (0, row.timestamp))
+        tallies[(row.email, row.event)] = (count + 1, max(last, row.timestamp))
+    if not tallies:
+        return
+    EmailEventCount.objects.bulk_create(
+        [EmailEventCount(email=email, event=event, last_event_at=last) for (email, event), (_, last) in tallies.items()],
+        ignore_conflicts=True,
+    )
+    counters = EmailEventCount.objects.filter(
+        email__in={email for email, _ in tallies},
+        event__in={event for _, event in tallies},
+    ).values_list('id', 'email', 'event')
+    increments = {
+        counter_id: tallies[(email, event)]
+        for counter_id, email, event in counters
+        if (email, event) in tallies
+    }
+    # count = count + n: eşzamanlı isteklerin artışları kaybolmaz
+    EmailEventCount.objects.filter(id__in=increments).update(
+        count=F('count') + Case(*[When(id=counter_id, then=Value(n)) for counter_id, (n, _) in increments.items()]),
+        last_event_at=Greatest(
+            F('last_event_at'),
+            Case(
+                *[When(id=counter_id, then=Value(last)) for counter_id, (_, last) in increments.items()],
+                output_field=DateTimeField(),
+            ),
+        ),
+    )
+
+
+INSERT_FIELDS = ('sg_event_id', 'sg_message_id', 'email', 'event', 'timestamp', 'reason')
+
+
+def _insert_new_events(rows):
+    """
+    Olayları ekler, gerçekten eklenenlerin sg_event_id kümesini döndürür.
+    PostgreSQL/SQLite: parti başına tek INSERT ... ON CONFLICT DO NOTHING RETURNING.
+    Diğer veritabanları: satır başına savepoint içinde INSERT (çakışan satır atlanır).
+    """
+    if connection.vendor not in ('postgresql', 'sqlite') or not connection.features.can_return_rows_from_bulk_insert:
+        inserted = set()
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    row.save(force_insert=True)
+            except IntegrityError:
+                continue
+            inserted.add(row.sg_event_id)
+        return inserted
+
+    qn = connection.ops.quote_name
+    fields = [EmailEvent._meta.get_field(name) for name in INSERT_FIELDS]
+    key_column = qn(EmailEvent._meta.get_field('sg_event_id').column)
+    sql_prefix = f"INSERT INTO {qn(EmailEvent._meta.db_table)} ({', '.join(qn(field.column) for field in fields)}) VALUES "
+    sql_suffix = f" ON CONFLICT ({key_column}) DO NOTHING RETURNING {key_column}"
+    row_placeholder = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    batch_size = connection.ops.bulk_batch_size(fields, rows)
+
+    inserted = set()
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = [field.get_db_prep_save(getattr(row, field.attname), connection) for row in batch for field in fields]
+            cursor.execute(sql_prefix + ', '.join([row_placeholder] * len(batch)) + sql_suffix, params)
+            inserted.update(event_id for (event_id,) in cursor.fetchall())
+    return inserted
+
+
+def ingest_events(events):
+    """
+    Webhook isteğindeki olayları kaydeder. (alınan, yeni eklenen) olay sayılarını döndürür.
+    Tekrar gönderilen olaylar yazılmaz ve sayaçları tekrar artırmaz.
+    """
+    rows = parse_events(events)
+    if not rows:
+        return len(events), 0
+    with transaction.atomic():
+        inserted = _insert_new_events(rows)
+        counted = [row for row in rows if row.event in COUNTED_EVENTS and row.sg_event_id in inserted]
+        _increment_counts(counted)
+    logger.info(f"📬 SendGrid olaylari: {len(events)} alindi, {len(inserted)} yeni, {len(counted)} sayaca eklendi")
+    return len(events), len(inserted)
+
+
+def event_counts(email):
+    """Alıcının teslim edilemeyen olay sayıları: {'bounce': 2, 'dropped': 1, ...}"""
+    return dict(
+        EmailEventCount.objects.filter(email=email.lower()).values_list('event', 'count')
+    )
@@ -0,0 +1,227 @@
+"""
+Süreç içi sınırlı email gönderim havuzu (EMAIL_DELIVERY='thread')
+
+Ayrı bir outbox worker'ı çalıştırmayan kurulumlar için: email başına yeni bir OS thread'i
+açmak yerine tüm gönderimler süreç başına tek bir ThreadPoolExecutor'a verilir.
+- En fazla EMAIL_EXECUTOR_MAX_WORKERS thread çalışır.
+- Kuyruk EMAIL_EXECUTOR_MAX_QUEUE iş ile sınırlıdır. Kuyruk doluyken gelen iş
+  EMAIL_EXECUTOR_OVERFLOW ayarına göre loglanıp atılır ('drop', varsayılan) ya da outbox
+  tablosuna yazılır ('spill'). Web isteği hiçbir durumda beklemez.
+  'spill' sadece 'send_outbox_emails' komutu da çalıştırılıyorsa kullanılmalıdır: thread
+  modunda outbox satırlarını başka hiçbir şey göndermez, satırlar sessizce birikir.
+- SIGTERM geldiğinde kuyruk EMAIL_EXECUTOR_DRAIN_SECONDS içinde boşaltılır; süre dolduğunda
+  başlamamış işlere overflow politikası uygulanır. Web sunucuları (gunicorn, uwsgi) worker'ları
+  SIGTERM ile durdurur; süre sınırı bu yolda, yorumlayıcı kapanmaya başlamadan önce uygulanır.
+- Normal süreç çıkışında sıra şöyledir: yorumlayıcı önce daemon olmayan thread'leri bekler;
+  havuzun thread'leri de bunlara dahildir (concurrent.futures kuyruktaki işleri bitirir).
+  atexit ile kaydedilen boşaltma bundan sonra çalışır, kalan işlere overflow uygular ve
+  istatistikleri loglar. Bu yolda bekleme süresini sınırlayan şey kuyruk sınırıdır
+  (EMAIL_EXECUTOR_MAX_QUEUE).
+- Kuyruk derinliği, gönderilen/başarısız/atılan sayıları ve bekleme/gönderim süreleri
+  stats() ile okunabilir.
+"""
+import atexit
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class BoundedEmailExecutor:
+    """Sabit sayıda thread ve sınırlı kuyrukla email gönderen havuz"""
+
+    def __init__(self, max_workers=4, max_queue=200, overflow='drop'):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='EmailExecutor')
+        # Çalışan + kuyruktaki iş sayısı sınırı
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._pending = {}  # future -> mesajlar (drain sırasında outbox'a aktarmak için)
+        self._closed = False
+        self._counters = {
+            'submitted': 0,
+            'sent': 0,
+            'failed': 0,
+            'dropped': 0,
+            'spilled': 0,
+            'max_depth': 0,
+            'queue_wait_total': 0.0,
+            'queue_wait_max': 0.0,
+            'send_time_total': 0.0,
+            'send_time_max': 0.0,
+            'batches': 0,
+        }
+
+    def submit(self, messages, send):
+        """
+        send(messages) -> gönderilen sayısı çağrısını havuza verir. Havuz doluysa veya kapanmışsa
+        overflow politikası uygulanır. İş kuyruğa alındıysa True döner.
+        """
+        if self._closed or not self._slots.acquire(blocking=False):
+            self._overflow(messages, reason='kapandi' if self._closed else 'kuyruk dolu')
+            return False
+        queued_at = time.monotonic()
+        try:
+            future = self._executor.submit(self._run, messages, send, queued_at)
+        except RuntimeError:
+            # Havuz bu arada kapatıldı
+            self._slots.release()
+            self._overflow(messages, reason='kapandi')
+            return False
+        with self._lock:
+            self._counters['submitted'] += len(messages)
+            self._pending[future] = messages
+            self._counters['max_depth'] = max(self._counters['max_depth'], len(self._pending))
+        future.add_done_callback(self._done)
+        return True
+
+    def _run(self, messages, send, queued_at):
+        started = time.monotonic()
+        sent = 0
+        try:
+            sent = send(messages) or 0
+        except Exception as e:
+            logger.error(f"❌ Email havuzunda gönderim hatası: {str(e)}", exc_info=True)
+        finished = time.monotonic()
+        with self._lock:
+            counters = self._counters
+            counters['sent'] += sent
+            counters['failed'] += len(messages) - sent
+            counters['batches'] += 1
+            wait, duration = started - queued_at, finished - started
+            counters['queue_wait_total'] += wait
+            counters['queue_wait_max'] = max(counters['queue_wait_max'], wait)
+            counters['send_time_total'] += duration
+            counters['send_time_max'] = max(counters['send_time_max'], duration)
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.pop(future, None)
+        self._slots.release()
+
+    def _overflow(self, messages, reason):
+        if self.overflow == 'spill':
+            try:
+                from .outbox import enqueue_messages
+                enqueue_messages(messages)
+                with self._lock:
+                    self._counters['spilled'] += len(messages)
+                logger.warning(f"⚠️ Email havuzu ({reason}): {len(messages)} email outbox'a yazildi")
+                return
+            except Exception as e:
+                logger.error(f"❌ Email outbox'a yazilamadi: {str(e)}", exc_info=True)
+        with self._lock:
+            self._counters['dropped'] += len(messages)
+        logger.error(f"❌ Email havuzu ({reason}): {len(messages)} email atildi")
+
+    def stats(self):
+        """Anlık kuyruk derinliği ve sayaçlar (süreler saniye cinsinden)"""
+        with self._lock:
+            counters = dict(self._counters)
+            depth = len(self._pending)
+        batches = counters.pop('batches')
+        queue_wait_total = counters.pop('queue_wait_total')
+        send_time_total = counters.pop('send_time_total')
+        counters.update({
+            'depth': depth,
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'queue_wait_avg': queue_wait_total / batches if batches else 0.0,
+            'send_time_avg': send_time_total / batches if batches else 0.0,
+        })
+        return counters
+
+    def drain(self, timeout):
+        """
+        Yeni iş kabul etmeyi bırakır, kuyruğun en fazla timeout saniyede bitmesini bekler.
+        Süre dolunca başlamamış işler iptal edilir ve overflow politikası uygulanır.
+        Bekleyen iş kalmadıysa True döner.
+        """
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._pending:
+                    break
+            time.sleep(0.05)
+
+        with self._lock:
+            pending = list(self._pending.items())
+        leftovers = [messages for future, messages in pending if future.cancel()]
+        for messages in leftovers:
+            self._overflow(messages, reason='kapanis suresi doldu')
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        logger.info(f"📊 Email havuzu kapandi: {self.stats()}")
+        return not pending
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_handlers_installed = False
+
+
+def get_email_executor():
+    """Süreç başına tek havuz (ilk email'de oluşturulur)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = BoundedEmailExecutor(
+                    max_workers=_setting('EMAIL_EXECUTOR_MAX_WORKERS', 4),
+                    max_queue=_setting('EMAIL_EXECUTOR_MAX_QUEUE', 200),
+                    overflow=_setting('EMAIL_EXECUTOR_OVERFLOW', 'drop'),
+                )
+                if not _handlers_installed:
+                    _install_drain_handlers()
+    return _executor
+
+
+def drain_email_executor(timeout=None):
+    """Havuz oluşturulduysa boşaltır (SIGTERM / süreç çıkışı)"""
+    if _executor is None:
+        return True
+    if timeout is None:
+        timeout = _setting('EMAIL_EXECUTOR_DRAIN_SECONDS', 10)
+    return _executor.drain(timeout)
+
+
+def reset_email_executor(timeout=0):
+    """Mevcut havuzu boşaltıp kapatır; sonraki email güncel ayarlarla yeni havuz kurar (benchmark)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.drain(timeout)
+        _executor = None
+
+
+def _install_drain_handlers():
+    global _handlers_installed
+    _handlers_installed = True
+    # atexit, daemon olmayan thread'ler (havuz thread'leri dahil) bittikten sonra çalışır:
+    # burada sadece kalanlar işlenir ve loglanır. Süre sınırlı boşaltma SIGTERM yolundadır.
+    atexit.register(drain_email_executor)
+    # Sinyal işleyicisi sadece ana thread'den kurulabilir; önceki işleyici (ör. gunicorn) korunur
+    if threading.current_thread() is not threading.main_thread():
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_sigterm(signum, frame):
+        drain_email_executor()
+        if callable(previous):
+            previous(signum, frame)
+        elif previous == signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.raise_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
@@ -1,405 +1,307 @@
 """
 Email gönderme servisi - Randevu bildirimleri için
 """
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.core.mail import get_connection
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 import logging
-import threading
+
+from .digest import digest_enabled, digest_event, record_events
+from .email_executor import get_email_executor
+from .notifications import (
+    NotificationContext, format_turkish_date, format_turkish_datetime, render_message, render_personalized,
+    resolve_substitutions,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def _send_email_sync(subject, message, from_email, recipient_list, html_message=None):
+def _send_messages_sync(messages):
     """
-    Email gönderimini senkron olarak yapan yardımcı fonksiyon
-    Django database connection'larını thread-safe hale getirmek için close_all() kullanıyoruz
+    Hazır email'leri tek bağlantı üzerinden sırayla gönderir (havuz thread'inde). Gönderilen sayısını döndürür.
+    substitutions desteklemeyen backend'lerde yer tutucular önce yerel olarak doldurulur.
     """
     from django.db import connections
     try:
-        # Thread'de Django database connection'larını kapat
-        # Böylece yeni connection açılır ve thread-safe çalışır
-        connections.close_all()
-        
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=from_email,
-            recipient_list=recipient_list,
-            html_message=html_message,
-            fail_silently=False,
-        )
-        logger.info(f"✅ Email başarıyla gönderildi: {recipient_list}")
+        connection = get_connection(fail_silently=False)
+        if not hasattr(connection, 'deliver'):
+            messages = [resolve_substitutions(message) for message in messages]
+        sent = connection.send_messages(messages)
+        logger.info(f"✅ Email gönderildi: {sent}/{len(messages)}")
+        return sent
     except Exception as e:
         logger.error(f"❌ Email gönderilirken hata: {str(e)}", exc_info=True)
+        return 0
     finally:
         # Thread sonunda connection'ları temizle
         connections.close_all()
 
 
+def deliver_messages(messages):
+    """
+    Hazır email'leri EMAIL_DELIVERY ayarına göre gönderir:
+    - 'thread' (varsayılan): süreç içi sınırlı thread havuzu ile (bkz. email_executor.py)
+    - 'outbox': EmailOutbox tablosuna yazılır; 'send_outbox_emails' komutu gönderir
+      (çağıranın transaction'ında yazılır, bkz. schedule_notification)
+    """
+    if not messages:
+        return
+    if getattr(settings, 'EMAIL_DELIVERY', 'thread') == 'outbox':
+        from .outbox import enqueue_messages
+        enqueue_messages(messages)
+        return
+    if get_email_executor().submit(messages, _send_messages_sync):
+        logger.info(f"✅ {len(messages)} email gönderim kuyruğuna alındı")
+
+
+def schedule_notification(callback):
+    """
+    Bildirim gönderen callback'i iş değişikliğine bağlar:
+    - 'outbox' modunda hemen çalışır; email satırları değişiklikle aynı transaction'da yazılır
+      (geri alınırsa email de kuyruktan düşer)
+    - Diğer modlarda commit'ten sonra çalışır (geri alınan değişiklik için email gitmez)
+    """
+    if getattr(settings, 'EMAIL_DELIVERY', 'thread') == 'outbox':
+        callback()
+    else:
+        transaction.on_commit(callback)
+
+
+def _email_settings_ready():
+    """Email gönderimi için gerekli ayarlar tanımlı mı?"""
+    if not settings.DEFAULT_FROM_EMAIL:
+        logger.warning("⚠️ DEFAULT_FROM_EMAIL ayarlanmamış, email gönderilemiyor (SendGrid için doğrulanmış email adresi gerekli)")
+        return False
+    if not getattr(settings, 'SENDGRID_API_KEY', None):
+        logger.warning("⚠️ SENDGRID_API_KEY ayarlanmamış, email gönderilemiyor")
+        return False
+    return True
+
+
+def _add_psychologist_notification(messages, events, ctx, kind, template, subject, context, **details):
+    """
+    Psikolog bildirimini hazırlar: özet modundaki psikolog için email yerine özet olayı
+    eklenir (bkz. digest.py), diğerleri için email hazırlanır.
+    """
+    if not ctx.psychologist.email:
+        return
+    if digest_enabled(ctx.psychologist):
+        events.append(digest_event(kind, ctx, **details))
+    else:
+        messages.append(render_message(template, subject, context, ctx.psychologist.email))
+
+
 def send_appointment_created_email(appointment):
     """
     Randevu oluşturulduğunda hasta ve psikologa email gönder (asenkron)
     """
     print(f"📧 [EMAIL SERVICE] send_appointment_created_email çağrıldı - Appointment ID: {appointment.id}")
     logger.info(f"📧 [EMAIL SERVICE] send_appointment_created_email çağrıldı - Appointment ID: {appointment.id}")
-    
+
     try:
-        patient = appointment.patient
-        psychologist = appointment.time_slot.psychologist
-        time_slot = appointment.time_slot
-        print(f"📧 [EMAIL SERVICE] Randevu bilgileri alındı - Hasta: {patient.email}, Psikolog: {psychologist.email}")
-        
-        # Email gönderimi için gerekli bilgileri kontrol et
-        if not settings.DEFAULT_FROM_EMAIL:
-            warning_msg = "⚠️ DEFAULT_FROM_EMAIL ayarlanmamış, email gönderilemiyor (SendGrid için doğrulanmış email adresi gerekli)"
-            print(f"⚠️ [EMAIL SERVICE] {warning_msg}")
-            logger.warning(warning_msg)
-            return
-        
-        if not getattr(settings, 'SENDGRID_API_KEY', None):
-            warning_msg = "⚠️ SENDGRID_API_KEY ayarlanmamış, email gönderilemiyor"
-            print(f"⚠️ [EMAIL SERVICE] {warning_msg}")
-            logger.warning(warning_msg)
+        if not _email_settings_ready():
             return
-        
-        # Email ayarlarını logla (debug için)
-        logger.info(f"📧 Email ayarları: FROM={settings.DEFAULT_FROM_EMAIL} (SendGrid)")
-        
-        # Türkçe ay isimleri mapping'i
-        turkish_months = {
-            'January': 'Ocak', 'February': 'Şubat', 'March': 'Mart',
-            'April': 'Nisan', 'May': 'Mayıs', 'June': 'Haziran',
-            'July': 'Temmuz', 'August': 'Ağustos', 'September': 'Eylül',
-            'October': 'Ekim', 'November': 'Kasım', 'December': 'Aralık'
-        }
-        
-        def format_turkish_date(dt):
-            """Tarihi Türkçe formatında döndürür: gün ay yıl, saat:dakika"""
-            date_str = dt.strftime('%d %B %Y')
-            time_str = dt.strftime('%H:%M')
-            # İngilizce ay ismini Türkçe'ye çevir
-            for en_month, tr_month in turkish_months.items():
-                date_str = date_str.replace(en_month, tr_month)
-            return date_str, time_str
-        
-        # Randevu bilgileri
-        appointment_date, appointment_time = format_turkish_date(time_slot.start_time)
-        appointment_datetime = f"{appointment_date}, {appointment_time}"
-        
-        # Ödeme tarihi (randevudan 24 saat önce)
-        payment_deadline = time_slot.start_time - timedelta(hours=24)
+
+        ctx = NotificationContext(appointment)
+        time_slot = appointment.time_slot
+
+        # Ödeme son tarihi (ödeme bekletmesinin bittiği an, bkz. Appointment.get_hold_expires_at)
+        payment_deadline = appointment.hold_expires_at or (
+            time_slot.start_time - timedelta(hours=getattr(settings, 'PAYMENT_DEADLINE_HOURS', 24))
+        )
         payment_deadline_date, payment_deadline_time = format_turkish_date(payment_deadline)
-        payment_deadline_datetime = f"{payment_deadline_date}, {payment_deadline_time}"
-        
-        # Hasta adını düzgün şekilde birleştir
-        patient_name_parts = []
-        if patient.first_name:
-            patient_name_parts.append(patient.first_name)
-        if patient.last_name:
-            patient_name_parts.append(patient.last_name)
-        patient_name = ' '.join(patient_name_parts) if patient_name_parts else patient.email
-        
-        # Hasta email'i
-        patient_context = {
-            'patient_name': patient_name,
-            'appointment_date': appointment_date,
-            'appointment_time': appointment_time,
-            'appointment_datetime': appointment_datetime,
-            'payment_deadline_date': payment_deadline_date,
-            'payment_deadline_time': payment_deadline_time,
-            'payment_deadline_datetime': payment_deadline_datetime,
-            'notes': appointment.notes or 'Not bırakılmadı',
-            'psychologist_name': psychologist.first_name or psychologist.email,
-        }
-        
-        patient_subject = f'Randevu Onayı - {appointment_datetime}'
-        try:
-            patient_message = render_to_string('emails/appointment_created_patient.txt', patient_context)
-            patient_html_message = render_to_string('emails/appointment_created_patient.html', patient_context)
-        except Exception as e:
-            logger.error(f"Email template render hatası (Hasta): {str(e)}", exc_info=True)
-            return
-        
-        # Psikolog email'i
-        psychologist_context = {
-            'psychologist_name': psychologist.first_name or psychologist.email,
-            'patient_name': patient_name,
-            'patient_email': patient.email,
-            'patient_phone': patient.phone_number or 'Belirtilmemiş',
-            'appointment_date': appointment_date,
-            'appointment_time': appointment_time,
-            'appointment_datetime': appointment_datetime,
+        extra = {
             'payment_deadline_date': payment_deadline_date,
             'payment_deadline_time': payment_deadline_time,
-            'payment_deadline_datetime': payment_deadline_datetime,
+            'payment_deadline_datetime': f"{payment_deadline_date}, {payment_deadline_time}",
             'notes': appointment.notes or 'Not bırakılmadı',
         }
-        
-        psychologist_subject = f'Yeni Randevu - {patient_name} - {appointment_datetime}'
-        psychologist_message = render_to_string('emails/appointment_created_psychologist.txt', psychologist_context)
-        psychologist_html_message = render_to_string('emails/appointment_created_psychologist.html', psychologist_context)
-        
-        # Email'leri asenkron olarak gönder (threading ile)
-        # Böylece web sayfası yavaşlamaz ve timeout olmaz
-        # Production'da thread'lerin çalışması için daemon=False kullanıyoruz
-        if patient.email:
-            logger.info(f"📧 Hasta email'i hazırlanıyor: {patient.email}")
-            try:
-                thread = threading.Thread(
-                    target=_send_email_sync,
-                    args=(patient_subject, patient_message, settings.DEFAULT_FROM_EMAIL, [patient.email], patient_html_message),
-                    daemon=False,  # daemon=False: Thread ana process'ten bağımsız çalışır
-                    name=f"EmailThread-Patient-{appointment.id}"
-                )
-                thread.start()
-                logger.info(f"✅ Thread başlatıldı: Hasta email'i gönderiliyor - {patient.email}")
-            except Exception as e:
-                logger.error(f"❌ Thread başlatılamadı (Hasta): {str(e)}", exc_info=True)
-        
-        if psychologist.email:
-            logger.info(f"📧 Psikolog email'i hazırlanıyor: {psychologist.email}")
-            try:
-                thread = threading.Thread(
-                    target=_send_email_sync,
-                    args=(psychologist_subject, psychologist_message, settings.DEFAULT_FROM_EMAIL, [psychologist.email], psychologist_html_message),
-                    daemon=False,  # daemon=False: Thread ana process'ten bağımsız çalışır
-                    name=f"EmailThread-Psychologist-{appointment.id}"
-                )
-                thread.start()
-                logger.info(f"✅ Thread başlatıldı: Psikolog email'i gönderiliyor - {psychologist.email}")
-            except Exception as e:
-                logger.error(f"❌ Thread başlatılamadı (Psikolog): {str(e)}", exc_info=True)
-            
+
+        # Email'ler web isteğini bekletmeden gönderilir (bkz. deliver_messages)
+        messages = []
+        if ctx.patient.email:
+            logger.info(f"📧 Hasta email'i hazırlanıyor: {ctx.patient.email}")
+            messages.append(render_message(
+                'appointment_created_patient',
+                f'Randevu Onayı - {ctx.appointment_datetime}',
+                ctx.patient_context(**extra),
+                ctx.patient.email,
+            ))
+        events = []
+        _add_psychologist_notification(
+            messages, events, ctx, 'created',
+            'appointment_created_psychologist',
+            f'Yeni Randevu - {ctx.patient_name} - {ctx.appointment_datetime}',
+            ctx.psychologist_context(**extra),
+        )
+        record_events(events)
+        deliver_messages(messages)
+
     except Exception as e:
         logger.error(f"Randevu oluşturma email'i gönderilirken hata: {str(e)}", exc_info=True)
 
 
+def _cancelled_email_messages(appointments, cancelled_by_admin=False, hold_expired=False):
+    """
+    İptal email'lerini hazırlar (hasta ve psikolog); özet modundaki psikolog için
+    email yerine özet olayı hazırlanır. (mesajlar, özet olayları) döndürür.
+    Hasta email'leri şablon bir kez üretilerek hazırlanır (bkz. notifications.render_personalized).
+    hold_expired=True: Ödeme süresi dolduğu için otomatik iptal (bkz. cancellation_service)
+    """
+    extra = {'cancelled_by_admin': cancelled_by_admin, 'hold_expired': hold_expired}
+    contexts = [NotificationContext(appointment) for appointment in appointments]
+
+    messages = render_personalized(
+        'appointment_cancelled_patient',
+        'Randevu İptali - {appointment_datetime}',
+        [(ctx.patient_context(**extra), ctx.patient.email) for ctx in contexts if ctx.patient.email],
+    )
+    events = []
+    for ctx in contexts:
+        _add_psychologist_notification(
+            messages, events, ctx, 'cancelled',
+            'appointment_cancelled_psychologist',
+            f'Randevu İptal Edildi - {ctx.patient_name} - {ctx.appointment_datetime}',
+            ctx.psychologist_context(**extra),
+            **extra,
+        )
+    return messages, events
+
+
 def send_appointment_cancelled_email(appointment, cancelled_by_admin=False):
     """
     Randevu iptal edildiğinde hasta ve psikologa email gönder (asenkron)
     """
     try:
-        patient = appointment.patient
-        psychologist = appointment.time_slot.psychologist
-        time_slot = appointment.time_slot
-        
         # Email gönderimi için gerekli bilgileri kontrol et
-        if not settings.DEFAULT_FROM_EMAIL:
-            logger.warning("⚠️ DEFAULT_FROM_EMAIL ayarlanmamış, email gönderilemiyor (SendGrid için doğrulanmış email adresi gerekli)")
+        if not _email_settings_ready():
             return
-        
-        if not getattr(settings, 'SENDGRID_API_KEY', None):
-            logger.warning("⚠️ SENDGRID_API_KEY ayarlanmamış, email gönderilemiyor")
-            return
-        
+
         # Email ayarlarını logla (debug için)
         logger.info(f"📧 Email ayarları: FROM={settings.DEFAULT_FROM_EMAIL} (SendGrid)")
-        
-        # Randevu bilgileri
-        appointment_datetime = time_slot.start_time.strftime('%d %B %Y, %H:%M')
-        
-        # Hasta adını düzgün şekilde birleştir
-        patient_name_parts = []
-        if patient.first_name:
-            patient_name_parts.append(patient.first_name)
-        if patient.last_name:
-            patient_name_parts.append(patient.last_name)
-        patient_name = ' '.join(patient_name_parts) if patient_name_parts else patient.email
-        
-        # Hasta email'i
-        patient_context = {
-            'patient_name': patient_name,
-            'appointment_datetime': appointment_datetime,
-            'cancelled_by_admin': cancelled_by_admin,
-        }
-        
-        patient_subject = f'Randevu İptali - {appointment_datetime}'
-        patient_message = render_to_string('emails/appointment_cancelled_patient.txt', patient_context)
-        patient_html_message = render_to_string('emails/appointment_cancelled_patient.html', patient_context)
-        
-        # Psikolog email'i
-        psychologist_context = {
-            'psychologist_name': psychologist.first_name or psychologist.email,
-            'patient_name': patient_name,
-            'appointment_datetime': appointment_datetime,
-            'cancelled_by_admin': cancelled_by_admin,
-        }
-        
-        psychologist_subject = f'Randevu İptal Edildi - {patient_name} - {appointment_datetime}'
-        psychologist_message = render_to_string('emails/appointment_cancelled_psychologist.txt', psychologist_context)
-        psychologist_html_message = render_to_string('emails/appointment_cancelled_psychologist.html', psychologist_context)
-        
-        # Email'leri asenkron olarak gönder (threading ile)
-        if patient.email:
-            logger.info(f"📧 Hasta iptal email'i hazırlanıyor: {patient.email}")
-            try:
-                thread = threading.Thread(
-                    target=_send_email_sync,
-                    args=(patient_subject, patient_message, settings.DEFAULT_FROM_EMAIL, [patient.email], patient_html_message),
-                    daemon=False,  # daemon=False: Thread ana process'ten bağımsız çalışır
-                    name=f"EmailThread-Cancel-Patient-{appointment.id}"
-                )
-                thread.start()
-                logger.info(f"✅ Thread başlatıldı: Hasta iptal email'i gönderiliyor - {patient.email}")
-            except Exception as e:
-                logger.error(f"❌ Thread başlatılamadı (Hasta İptal): {str(e)}", exc_info=True)
-        
-        if psychologist.email:
-            logger.info(f"📧 Psikolog iptal email'i hazırlanıyor: {psychologist.email}")
-            try:
-                thread = threading.Thread(
-                    target=_send_email_sync,
-                    args=(psychologist_subject, psychologist_message, settings.DEFAULT_FROM_EMAIL, [psychologist.email], psychologist_html_message),
-                    daemon=False,  # daemon=False: Thread ana process'ten bağımsız çalışır
-                    name=f"EmailThread-Cancel-Psychologist-{appointment.id}"
-                )
-                thread.start()
-                logger.info(f"✅ Thread başlatıldı: Psikolog iptal email'i gönderiliyor - {psychologist.email}")
-            except Exception as e:
-                logger.error(f"❌ Thread başlatılamadı (Psikolog İptal): {str(e)}", exc_info=True)
-            
+
+        messages, events = _cancelled_email_messages([appointment], cancelled_by_admin)
+        record_events(events)
+        deliver_messages(messages)
+
     except Exception as e:
         logger.error(f"Randevu iptal email'i gönderilirken hata: {str(e)}", exc_info=True)
 
 
+def send_appointments_cancelled_emails(appointments, cancelled_by_admin=False, hold_expired=False):
+    """
+    Birden fazla randevu iptali için email'leri tek seferde hazırlar ve tek gönderim işi olarak,
+    tek email bağlantısı üzerinden gönderir (toplu iptal, süresi dolan ödeme bekletmeleri).
+    appointments: patient ve time_slot__psychologist select_related ile getirilmiş olmalı.
+    """
+    try:
+        if not _email_settings_ready():
+            return
+
+        messages, events = _cancelled_email_messages(appointments, cancelled_by_admin, hold_expired)
+
+        logger.info(f"📧 {len(messages)} iptal email'i tek partide gönderilecek")
+        record_events(events)
+        deliver_messages(messages)
+    except Exception as e:
+        logger.error(f"Toplu iptal email'leri gönderilirken hata: {str(e)}", exc_info=True)
+
+
+def send_appointment_rescheduled_email(appointment, old_start_time, rescheduled_by_admin=False):
+    """
+    Randevu taşındığında hasta ve psikologa tek bir "randevu taşındı" email'i gönder.
+    İki email tek gönderim işi olarak, tek bağlantı üzerinden gönderilir.
+    appointment: patient ve time_slot__psychologist ile birlikte getirilmiş olmalı.
+    """
+    try:
+        if not _email_settings_ready():
+            return
+
+        ctx = NotificationContext(appointment)
+        payment_deadline_datetime = None
+        if appointment.status == 'pending_payment' and appointment.hold_expires_at:
+            payment_deadline_datetime = format_turkish_datetime(appointment.hold_expires_at)
+        extra = {
+            'old_appointment_datetime': format_turkish_datetime(old_start_time),
+            'payment_deadline_datetime': payment_deadline_datetime,
+            'rescheduled_by_admin': rescheduled_by_admin,
+        }
+
+        messages = []
+        if ctx.patient.email:
+            messages.append(render_message(
+                'appointment_rescheduled_patient',
+                f'Randevunuz Taşındı - {ctx.appointment_datetime}',
+                ctx.patient_context(**extra),
+                ctx.patient.email,
+            ))
+        events = []
+        _add_psychologist_notification(
+            messages, events, ctx, 'rescheduled',
+            'appointment_rescheduled_psychologist',
+            f'Randevu Taşındı - {ctx.patient_name} - {ctx.appointment_datetime}',
+            ctx.psychologist_context(**extra),
+            old_appointment_datetime=extra['old_appointment_datetime'],
+            rescheduled_by_admin=rescheduled_by_admin,
+        )
+        record_events(events)
+        deliver_messages(messages)
+    except Exception as e:
+        logger.error(f"Randevu taşındı email'i gönderilirken hata: {str(e)}", exc_info=True)
+
+
 def send_payment_completed_email(payment):
     """
     Ödeme tamamlandığında hasta ve psikologa email gönder (asenkron)
     """
     try:
-        appointment = payment.appointment
-        patient = appointment.patient
-        psychologist = appointment.time_slot.psychologist
-        time_slot = appointment.time_slot
-        
-        # Email gönderimi için gerekli bilgileri kontrol et
-        if not settings.DEFAULT_FROM_EMAIL:
-            logger.warning("⚠️ DEFAULT_FROM_EMAIL ayarlanmamış, email gönderilemiyor (SendGrid için doğrulanmış email adresi gerekli)")
-            return
-        
-        if not getattr(settings, 'SENDGRID_API_KEY', None):
-            logger.warning("⚠️ SENDGRID_API_KEY ayarlanmamış, email gönderilemiyor")
+        if not _email_settings_ready():
             return
-        
+
         # Email ayarlarını logla (debug için)
         logger.info(f"📧 Email ayarları: FROM={settings.DEFAULT_FROM_EMAIL} (SendGrid)")
-        
-        # Türkçe ay isimleri mapping'i
-        turkish_months = {
-            'January': 'Ocak', 'February': 'Şubat', 'March': 'Mart',
-            'April': 'Nisan', 'May': 'Mayıs', 'June': 'Haziran',
-            'July': 'Temmuz', 'August': 'Ağustos', 'September': 'Eylül',
-            'October': 'Ekim', 'November': 'Kasım', 'December': 'Aralık'
-        }
-        
-        def format_turkish_date(dt):
-            """Tarihi Türkçe formatında döndürür: gün ay yıl, saat:dakika"""
-            date_str = dt.strftime('%d %B %Y')
-            time_str = dt.strftime('%H:%M')
-            # İngilizce ay ismini Türkçe'ye çevir
-            for en_month, tr_month in turkish_months.items():
-                date_str = date_str.replace(en_month, tr_month)
-            return date_str, time_str
-        
-        # Randevu bilgileri
-        appointment_date, appointment_time = format_turkish_date(time_slot.start_time)
-        appointment_datetime = f"{appointment_date}, {appointment_time}"
-        
+
+        appointment = payment.appointment
+        ctx = NotificationContext(appointment)
+
         # Ödeme tarihi
-        payment_datetime = payment.paid_at if payment.paid_at else timezone.now()
-        payment_date, payment_time = format_turkish_date(payment_datetime)
-        payment_datetime_str = f"{payment_date}, {payment_time}"
-        
-        # Hasta adını düzgün şekilde birleştir
-        patient_name_parts = []
-        if patient.first_name:
-            patient_name_parts.append(patient.first_name)
-        if patient.last_name:
-            patient_name_parts.append(patient.last_name)
-        patient_name = ' '.join(patient_name_parts) if patient_name_parts else patient.email
-        
+        payment_date, payment_time = format_turkish_date(payment.paid_at or timezone.now())
+
         # Ödeme yöntemi
         payment_method = payment.payment_method or 'Kredi/Banka Kartı'
         if payment_method == 'card':
             payment_method = 'Kredi/Banka Kartı'
-        
-        # Hasta email'i
-        patient_context = {
-            'patient_name': patient_name,
-            'payment_amount': f"{payment.amount:.2f}",
-            'payment_date': payment_date,
-            'payment_time': payment_time,
-            'payment_datetime': payment_datetime_str,
-            'payment_method': payment_method,
-            'appointment_date': appointment_date,
-            'appointment_time': appointment_time,
-            'appointment_datetime': appointment_datetime,
-            'psychologist_name': psychologist.first_name or psychologist.email,
-        }
-        
-        patient_subject = f'Ödeme Onayı - {appointment_datetime}'
-        try:
-            patient_message = render_to_string('emails/payment_completed_patient.txt', patient_context)
-            patient_html_message = render_to_string('emails/payment_completed_patient.html', patient_context)
-        except Exception as e:
-            logger.error(f"Email template render hatası (Hasta): {str(e)}", exc_info=True)
-            return
-        
-        # Psikolog email'i
-        psychologist_context = {
-            'psychologist_name': psychologist.first_name or psychologist.email,
-            'patient_name': patient_name,
-            'patient_email': patient.email,
-            'patient_phone': patient.phone_number or 'Belirtilmemiş',
+
+        extra = {
             'payment_amount': f"{payment.amount:.2f}",
             'payment_date': payment_date,
             'payment_time': payment_time,
-            'payment_datetime': payment_datetime_str,
+            'payment_datetime': f"{payment_date}, {payment_time}",
             'payment_method': payment_method,
-            'appointment_date': appointment_date,
-            'appointment_time': appointment_time,
-            'appointment_datetime': appointment_datetime,
         }
-        
-        psychologist_subject = f'Randevu Ödemesi Tamamlandı - {patient_name} - {appointment_datetime}'
-        try:
-            psychologist_message = render_to_string('emails/payment_completed_psychologist.txt', psychologist_context)
-            psychologist_html_message = render_to_string('emails/payment_completed_psychologist.html', psychologist_context)
-        except Exception as e:
-            logger.error(f"Email template render hatası (Psikolog): {str(e)}", exc_info=True)
-            return
-        
-        # Email'leri asenkron olarak gönder (threading ile)
-        if patient.email:
-            logger.info(f"📧 Hasta ödeme email'i hazırlanıyor: {patient.email}")
-            try:
-                thread = threading.Thread(
-                    target=_send_email_sync,
-                    args=(patient_subject, patient_message, settings.DEFAULT_FROM_EMAIL, [patient.email], patient_html_message),
-                    daemon=False,
-                    name=f"EmailThread-Payment-Patient-{appointment.id}"
-                )
-                thread.start()
-                logger.info(f"✅ Thread başlatıldı: Hasta ödeme email'i gönderiliyor - {patient.email}")
-            except Exception as e:
-                logger.error(f"❌ Thread başlatılamadı (Hasta Ödeme): {str(e)}", exc_info=True)
-        
-        if psychologist.email:
-            logger.info(f"📧 Psikolog ödeme email'i hazırlanıyor: {psychologist.email}")
-            try:
-                thread = threading.Thread(
-                    target=_send_email_sync,
-                    args=(psychologist_subject, psychologist_message, settings.DEFAULT_FROM_EMAIL, [psychologist.email], psychologist_html_message),
-                    daemon=False,
-                    name=f"EmailThread-Payment-Psychologist-{appointment.id}"
-                )
-                thread.start()
-                logger.info(f"✅ Thread başlatıldı: Psikolog ödeme email'i gönderiliyor - {psychologist.email}")
-            except Exception as e:
-                logger.error(f"❌ Thread başlatılamadı (Psikolog Ödeme): {str(e)}", exc_info=True)
-            
+
+        messages = []
+        if ctx.patient.email:
+            logger.info(f"📧 Hasta ödeme email'i hazırlanıyor: {ctx.patient.email}")
+            messages.append(render_message(
+                'payment_completed_patient',
+                f'Ödeme Onayı - {ctx.appointment_datetime}',
+                ctx.patient_context(**extra),
+                ctx.patient.email,
+            ))
+        events = []
+        _add_psychologist_notification(
+            messages, events, ctx, 'payment_completed',
+            'payment_completed_psychologist',
+            f'Randevu Ödemesi Tamamlandı - {ctx.patient_name} - {ctx.appointment_datetime}',
+            ctx.psychologist_context(**extra),
+            payment_amount=extra['payment_amount'],
+            payment_method=payment_method,
+        )
+        record_events(events)
+        deliver_messages(messages)
+
     except Exception as e:
-        logger.error(f"Ödeme tamamlanma email'i gönderilirken hata: {str(e)}", exc_info=True)
\ No newline at end of file
+        logger.error(f"Ödeme tamamlanma email'i gönderilirken hata: {str(e)}", exc_info=True)
@@ -0,0 +1,153 @@
+"""
+Randevu ve slot listeleri için sunucu tarafı filtreler
+"""
+from datetime import datetime, time, timedelta
+from itertools import dropwhile, islice, takewhile
+from typing import NamedTuple, Optional
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+# Slot aramasında tek istekte dönebilecek en fazla slot
+MAX_SLOT_SEARCH_LIMIT = 500
+
+
+def parse_datetime_param(request, name, end_of_day=False):
+    """
+    Query parametresini aware datetime'a çevirir.
+    'YYYY-MM-DD' formatında tarih verilirse günün başı (end_of_day=True ise ertesi günün başı) kullanılır.
+    Parametre yoksa None döner, geçersizse 400 hatası fırlatılır.
+    """
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        # Önce sadece tarih mi diye bak (parse_datetime tarihleri de gece yarısı olarak kabul ediyor)
+        parsed_date = parse_date(value)
+        if parsed_date is not None:
+            if end_of_day:
+                parsed_date += timedelta(days=1)
+            parsed = datetime.combine(parsed_date, time.min)
+        else:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValueError(value)
+    except ValueError:
+        raise ValidationError({name: "Geçersiz tarih formatı. ISO formatı (YYYY-AA-GG veya YYYY-AA-GGTHH:MM:SSZ) gereklidir."})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_int_param(request, name):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "Sayı bekleniyor."})
+
+
+def parse_bool_param(request, name):
+    return request.query_params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+class AppointmentFilterBackend(BaseFilterBackend):
+    """
+    Desteklenen parametreler:
+    - status: Randevu durumu (virgülle birden fazla verilebilir: ?status=pending_payment,paid).
+      Verilmezse iptal edilen randevular listelenmez ('appt_active_*' kısmi indeksleri).
+    - date_from / date_to: Randevu (slot) başlangıç zamanı aralığı (date_to günü dahil)
+    - psychologist: Psikolog ID'si
+    - upcoming=true: Sadece henüz başlamamış randevular
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        # Filtreler sadece listede uygulanır; detay/iptal/silme işlemleri iptal edilmiş randevuları da bulmalı
+        if getattr(view, 'action', None) != 'list':
+            return queryset
+
+        statuses = request.query_params.get('status')
+        if statuses:
+            queryset = queryset.filter(status__in=[s.strip() for s in statuses.split(',') if s.strip()])
+        else:
+            queryset = queryset.exclude(status='cancelled')
+
+        date_from = parse_datetime_param(request, 'date_from')
+        if date_from is not None:
+            queryset = queryset.filter(time_slot__start_time__gte=date_from)
+
+        date_to = parse_datetime_param(request, 'date_to', end_of_day=True)
+        if date_to is not None:
+            queryset = queryset.filter(time_slot__start_time__lt=date_to)
+
+        psychologist_id = parse_int_param(request, 'psychologist')
+        if psychologist_id is not None:
+            queryset = queryset.filter(time_slot__psychologist_id=psychologist_id)
+
+        if parse_bool_param(request, 'upcoming'):
+            queryset = queryset.filter(time_slot__start_time__gte=timezone.now())
+
+        return queryset
+
+
+class SlotSearchParams(NamedTuple):
+    """
+    Müsait slot araması parametreleri (GET /api/v1/slots/):
+    - from / to: Slot başlangıç zamanı aralığı (to günü dahil). 'from' verilmezse şu an kullanılır,
+      yani geçmiş slotlar listelenmez.
+    - after: Bu zamandan SONRA başlayan slotlar (hariç). '?after=T&limit=N' ile
+      "T'den sonraki ilk N müsait slot" alınır; sonraki sayfa için son slotun start_time'ı gönderilir.
+    - psychologist: Psikolog ID'si
+    - min_duration: En kısa seans süresi (dakika)
+    - limit: En fazla kaç slot döneceği (en fazla MAX_SLOT_SEARCH_LIMIT)
+    """
+    start: datetime
+    end: Optional[datetime]
+    after: Optional[datetime]
+    psychologist_id: Optional[int]
+    min_duration: Optional[timedelta]
+    limit: Optional[int]
+
+    @classmethod
+    def from_request(cls, request):
+        start = parse_datetime_param(request, 'from') or timezone.now()
+        end = parse_datetime_param(request, 'to', end_of_day=True)
+        if end is not None and end <= start:
+            raise ValidationError({'to': "Bitiş zamanı başlangıç zamanından sonra olmalıdır."})
+
+        min_duration = parse_int_param(request, 'min_duration')
+        if min_duration is not None:
+            if min_duration <= 0:
+                raise ValidationError({'min_duration': "Pozitif bir dakika değeri bekleniyor."})
+            min_duration = timedelta(minutes=min_duration)
+
+        limit = parse_int_param(request, 'limit')
+        if limit is not None and not 1 <= limit <= MAX_SLOT_SEARCH_LIMIT:
+            raise ValidationError({'limit': f"1 ile {MAX_SLOT_SEARCH_LIMIT} arasında olmalıdır."})
+
+        return cls(
+            start=start,
+            end=end,
+            after=parse_datetime_param(request, 'after'),
+            psychologist_id=parse_int_param(request, 'psychologist'),
+            min_duration=min_duration,
+            limit=limit,
+        )
+
+    def filter_free_slots(self, free_slots):
+        """
+        Başlangıca göre sıralı FreeSlot akışına (müsaitlik özeti veya sanal motor) filtreleri uygular.
+        Akış sıralı olduğu için 'to'ya ulaşıldığında okuma durur.
+        """
+        free_slots = dropwhile(lambda slot: slot.start_time < self.start, free_slots)
+        if self.end is not None:
+            free_slots = takewhile(lambda slot: slot.start_time < self.end, free_slots)
+        if self.after is not None:
+            free_slots = (slot for slot in free_slots if slot.start_time > self.after)
+        if self.min_duration is not None:
+            free_slots = (slot for slot in free_slots if slot.end_time - slot.start_time >= self.min_duration)
+        return list(islice(free_slots, self.limit))
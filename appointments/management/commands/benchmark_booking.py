@@ -0,0 +1,161 @@
+"""
+Eşzamanlı randevu alma benchmark'ı
+
+Çok sayıda hasta aynı slotlar için aynı anda POST /api/v1/appointments/ isteği atar.
+Sonunda veritabanı tutarlılığı doğrulanır (çift rezervasyon, randevusu olmayan dolu slot)
+ve saniyedeki başarılı randevu sayısı raporlanır.
+
+Kullanım:
+    python manage.py benchmark_booking --clients 50 --slots 200 --attempts 20
+
+Benchmark kendi test kullanıcılarını ve slotlarını oluşturur, bitince siler (--keep hariç).
+Gerçek sonuç için üretimdeki veritabanı motoruyla (PostgreSQL) çalıştırılmalıdır;
+SQLite tek yazıcıya izin verdiği için 'database is locked' hataları görülebilir.
+"""
+import random
+import statistics
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Exists, OuterRef
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from appointments.models import Appointment, AvailableTimeSlot
+from appointments.views import AppointmentViewSet
+
+
+class Command(BaseCommand):
+    help = "Eşzamanlı randevu alma benchmark'ı (çift rezervasyon kontrolü ve randevu/sn)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50, help='Eşzamanlı istemci (thread) sayısı')
+        parser.add_argument('--slots', type=int, default=200, help='Yarışılan slot sayısı')
+        parser.add_argument('--attempts', type=int, default=20, help='İstemci başına randevu denemesi')
+        parser.add_argument('--seed', type=int, default=None, help='Rastgele slot seçimi için seed')
+        parser.add_argument('--keep', action='store_true', help='Benchmark verisini silme')
+
+    def handle(self, *args, **options):
+        clients = options['clients']
+        attempts = options['attempts']
+        rng = random.Random(options['seed'])
+
+        # Email gönderimini kapat (SendGrid key yoksa email servisi erken döner)
+        with override_settings(SENDGRID_API_KEY='', SLOT_ENGINE='materialized'):
+            psychologist, patients, slot_ids = self._create_fixtures(clients, options['slots'])
+            try:
+                results, elapsed = self._run(patients, slot_ids, attempts, rng)
+                self._report(results, elapsed, slot_ids, clients)
+            finally:
+                if not options['keep']:
+                    self._cleanup(psychologist, patients)
+
+    def _create_fixtures(self, clients, slot_count):
+        User = get_user_model()
+        run_id = uuid.uuid4().hex[:8]
+        psychologist = User.objects.create_user(
+            email=f'bench-psy-{run_id}@example.com', is_staff=True, is_patient=False
+        )
+        patients = [
+            User.objects.create_user(email=f'bench-patient-{run_id}-{i}@example.com')
+            for i in range(clients)
+        ]
+        # Gelecekte, birbirini takip eden 1 saatlik slotlar
+        base = (timezone.now() + timedelta(days=365)).replace(minute=0, second=0, microsecond=0)
+        AvailableTimeSlot.objects.bulk_create([
+            AvailableTimeSlot(
+                psychologist=psychologist,
+                start_time=base + timedelta(hours=i),
+                end_time=base + timedelta(hours=i + 1),
+            )
+            for i in range(slot_count)
+        ])
+        slot_ids = list(
+            AvailableTimeSlot.objects.filter(psychologist=psychologist).values_list('id', flat=True)
+        )
+        self.stdout.write(f"{clients} istemci, {len(slot_ids)} slot hazırlandı (psikolog: {psychologist.email})")
+        return psychologist, patients, slot_ids
+
+    def _run(self, patients, slot_ids, attempts, rng):
+        factory = APIRequestFactory()
+        view = AppointmentViewSet.as_view({'post': 'create'})
+        barrier = threading.Barrier(len(patients))
+        results = []
+        results_lock = threading.Lock()
+        # Her istemcinin deneyeceği slotlar önceden seçilir (aynı slotlar için yarış)
+        plans = [[rng.choice(slot_ids) for _ in range(attempts)] for _ in patients]
+
+        def client(patient, plan):
+            local_results = []
+            try:
+                barrier.wait()
+                for slot_id in plan:
+                    request = factory.post('/api/v1/appointments/', {'time_slot_id': slot_id}, format='json')
+                    force_authenticate(request, user=patient)
+                    started = time.perf_counter()
+                    try:
+                        status_code = view(request).status_code
+                    except Exception as e:
+                        status_code = type(e).__name__
+                    local_results.append((status_code, time.perf_counter() - started))
+            finally:
+                connection.close()
+                with results_lock:
+                    results.extend(local_results)
+
+        threads = [
+            threading.Thread(target=client, args=(patient, plan), name=f'BenchClient-{i}')
+            for i, (patient, plan) in enumerate(zip(patients, plans))
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started
+
+    def _report(self, results, elapsed, slot_ids, clients):
+        booked = sum(1 for code, _ in results if code == 201)
+        rejected = sum(1 for code, _ in results if code == 400)
+        errors = len(results) - booked - rejected
+        latencies = sorted(latency for _, latency in results)
+
+        slots = AvailableTimeSlot.objects.filter(id__in=slot_ids)
+        appointments = Appointment.objects.filter(time_slot_id__in=slot_ids).exclude(status='cancelled')
+        double_booked = appointments.values('time_slot_id').annotate(n=Count('id')).filter(n__gt=1).count()
+        has_appointment = Exists(appointments.filter(time_slot_id=OuterRef('pk')))
+        orphan_holds = slots.filter(is_booked=True).exclude(has_appointment).count()
+        unmarked = slots.filter(is_booked=False).filter(has_appointment).count()
+
+        self.stdout.write(f"Süre: {elapsed:.2f} sn, {clients} eşzamanlı istemci")
+        self.stdout.write(f"Deneme: {len(results)}, başarılı: {booked}, dolu (400): {rejected}, hata: {errors}")
+        self.stdout.write(f"Randevu/sn: {booked / elapsed:.1f}, istek/sn: {len(results) / elapsed:.1f}")
+        if latencies:
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+            self.stdout.write(
+                f"Gecikme: medyan {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms"
+            )
+        self.stdout.write(f"Toplam randevu: {appointments.count()} / {len(slot_ids)} slot")
+
+        problems = {
+            'Çift rezervasyon (slot başına >1 randevu)': double_booked,
+            'Randevusu olmayan dolu slot': orphan_holds,
+            'Randevusu olduğu halde boş görünen slot': unmarked,
+        }
+        for label, count in problems.items():
+            style = self.style.ERROR if count else self.style.SUCCESS
+            self.stdout.write(style(f"{label}: {count}"))
+        if errors:
+            codes = sorted({str(code) for code, _ in results if code not in (201, 400)})
+            self.stdout.write(self.style.WARNING(f"Hata türleri: {', '.join(codes)}"))
+
+    def _cleanup(self, psychologist, patients):
+        # Kullanıcılar silinince slotlar, randevular ve ödemeler CASCADE ile silinir
+        get_user_model().objects.filter(id__in=[psychologist.id] + [p.id for p in patients]).delete()
+        self.stdout.write("Benchmark verisi silindi")
@@ -0,0 +1,294 @@
+"""
+Bildirim email'i throughput benchmark'ı
+
+N randevu alınır ve ardından iptal edilir (her biri hasta + psikolog için email üretir).
+Email'ler gerçek gönderim yoluyla (SendGridBackend, süreç içi email havuzu) yerel
+SendGrid test sunucusuna gönderilir. Rapor:
+- randevu ve iptal istekleri/sn
+- gönderilen email/sn, havuz kuyruk bekleme ve gönderim süreleri
+- web worker sürecinin en yüksek thread sayısı ve bellek kullanımı (RSS)
+- test sunucusunun gördüğü HTTP isteği / bağlantı / 429 / 500 sayıları
+
+Kullanım:
+    python manage.py benchmark_email --bookings 500 --clients 8
+    python manage.py benchmark_email --bookings 500 --latency-ms 150 --rate-limit-rate 0.02 --workers 8
+    python manage.py benchmark_email --api-host http://127.0.0.1:8025   # ayrı çalışan sendgrid_standin
+
+Benchmark kendi test kullanıcılarını ve slotlarını oluşturur, bitince siler (--keep hariç).
+Email havuzu ayarları (--workers, --queue, --overflow) sadece bu çalıştırma için geçerlidir.
+SQLite tek yazıcıya izin verdiği için eşzamanlı isteklerde 'database is locked' hataları
+görülebilir; gerçek sonuç için PostgreSQL ile çalıştırılmalıdır.
+"""
+import json
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from appointments.email_executor import get_email_executor, reset_email_executor
+from appointments.models import AvailableTimeSlot, EmailOutbox
+from appointments.sendgrid_standin import start_in_thread
+from appointments.views import AppointmentViewSet
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_FROM_EMAIL = 'benchmark@example.com'
+
+
+class ProcessSampler:
+    """Süreçteki thread sayısını ve RSS'i arka planda örnekler"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='BenchSampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @staticmethod
+    def peak_rss_mb():
+        if resource is None:
+            return None
+        # Linux'ta KB cinsinden (macOS'ta byte)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = "Randevu alma/iptal bildirim email'lerinin throughput benchmark'ı (yerel SendGrid test sunucusu ile)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=200, help='Alınıp iptal edilecek randevu sayısı')
+        parser.add_argument('--clients', type=int, default=4, help='Eşzamanlı istemci (thread) sayısı')
+        parser.add_argument('--api-host', default=None, help='Ayrı çalışan test sunucusu (verilmezse süreç içinde başlatılır)')
+        parser.add_argument('--latency-ms', type=float, default=50.0, help='Test sunucusu gecikmesi (ms)')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Test sunucusu 500 oranı (0-1)')
+        parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Test sunucusu 429 oranı (0-1)')
+        parser.add_argument('--workers', type=int, default=None, help='EMAIL_EXECUTOR_MAX_WORKERS')
+        parser.add_argument('--queue', type=int, default=None, help='EMAIL_EXECUTOR_MAX_QUEUE')
+        parser.add_argument('--overflow', choices=['spill', 'drop'], default=None, help='EMAIL_EXECUTOR_OVERFLOW')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Email kuyruğunun boşalması için en fazla bekleme (sn)')
+        parser.add_argument('--keep', action='store_true', help='Benchmark verisini silme')
+
+    def handle(self, *args, **options):
+        server = None
+        api_host = options['api_host']
+        if api_host is None:
+            server = start_in_thread(
+                latency=options['latency_ms'] / 1000,
+                error_rate=options['error_rate'],
+                rate_limit_rate=options['rate_limit_rate'],
+            )
+            api_host = server.url
+        self.stdout.write(f"SendGrid test sunucusu: {api_host}")
+
+        executor_settings = {
+            name: options[option]
+            for name, option in (
+                ('EMAIL_EXECUTOR_MAX_WORKERS', 'workers'),
+                ('EMAIL_EXECUTOR_MAX_QUEUE', 'queue'),
+                ('EMAIL_EXECUTOR_OVERFLOW', 'overflow'),
+            )
+            if options[option] is not None
+        }
+        email_settings = override_settings(
+            EMAIL_BACKEND='appointments.email_backend.SendGridBackend',
+            SENDGRID_API_KEY='benchmark',
+            SENDGRID_API_HOST=api_host,
+            DEFAULT_FROM_EMAIL=BENCHMARK_FROM_EMAIL,
+            EMAIL_DELIVERY='thread',
+            SLOT_ENGINE='materialized',
+            **executor_settings,
+        )
+        psychologist, patients, slot_ids = self._create_fixtures(options['bookings'], options['clients'])
+        try:
+            with email_settings:
+                # Havuz bu çalıştırmanın ayarlarıyla yeniden kurulsun
+                reset_email_executor()
+                try:
+                    self._run(patients, slot_ids, options['timeout'])
+                finally:
+                    reset_email_executor(timeout=options['timeout'])
+            self._report_server(server, api_host)
+        finally:
+            if not options['keep']:
+                self._cleanup(psychologist, patients)
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+    def _create_fixtures(self, bookings, clients):
+        User = get_user_model()
+        run_id = uuid.uuid4().hex[:8]
+        psychologist = User.objects.create_user(
+            email=f'bench-psy-{run_id}@example.com', first_name='Benchmark', is_staff=True, is_patient=False
+        )
+        patients = [
+            User.objects.create_user(email=f'bench-patient-{run_id}-{i}@example.com', first_name='Hasta', last_name=str(i))
+            for i in range(clients)
+        ]
+        base = (timezone.now() + timedelta(days=365)).replace(minute=0, second=0, microsecond=0)
+        AvailableTimeSlot.objects.bulk_create([
+            AvailableTimeSlot(
+                psychologist=psychologist,
+                start_time=base + timedelta(hours=i),
+                end_time=base + timedelta(hours=i, minutes=50),
+            )
+            for i in range(bookings)
+        ])
+        slot_ids = list(
+            AvailableTimeSlot.objects.filter(psychologist=psychologist).order_by('id').values_list('id', flat=True)
+        )
+        self.stdout.write(f"{len(slot_ids)} slot, {clients} istemci hazırlandı")
+        return psychologist, patients, slot_ids
+
+    def _drive(self, patients, plans, make_request):
+        """Her hasta kendi planını sırayla işler; [(hasta, durum, yanıt verisi)] ve süreyi döndürür"""
+        results = []
+        results_lock = threading.Lock()
+
+        def client(patient, plan):
+            local_results = []
+            try:
+                for item in plan:
+                    try:
+                        response = make_request(patient, item)
+                        local_results.append((patient, response.status_code, response.data))
+                    except Exception as e:
+                        local_results.append((patient, type(e).__name__, None))
+            finally:
+                connection.close()
+                with results_lock:
+                    results.extend(local_results)
+
+        threads = [
+            threading.Thread(target=client, args=(patient, plan), name=f'BenchClient-{i}')
+            for i, (patient, plan) in enumerate(zip(patients, plans))
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started
+
+    def _run(self, patients, slot_ids, timeout):
+        factory = APIRequestFactory()
+        create_view = AppointmentViewSet.as_view({'post': 'create'})
+        cancel_view = AppointmentViewSet.as_view({'post': 'cancel'})
+
+        def book(patient, slot_id):
+            request = factory.post('/api/v1/appointments/', {'time_slot_id': slot_id}, format='json')
+            force_authenticate(request, user=patient)
+            return create_view(request)
+
+        def cancel(patient, appointment_id):
+            request = factory.post(f'/api/v1/appointments/{appointment_id}/cancel/')
+            force_authenticate(request, user=patient)
+            return cancel_view(request, pk=appointment_id)
+
+        executor = get_email_executor()
+        with ProcessSampler() as sampler:
+            started = time.perf_counter()
+            # Her istemci kendi slot dilimini alır; randevuyu yine aynı hasta iptal eder
+            booked, booking_time = self._drive(patients, [slot_ids[i::len(patients)] for i in range(len(patients))], book)
+            booked_by_patient = {patient.id: [] for patient in patients}
+            for patient, code, data in booked:
+                if code == 201:
+                    booked_by_patient[patient.id].append(data['id'])
+            cancelled, cancel_time = self._drive(
+                patients, [booked_by_patient[patient.id] for patient in patients], cancel
+            )
+            requests_done = time.perf_counter()
+            drained = self._wait_for_emails(executor, timeout)
+            finished = time.perf_counter()
+            stats = executor.stats()
+
+        ok_bookings = sum(len(ids) for ids in booked_by_patient.values())
+        ok_cancels = sum(1 for _, code, _ in cancelled if code == 200)
+        self.stdout.write(
+            f"Randevu: {ok_bookings}/{len(slot_ids)} başarılı, {len(booked) / booking_time:.1f} istek/sn"
+        )
+        if cancelled:
+            self.stdout.write(
+                f"İptal: {ok_cancels}/{ok_bookings} başarılı, {len(cancelled) / cancel_time:.1f} istek/sn"
+            )
+        failures = sorted({str(code) for _, code, _ in booked + cancelled if code not in (200, 201)})
+        if failures:
+            self.stdout.write(self.style.WARNING(f"Hatalı istek türleri: {', '.join(failures)}"))
+        self.stdout.write(
+            f"Email: gönderilen {stats['sent']}, başarısız {stats['failed']}, "
+            f"outbox'a aktarılan {stats['spilled']}, atılan {stats['dropped']}"
+        )
+        total = finished - started
+        self.stdout.write(
+            f"Email/sn: {stats['sent'] / total:.1f} (toplam {total:.2f} sn; istekler bittikten sonra kuyruğun "
+            f"boşalması {finished - requests_done:.2f} sn{'' if drained else ', ZAMAN AŞIMI'})"
+        )
+        self.stdout.write(
+            f"Kuyruk bekleme: ort {stats['queue_wait_avg'] * 1000:.1f} ms, en fazla {stats['queue_wait_max'] * 1000:.1f} ms; "
+            f"gönderim: ort {stats['send_time_avg'] * 1000:.1f} ms, en fazla {stats['send_time_max'] * 1000:.1f} ms; "
+            f"en derin kuyruk {stats['max_depth']} iş"
+        )
+        rss = ProcessSampler.peak_rss_mb()
+        self.stdout.write(
+            f"Süreç: en fazla {sampler.peak_threads} thread "
+            f"(havuz {stats['max_workers']} thread, kuyruk sınırı {stats['max_queue']})"
+            + (f", en yüksek RSS {rss:.1f} MB" if rss is not None else "")
+        )
+
+    def _wait_for_emails(self, executor, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            stats = executor.stats()
+            if stats['depth'] == 0 and stats['sent'] + stats['failed'] >= stats['submitted']:
+                return True
+            time.sleep(0.02)
+        return False
+
+    def _report_server(self, server, api_host):
+        if server is not None:
+            counters = server.stats.snapshot()
+        else:
+            try:
+                with urllib.request.urlopen(f'{api_host}/stats', timeout=5) as response:
+                    counters = json.load(response)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"Test sunucusu sayaçları okunamadı: {e}"))
+                return
+        self.stdout.write(
+            f"Test sunucusu: {counters['requests']} HTTP isteği, {counters['connections']} bağlantı, "
+            f"{counters['messages']} mesaj, 429: {counters['rate_limited']}, 500: {counters['errors']}"
+        )
+
+    def _cleanup(self, psychologist, patients):
+        # Kullanıcılar silinince slotlar, randevular ve ödemeler CASCADE ile silinir.
+        # Silinen randevular için iptal email'i gitmesin (SendGrid key yoksa email servisi erken döner)
+        with override_settings(SENDGRID_API_KEY=''):
+            get_user_model().objects.filter(id__in=[psychologist.id] + [p.id for p in patients]).delete()
+        # Kuyruk dolduğunda outbox'a aktarılan benchmark email'leri
+        EmailOutbox.objects.filter(from_email=BENCHMARK_FROM_EMAIL).delete()
+        self.stdout.write("Benchmark verisi silindi")
+
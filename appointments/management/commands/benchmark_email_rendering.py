@@ -0,0 +1,132 @@
+"""
+Email render mikro-benchmark'ı
+
+"Randevu oluşturuldu" bildiriminin (hasta + psikolog, metin + HTML) hazırlanma hızını
+iki yöntemle ölçer ve saniyedeki olay sayısını raporlar:
+- eski: her olayda render_to_string ile 4 şablon, ay tablosunun yeniden kurulması ve
+  strftime('%B') + replace döngüsü ile Türkçe tarih
+- yeni: appointments/notifications.py (süreç başına derlenmiş şablonlar, hazır ay tablosu,
+  olay başına bir kez kurulan ortak bağlam)
+
+Kullanım:
+    python manage.py benchmark_email_rendering --events 2000
+
+Veritabanı kullanılmaz; randevular bellekte oluşturulur. Email gönderilmez.
+"""
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from appointments.models import Appointment, AvailableTimeSlot
+from appointments.notifications import NotificationContext, format_turkish_date, render_message
+
+
+def legacy_render(appointment):
+    """Önceki send_appointment_created_email'deki hazırlık adımlarının birebir kopyası"""
+    patient = appointment.patient
+    psychologist = appointment.time_slot.psychologist
+    time_slot = appointment.time_slot
+
+    turkish_months = {
+        'January': 'Ocak', 'February': 'Şubat', 'March': 'Mart',
+        'April': 'Nisan', 'May': 'Mayıs', 'June': 'Haziran',
+        'July': 'Temmuz', 'August': 'Ağustos', 'September': 'Eylül',
+        'October': 'Ekim', 'November': 'Kasım', 'December': 'Aralık'
+    }
+
+    def format_turkish_date(dt):
+        date_str = dt.strftime('%d %B %Y')
+        time_str = dt.strftime('%H:%M')
+        for en_month, tr_month in turkish_months.items():
+            date_str = date_str.replace(en_month, tr_month)
+        return date_str, time_str
+
+    appointment_date, appointment_time = format_turkish_date(time_slot.start_time)
+    appointment_datetime = f"{appointment_date}, {appointment_time}"
+    payment_deadline_date, payment_deadline_time = format_turkish_date(time_slot.start_time - timedelta(hours=24))
+    payment_deadline_datetime = f"{payment_deadline_date}, {payment_deadline_time}"
+    patient_name = ' '.join(p for p in [patient.first_name, patient.last_name] if p) or patient.email
+
+    patient_context = {
+        'patient_name': patient_name,
+        'appointment_date': appointment_date,
+        'appointment_time': appointment_time,
+        'appointment_datetime': appointment_datetime,
+        'payment_deadline_date': payment_deadline_date,
+        'payment_deadline_time': payment_deadline_time,
+        'payment_deadline_datetime': payment_deadline_datetime,
+        'notes': appointment.notes or 'Not bırakılmadı',
+        'psychologist_name': psychologist.first_name or psychologist.email,
+    }
+    psychologist_context = dict(
+        patient_context,
+        patient_email=patient.email,
+        patient_phone=patient.phone_number or 'Belirtilmemiş',
+    )
+    return [
+        render_to_string('emails/appointment_created_patient.txt', patient_context),
+        render_to_string('emails/appointment_created_patient.html', patient_context),
+        render_to_string('emails/appointment_created_psychologist.txt', psychologist_context),
+        render_to_string('emails/appointment_created_psychologist.html', psychologist_context),
+    ]
+
+
+def current_render(appointment):
+    """send_appointment_created_email'in hazırlık adımları (gönderim hariç)"""
+    ctx = NotificationContext(appointment)
+    deadline_date, deadline_time = format_turkish_date(appointment.time_slot.start_time - timedelta(hours=24))
+    extra = {
+        'payment_deadline_date': deadline_date,
+        'payment_deadline_time': deadline_time,
+        'payment_deadline_datetime': f"{deadline_date}, {deadline_time}",
+        'notes': appointment.notes or 'Not bırakılmadı',
+    }
+    return [
+        render_message('appointment_created_patient', 'Randevu Onayı', ctx.patient_context(**extra), ctx.patient.email),
+        render_message('appointment_created_psychologist', 'Yeni Randevu', ctx.psychologist_context(**extra), ctx.psychologist.email),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Email şablonu hazırlama hızını (olay/sn) eski ve yeni yöntemle karşılaştırır"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=2000, help='Ölçülecek bildirim olayı sayısı')
+        parser.add_argument('--warmup', type=int, default=50, help='Ölçüm öncesi ısınma olayı sayısı')
+
+    def handle(self, *args, **options):
+        appointments = self._appointments(options['events'])
+        # Gerçek ortamdaki gibi DEFAULT_FROM_EMAIL tanımlı olsun
+        with override_settings(DEFAULT_FROM_EMAIL='benchmark@example.com'):
+            results = {}
+            for label, render in (('eski', legacy_render), ('yeni', current_render)):
+                for appointment in appointments[:options['warmup']]:
+                    render(appointment)
+                started = time.perf_counter()
+                for appointment in appointments:
+                    render(appointment)
+                elapsed = time.perf_counter() - started
+                results[label] = len(appointments) / elapsed
+                # Olay başına 4 şablon (hasta/psikolog x metin/HTML)
+                self.stdout.write(
+                    f"{label:>4}: {results[label]:>9.0f} olay/sn  ({results[label] * 4:>9.0f} şablon/sn, "
+                    f"{elapsed * 1e6 / len(appointments):.0f} µs/olay)"
+                )
+        self.stdout.write(self.style.SUCCESS(f"Hızlanma: {results['yeni'] / results['eski']:.2f}x"))
+
+    def _appointments(self, count):
+        User = get_user_model()
+        psychologist = User(email='psikolog@example.com', first_name='Ayşe', is_staff=True)
+        base = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        appointments = []
+        for i in range(count):
+            patient = User(email=f'hasta{i}@example.com', first_name='Hasta', last_name=str(i), phone_number='05550000000')
+            start = base + timedelta(hours=i)
+            slot = AvailableTimeSlot(psychologist=psychologist, start_time=start, end_time=start + timedelta(minutes=50))
+            appointments.append(Appointment(patient=patient, time_slot=slot, notes='Not' if i % 2 else None))
+        return appointments
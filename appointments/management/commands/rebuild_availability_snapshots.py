@@ -0,0 +1,29 @@
+"""
+Müsaitlik özetlerini (AvailabilitySnapshot) sıfırdan kurar ve doğrular
+
+Kullanım:
+    python manage.py rebuild_availability_snapshots          # kur + doğrula
+    python manage.py rebuild_availability_snapshots --check  # sadece doğrula (tutarsızlıkta hata kodu)
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.snapshots import rebuild_all_snapshots, verify_snapshots
+
+
+class Command(BaseCommand):
+    help = "Psikolog bazlı müsaitlik özetlerini AvailableTimeSlot tablosundan yeniden kurar ve doğrular"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Yeniden kurmadan sadece tutarlılığı kontrol et')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            count = rebuild_all_snapshots()
+            self.stdout.write(f"{count} psikoloğun müsaitlik özeti yeniden kuruldu")
+
+        problems = verify_snapshots()
+        for psychologist_id, description in problems.items():
+            self.stdout.write(self.style.ERROR(f"Psikolog {psychologist_id}: {description}"))
+        if problems:
+            raise CommandError(f"{len(problems)} psikoloğun özeti tutarsız")
+        self.stdout.write(self.style.SUCCESS("Müsaitlik özetleri tutarlı"))
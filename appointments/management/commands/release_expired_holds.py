@@ -0,0 +1,27 @@
+"""
+Süresi dolan ödeme bekletmelerini serbest bırakır
+
+Ödenmemiş randevular (pending_payment) hold_expires_at zamanında iptal edilir,
+slotları tekrar müsait olur, bekleyen ödemeleri iptal edilir ve hasta/psikoloğa
+email gönderilir. Periyodik çalıştırılmalıdır (ör. cron ile her 5 dakikada):
+
+    */5 * * * * python manage.py release_expired_holds
+"""
+from django.core.management.base import BaseCommand
+
+from appointments.cancellation_service import HOLD_RELEASE_BATCH_SIZE, expired_holds, release_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Ödeme süresi dolan randevuların slotlarını partiler halinde serbest bırakır"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=HOLD_RELEASE_BATCH_SIZE, help='Transaction başına randevu sayısı')
+        parser.add_argument('--dry-run', action='store_true', help='Sadece süresi dolan bekletme sayısını göster')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f"Süresi dolan ödeme bekletmesi: {expired_holds().count()}")
+            return
+        released = release_expired_holds(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{released} ödeme bekletmesi serbest bırakıldı"))
@@ -0,0 +1,37 @@
+"""
+Bekleyen randevularin fiyatini yeniden hesaplar
+
+Saatlik ucret admin panelinden/API'den degistiginde signal bu islemi otomatik yapar.
+Komut; ucret dogrudan veritabanindan degistirildiginde veya farkli bir ucretle
+toplu guncelleme gerektiginde elle calistirmak icindir.
+
+Kullanım:
+    python manage.py reprice_appointments
+    python manage.py reprice_appointments --rate 750.00
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.pricing import invalidate_hourly_rate, reprice_pending_appointments
+
+
+class Command(BaseCommand):
+    help = "Odemesi beklenen randevularin fiyatini guncel saatlik ucretle tek UPDATE ile yeniler"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=str, default=None, help='Kullanilacak saatlik ucret (varsayilan: kayitli ucret)')
+
+    def handle(self, *args, **options):
+        rate = options['rate']
+        if rate is not None:
+            try:
+                rate = Decimal(rate)
+            except InvalidOperation:
+                raise CommandError(f"Gecersiz ucret: {rate}")
+        else:
+            # Veritabanindaki guncel degeri oku (onbellekteki eski deger kullanilmasin)
+            invalidate_hourly_rate()
+
+        updated = reprice_pending_appointments(rate)
+        self.stdout.write(self.style.SUCCESS(f"{updated} randevunun fiyati guncellendi"))
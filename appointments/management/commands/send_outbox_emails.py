@@ -0,0 +1,49 @@
+"""
+Email outbox worker'ı (EMAIL_DELIVERY='outbox')
+
+Bekleyen email'leri partiler halinde alır (PostgreSQL'de SKIP LOCKED, her veritabanında
+kiralama zamanı ile) ve tek email bağlantısı üzerinden gönderir. Başarısız gönderimler
+üstel bekleme ile tekrar denenir. Birden fazla worker aynı anda çalıştırılabilir.
+
+Kullanım:
+    python manage.py send_outbox_emails                # sürekli çalışır (ayrı süreç/servis olarak)
+    python manage.py send_outbox_emails --once         # bekleyenleri gönderip çıkar (cron)
+    python manage.py send_outbox_emails --batch-size 200 --sleep 2
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from appointments.outbox import DEFAULT_BATCH_SIZE, claim_batch, deliver_batch, process_outbox
+
+
+class Command(BaseCommand):
+    help = "Email outbox kuyruğundaki email'leri partiler halinde gönderir"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Parti başına email sayısı')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Kuyruk boşken bekleme süresi (saniye)')
+        parser.add_argument('--once', action='store_true', help='Bekleyen email\'leri gönderip çık')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['once']:
+            sent, failed = process_outbox(batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f"{sent} email gönderildi, {failed} başarısız"))
+            return
+
+        stopping = []
+        # SIGTERM/SIGINT: elindeki partiyi bitirip çık (kiralanmış satırlar yarıda kalmaz)
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+        signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+        self.stdout.write(f"Outbox worker başladı (parti: {batch_size})")
+        while not stopping:
+            rows = claim_batch(batch_size)
+            if not rows:
+                time.sleep(options['sleep'])
+                continue
+            sent, failed = deliver_batch(rows)
+            self.stdout.write(f"{sent} email gönderildi, {failed} başarısız")
+        self.stdout.write("Outbox worker durdu")
@@ -0,0 +1,50 @@
+"""
+Psikolog özet (digest) email'lerini gönderir
+
+Özet modunu açan psikologlar (CustomUser.email_digest) için biriken randevu, iptal,
+taşıma ve ödeme bildirimlerini psikolog başına tek email olarak gönderir
+(bkz. appointments/digest.py).
+
+Kullanım:
+    python manage.py send_psychologist_digests                 # her PSYCHOLOGIST_DIGEST_MINUTES dakikada bir (ayrı süreç/servis)
+    python manage.py send_psychologist_digests --interval 30
+    python manage.py send_psychologist_digests --once          # biriken özetleri gönderip çıkar (cron)
+"""
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from appointments.digest import flush_digests
+
+
+class Command(BaseCommand):
+    help = "Psikolog başına biriken bildirimleri tek özet email'i olarak gönderir"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Gönderim aralığı (dakika, varsayılan PSYCHOLOGIST_DIGEST_MINUTES)',
+        )
+        parser.add_argument('--once', action='store_true', help='Biriken özetleri gönderip çık')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self._flush()
+            return
+
+        interval = options['interval'] or getattr(settings, 'PSYCHOLOGIST_DIGEST_MINUTES', 60)
+        stopping = threading.Event()
+        # SIGTERM/SIGINT: beklemeyi bırakıp çık (gönderim yarıda kesilmez)
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+        self.stdout.write(f"Özet gönderimi başladı (her {interval:g} dakikada)")
+        while not stopping.wait(interval * 60):
+            self._flush()
+        self.stdout.write("Özet gönderimi durdu")
+
+    def _flush(self):
+        digests, events = flush_digests()
+        self.stdout.write(self.style.SUCCESS(f"{digests} özet email'i gönderildi ({events} bildirim)"))
@@ -0,0 +1,40 @@
+"""
+Yaklaşan randevular için hastalara hatırlatma email'i gönderir
+
+Seansı önümüzdeki REMINDER_LEAD_HOURS saat (varsayılan 24) içinde başlayan ödenmiş
+randevular partiler halinde okunur, her randevu için bir kez hatırlatma gönderilir
+(bkz. appointments/reminders.py). Periyodik çalıştırılmalıdır (ör. cron ile her 15 dakikada);
+yarıda kesilip tekrar çalıştırılması güvenlidir.
+
+Kullanım:
+    */15 * * * * python manage.py send_reminders
+    python manage.py send_reminders --chunk-size 1000 --hours 24
+    python manage.py send_reminders --dry-run
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from appointments.email_service import _email_settings_ready
+from appointments.reminders import DEFAULT_CHUNK_SIZE, due_reminders, send_reminders
+
+
+class Command(BaseCommand):
+    help = "Yaklaşan ödenmiş randevular için hatırlatma email'lerini partiler halinde gönderir"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Parti başına randevu sayısı')
+        parser.add_argument('--hours', type=float, default=None, help='Kaç saat içindeki randevular (varsayılan REMINDER_LEAD_HOURS)')
+        parser.add_argument('--dry-run', action='store_true', help='Sadece hatırlatma bekleyen randevu sayısını göster')
+
+    def handle(self, *args, **options):
+        lead = timedelta(hours=options['hours']) if options['hours'] is not None else None
+        if options['dry_run']:
+            self.stdout.write(f"Hatırlatma bekleyen randevu: {due_reminders(lead=lead).count()}")
+            return
+        if not _email_settings_ready():
+            self.stdout.write(self.style.ERROR("Email ayarları eksik, hatırlatma gönderilmedi"))
+            return
+        sent, failed = send_reminders(chunk_size=options['chunk_size'], lead=lead)
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(f"{sent} hatırlatma gönderildi, {failed} başarısız"))
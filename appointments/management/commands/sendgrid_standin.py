@@ -0,0 +1,46 @@
+"""
+Yerel SendGrid test sunucusu (bkz. appointments/sendgrid_standin.py)
+
+Gerçek email göndermeden bildirim yük testi için. Uygulama sunucusu
+SENDGRID_API_HOST=http://127.0.0.1:8025 ile başlatılır; email'ler bu sunucuya gider.
+
+Kullanım:
+    python manage.py sendgrid_standin --port 8025
+    python manage.py sendgrid_standin --latency-ms 120 --error-rate 0.01 --rate-limit-rate 0.05
+
+Sayaçlar: curl http://127.0.0.1:8025/stats (Ctrl+C ile kapatınca da yazdırılır)
+"""
+from django.core.management.base import BaseCommand
+
+from appointments.sendgrid_standin import StandinServer
+
+
+class Command(BaseCommand):
+    help = "SendGrid v3 /mail/send uç noktasını taklit eden yerel HTTP sunucusu"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8025)
+        parser.add_argument('--latency-ms', type=float, default=0.0, help='İstek başına yapay gecikme (ms)')
+        parser.add_argument('--jitter', type=float, default=0.1, help='Gecikmenin standart sapma oranı')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='500 döndürülecek istek oranı (0-1)')
+        parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='429 döndürülecek istek oranı (0-1)')
+        parser.add_argument('--verbose', action='store_true', help='Her isteği logla')
+
+    def handle(self, *args, **options):
+        server = StandinServer(
+            (options['host'], options['port']),
+            latency=options['latency_ms'] / 1000,
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            rate_limit_rate=options['rate_limit_rate'],
+            verbose=options['verbose'],
+        )
+        self.stdout.write(f"SendGrid test sunucusu: {server.url} (SENDGRID_API_HOST={server.url})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Sayaçlar: {server.stats.snapshot()}")
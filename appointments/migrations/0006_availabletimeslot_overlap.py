@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Aynı psikoloğun slotlarının çakışmasını veritabanı seviyesinde engeller.
+# Sadece PostgreSQL'de uygulanır; SQLite'ta kontrol view içinde transaction ile yapılır.
+CREATE_OVERLAP_CONSTRAINT = """
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE appointments_availabletimeslot
+    ADD CONSTRAINT slot_no_overlap_per_psychologist
+    EXCLUDE USING gist (
+        psychologist_id WITH =,
+        tstzrange(start_time, end_time, '[)') WITH &&
+    );
+"""
+
+DROP_OVERLAP_CONSTRAINT = """
+ALTER TABLE appointments_availabletimeslot
+    DROP CONSTRAINT IF EXISTS slot_no_overlap_per_psychologist;
+"""
+
+
+def add_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_OVERLAP_CONSTRAINT)
+
+
+def remove_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_OVERLAP_CONSTRAINT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_appointment_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='availabletimeslot',
+            index=models.Index(fields=['psychologist', 'end_time', 'start_time'], name='slot_psych_end_start_idx'),
+        ),
+        migrations.RunPython(add_overlap_constraint, remove_overlap_constraint),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_availabletimeslot_overlap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.JSONField(default=list, help_text='Haftanın günleri (0=Pazartesi ... 6=Pazar)')),
+                ('day_start', models.TimeField(help_text='Günlük çalışma başlangıcı (yerel saat)')),
+                ('day_end', models.TimeField(help_text='Günlük çalışma bitişi (yerel saat)')),
+                ('session_minutes', models.PositiveSmallIntegerField(default=50, help_text='Seans süresi (dakika)')),
+                ('break_minutes', models.PositiveSmallIntegerField(default=0, help_text='Seanslar arası ara (dakika)')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('blackouts', models.JSONField(blank=True, default=list, help_text='Hariç tutulacak aralıklar: [{"start": ISO, "end": ISO}]')),
+                ('timezone', models.CharField(default='Europe/Istanbul', help_text='Saatlerin yorumlanacağı zaman dilimi', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('psychologist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_rules', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
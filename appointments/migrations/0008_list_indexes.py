@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_schedulerule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-created_at', 'id'], name='appt_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', '-created_at', 'id'], name='appt_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', '-created_at'], name='appt_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='availabletimeslot',
+            index=models.Index(fields=['psychologist', 'start_time'], name='slot_psych_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='availabletimeslot',
+            index=models.Index(fields=['start_time'], name='slot_start_idx'),
+        ),
+    ]
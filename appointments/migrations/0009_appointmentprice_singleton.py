@@ -0,0 +1,24 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def create_price_setting(apps, schema_editor):
+    """
+    Fiyat ayari (singleton) kaydini migrate sirasinda bir kez olustur.
+    Boylece GET isteklerinde veya fiyat hesaplanirken kayit olusturulmaz.
+    """
+    AppointmentPrice = apps.get_model('appointments', 'AppointmentPrice')
+    if not AppointmentPrice.objects.exists():
+        AppointmentPrice.objects.create(hourly_rate=Decimal('500.00'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0008_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_price_setting, migrations.RunPython.noop),
+    ]
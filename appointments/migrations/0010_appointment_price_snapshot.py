@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:55
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+
+def backfill_price_snapshot(apps, schema_editor):
+    """
+    Mevcut randevular icin sure ve fiyati, o anki saatlik ucretle (ekranda gosterilen deger) doldur.
+    """
+    Appointment = apps.get_model('appointments', 'Appointment')
+    AppointmentPrice = apps.get_model('appointments', 'AppointmentPrice')
+    hourly_rate = AppointmentPrice.objects.values_list('hourly_rate', flat=True).first() or Decimal('500.00')
+
+    batch = []
+    for appointment in Appointment.objects.select_related('time_slot').filter(price__isnull=True).iterator(chunk_size=500):
+        duration = appointment.time_slot.end_time - appointment.time_slot.start_time
+        appointment.duration_minutes = int(duration.total_seconds() // 60)
+        appointment.price = (Decimal(appointment.duration_minutes) * hourly_rate / Decimal(60)).quantize(
+            Decimal('0.01'), rounding=ROUND_HALF_UP
+        )
+        batch.append(appointment)
+        if len(batch) >= 500:
+            Appointment.objects.bulk_update(batch, ['duration_minutes', 'price'])
+            batch = []
+    if batch:
+        Appointment.objects.bulk_update(batch, ['duration_minutes', 'price'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0009_appointmentprice_singleton'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(blank=True, help_text='Randevu alindigi andaki seans suresi (dakika)', null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Randevu alindigi andaki fiyat (TL)', max_digits=10, null=True),
+        ),
+        migrations.RunPython(backfill_price_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0010_appointment_price_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='availabletimeslot',
+            index=models.Index(condition=models.Q(('is_booked', False)), fields=['start_time', 'psychologist'], name='slot_free_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='availabletimeslot',
+            index=models.Index(condition=models.Q(('is_booked', False)), fields=['psychologist', 'start_time'], name='slot_free_psych_start_idx'),
+        ),
+    ]
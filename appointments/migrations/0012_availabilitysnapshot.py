@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from datetime import datetime, timezone
+
+
+def build_snapshots(apps, schema_editor):
+    """Mevcut boş slotlardan psikolog bazlı müsaitlik özetlerini kur (bkz. appointments/snapshots.py)"""
+    AvailableTimeSlot = apps.get_model('appointments', 'AvailableTimeSlot')
+    AvailabilitySnapshot = apps.get_model('appointments', 'AvailabilitySnapshot')
+
+    def fmt(value):
+        return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+    entries_by_psychologist = {}
+    rows = (
+        AvailableTimeSlot.objects.filter(is_booked=False, start_time__gte=datetime.now(timezone.utc))
+        .order_by('start_time', 'id')
+        .values_list('psychologist_id', 'id', 'start_time', 'end_time')
+    )
+    for psychologist_id, slot_id, start, end in rows.iterator():
+        entries_by_psychologist.setdefault(psychologist_id, []).append([slot_id, fmt(start), fmt(end)])
+
+    AvailabilitySnapshot.objects.bulk_create([
+        AvailabilitySnapshot(
+            psychologist_id=psychologist_id,
+            free_slots=entries,
+            next_available_at=datetime.fromisoformat(entries[0][1]),
+        )
+        for psychologist_id, entries in entries_by_psychologist.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0011_slot_search_indexes'),
+        ('users', '0006_alter_customuser_username'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilitySnapshot',
+            fields=[
+                ('psychologist', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='availability_snapshot', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('free_slots', models.JSONField(blank=True, default=list)),
+                ('next_available_at', models.DateTimeField(blank=True, db_index=True, help_text='Son güncellemedeki ilk boş slot', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(build_snapshots, migrations.RunPython.noop),
+    ]
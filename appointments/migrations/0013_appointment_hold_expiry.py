@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_hold_expires_at(apps, schema_editor):
+    """Odemesi bekleyen mevcut randevular icin son odeme zamani: seanstan PAYMENT_DEADLINE_HOURS saat once"""
+    Appointment = apps.get_model('appointments', 'Appointment')
+    AvailableTimeSlot = apps.get_model('appointments', 'AvailableTimeSlot')
+    slot_start = models.Subquery(
+        AvailableTimeSlot.objects.filter(pk=models.OuterRef('time_slot_id')).values('start_time')[:1]
+    )
+    deadline = timedelta(hours=getattr(settings, 'PAYMENT_DEADLINE_HOURS', 24))
+    Appointment.objects.filter(status='pending_payment', hold_expires_at__isnull=True).update(
+        hold_expires_at=models.ExpressionWrapper(slot_start - deadline, output_field=models.DateTimeField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0012_availabilitysnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, help_text='Odeme yapilmazsa slotun serbest birakilacagi zaman', null=True),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='time_slot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='appointments.availabletimeslot'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'pending_payment')), fields=['hold_expires_at'], name='appt_hold_expiry_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'cancelled'), _negated=True), fields=('time_slot',), name='appt_active_slot_uniq'),
+        ),
+        migrations.RunPython(backfill_hold_expires_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0013_appointment_hold_expiry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'cancelled'), _negated=True), fields=['-created_at', 'id'], name='appt_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'cancelled'), _negated=True), fields=['patient', '-created_at', 'id'], name='appt_active_patient_idx'),
+        ),
+    ]
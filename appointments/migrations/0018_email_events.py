@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0017_digest_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sg_event_id', models.CharField(max_length=100, unique=True)),
+                ('sg_message_id', models.CharField(blank=True, max_length=255)),
+                ('email', models.CharField(max_length=254)),
+                ('event', models.CharField(max_length=20)),
+                ('timestamp', models.DateTimeField()),
+                ('reason', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'verbose_name': 'Email Olayi',
+                'verbose_name_plural': 'Email Olaylari',
+                'indexes': [models.Index(fields=['sg_message_id'], name='email_event_msg_idx'), models.Index(fields=['email', 'timestamp'], name='email_event_email_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='EmailEventCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.CharField(max_length=254)),
+                ('event', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('last_event_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Email Olay Sayaci',
+                'verbose_name_plural': 'Email Olay Sayaclari',
+                'constraints': [models.UniqueConstraint(fields=('email', 'event'), name='email_event_count_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:33
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+
+
+def _rule_intervals(rule):
+    """
+    Kuralın ürettiği (start, end) UTC aralıkları. Migration'ın davranışı uygulama kodundaki
+    değişikliklerden etkilenmesin diye appointments.scheduling.iter_rule_intervals'ın bu
+    migration anındaki halinin kopyasıdır (pencere parametreleri olmadan).
+    """
+    tz = ZoneInfo(rule.timezone)
+    session = timedelta(minutes=rule.session_minutes)
+    step = session + timedelta(minutes=rule.break_minutes)
+    weekdays = set(rule.weekdays)
+
+    blackouts = []
+    for item in rule.blackouts or []:
+        start, end = parse_datetime(item['start']), parse_datetime(item['end'])
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=tz)
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=tz)
+        blackouts.append((start.astimezone(dt_timezone.utc), end.astimezone(dt_timezone.utc)))
+    blackouts.sort()
+    blackout_index = 0
+
+    day = rule.start_date
+    while day <= rule.end_date:
+        if day.weekday() in weekdays:
+            local_start = datetime.combine(day, rule.day_start, tzinfo=tz)
+            local_day_end = datetime.combine(day, rule.day_end, tzinfo=tz)
+            while local_start + session <= local_day_end:
+                start = local_start.astimezone(dt_timezone.utc)
+                end = (local_start + session).astimezone(dt_timezone.utc)
+                local_start += step
+                while blackout_index < len(blackouts) and blackouts[blackout_index][1] <= start:
+                    blackout_index += 1
+                if blackout_index < len(blackouts) and blackouts[blackout_index][0] < end:
+                    continue
+                yield start, end
+        day += timedelta(days=1)
+
+
+def link_generated_slots(apps, schema_editor):
+    """Mevcut kuralların ürettiği slotları kurallarına bağla (başlangıç/bitiş zamanı eşleşmesiyle)"""
+    ScheduleRule = apps.get_model('appointments', 'ScheduleRule')
+    AvailableTimeSlot = apps.get_model('appointments', 'AvailableTimeSlot')
+    for rule in ScheduleRule.objects.order_by('created_at', 'id').iterator():
+        intervals = set(_rule_intervals(rule))
+        if not intervals:
+            continue
+        starts = [start for start, _ in intervals]
+        slots = AvailableTimeSlot.objects.filter(
+            psychologist_id=rule.psychologist_id,
+            schedule_rule__isnull=True,
+            start_time__gte=min(starts),
+            start_time__lte=max(starts),
+        ).values_list('id', 'start_time', 'end_time')
+        slot_ids = [slot_id for slot_id, start, end in slots if (start, end) in intervals]
+        for i in range(0, len(slot_ids), 500):
+            AvailableTimeSlot.objects.filter(id__in=slot_ids[i:i + 500]).update(schedule_rule=rule)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0018_email_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availabletimeslot',
+            name='schedule_rule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='slots', to='appointments.schedulerule'),
+        ),
+        migrations.RunPython(link_generated_slots, migrations.RunPython.noop),
+    ]
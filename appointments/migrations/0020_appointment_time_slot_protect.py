@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0019_availabletimeslot_schedule_rule'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='time_slot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='appointments', to='appointments.availabletimeslot'),
+        ),
+    ]
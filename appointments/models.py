@@ -1,18 +1,104 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from config.settings import AUTH_USER_MODEL # Projenin ayarlarından özel kullanıcı modelini al
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
+
+
+class AvailableTimeSlotQuerySet(models.QuerySet):
+
+    def overlapping(self, psychologist, start_time, end_time):
+        """
+        Aynı psikoloğun verilen aralıkla çakışan slotları.
+        Çakışma: (Eski.Başlangıç < Yeni.Bitiş) VE (Eski.Bitiş > Yeni.Başlangıç)
+        'slot_psych_end_start_idx' indeksi sayesinde sadece bu psikoloğun
+        'end_time > start_time' olan (yani çoğunlukla gelecekteki) slotları taranır,
+        geçmiş slotların sayısı sorgu süresini etkilemez.
+        """
+        return self.filter(
+            psychologist=psychologist,
+            end_time__gt=start_time,
+            start_time__lt=end_time,
+        )
+
 
 class AvailableTimeSlot(models.Model):
 
+    # PostgreSQL'de migration ile eklenen EXCLUDE constraint'in adı (0006)
+    OVERLAP_CONSTRAINT_NAME = 'slot_no_overlap_per_psychologist'
+
     psychologist = models.ForeignKey(AUTH_USER_MODEL, on_delete=models.CASCADE)
     start_time = models.DateTimeField() # Randevu başlangıç zamanı
     end_time = models.DateTimeField() # Randevu bitiş zamanı
     is_booked = models.BooleanField(default=False) # Randevu dolu mu?
+    # Slotu üreten çalışma kuralı (elle oluşturulan slotlarda boş). Kural silinince
+    # alınmamış gelecek slotları da silinir, kalanların bağlantısı boşaltılır (bkz. scheduling.retract_schedule_rule)
+    schedule_rule = models.ForeignKey(
+        'ScheduleRule', related_name='slots', null=True, blank=True, on_delete=models.SET_NULL
+    )
+
+    objects = AvailableTimeSlotQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Psikolog bazlı çakışma kontrolü için (bkz. AvailableTimeSlotQuerySet.overlapping)
+            models.Index(fields=['psychologist', 'end_time', 'start_time'], name='slot_psych_end_start_idx'),
+            # Randevu listesindeki tarih aralığı ve psikolog filtreleri için
+            models.Index(fields=['psychologist', 'start_time'], name='slot_psych_start_idx'),
+            models.Index(fields=['start_time'], name='slot_start_idx'),
+            # Müsait slot araması için kısmi indeksler: sadece boş slotlar indekslenir,
+            # dolu/geçmiş slotlar büyüdükçe arama indeksi büyümez
+            # (bkz. snapshots._load_entries, availability.availability_bitmap)
+            models.Index(fields=['start_time', 'psychologist'], condition=models.Q(is_booked=False), name='slot_free_start_idx'),
+            models.Index(fields=['psychologist', 'start_time'], condition=models.Q(is_booked=False), name='slot_free_psych_start_idx'),
+        ]
 
     def __str__(self):
         # Admin panelinde güzel görünmesi için
         return f"Psk. {self.psychologist.first_name} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
     
+class AvailabilitySnapshot(models.Model):
+    """
+    Psikolog bazında müsait slot özeti (read model).
+    free_slots: gelecekteki boş slotlar, başlangıç zamanına göre sıralı
+    [[slot_id, "YYYY-MM-DDTHH:MM:SS.ffffffZ", "..."], ...] (UTC, sabit genişlikte; metin olarak sıralanabilir).
+    Slot eklendikçe/rezerve edildikçe commit'ten sonra gün bazında güncellenir (bkz. appointments/snapshots.py).
+    """
+    psychologist = models.OneToOneField(
+        AUTH_USER_MODEL, primary_key=True, related_name='availability_snapshot', on_delete=models.CASCADE
+    )
+    free_slots = models.JSONField(default=list, blank=True)
+    next_available_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text='Son güncellemedeki ilk boş slot')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Müsaitlik: Psk. {self.psychologist_id} - {len(self.free_slots)} slot"
+
+
+class ScheduleRule(models.Model):
+    """
+    Tekrarlayan çalışma saati kuralı.
+    Örnek: Pzt-Cum 09:00-17:00, 50 dk seans, 10 dk ara, bitiş tarihi X, şu aralıklar hariç.
+    Kural oluşturulduğunda slotlara açılır (bkz. appointments/scheduling.py).
+    """
+    psychologist = models.ForeignKey(AUTH_USER_MODEL, related_name='schedule_rules', on_delete=models.CASCADE)
+    weekdays = models.JSONField(default=list, help_text='Haftanın günleri (0=Pazartesi ... 6=Pazar)')
+    day_start = models.TimeField(help_text='Günlük çalışma başlangıcı (yerel saat)')
+    day_end = models.TimeField(help_text='Günlük çalışma bitişi (yerel saat)')
+    session_minutes = models.PositiveSmallIntegerField(default=50, help_text='Seans süresi (dakika)')
+    break_minutes = models.PositiveSmallIntegerField(default=0, help_text='Seanslar arası ara (dakika)')
+    start_date = models.DateField() # Kuralın geçerli olduğu ilk gün
+    end_date = models.DateField() # Kuralın geçerli olduğu son gün
+    blackouts = models.JSONField(default=list, blank=True, help_text='Hariç tutulacak aralıklar: [{"start": ISO, "end": ISO}]')
+    timezone = models.CharField(max_length=64, default='Europe/Istanbul', help_text='Saatlerin yorumlanacağı zaman dilimi')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Kural: Psk. {self.psychologist.first_name} - {self.start_date} / {self.end_date}"
+
+
 class Appointment(models.Model):
     """
     Randevu modeli
@@ -28,35 +114,93 @@ class Appointment(models.Model):
     ]
     
     patient = models.ForeignKey(AUTH_USER_MODEL, related_name='patient_appointments', on_delete=models.CASCADE) # Hasta (Kullanıcı modeli ile ilişkilendirilir)
-    time_slot = models.OneToOneField(AvailableTimeSlot, on_delete=models.CASCADE) # Randevu zaman dilimi (Tekil ilişki)
+    # Randevu zaman dilimi. İptal edilen randevular saklandığı için bir slotun birden fazla
+    # randevusu olabilir; iptal edilmemiş en fazla bir randevu olmasını 'appt_active_slot_uniq' sağlar.
+    # PROTECT: randevusu (iptal edilmiş olsa bile) olan slot silinemez; randevu ve ödeme kayıtları korunur.
+    time_slot = models.ForeignKey(AvailableTimeSlot, related_name='appointments', on_delete=models.PROTECT)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending_payment', help_text='Randevu durumu')
     created_at = models.DateTimeField(auto_now_add=True) # Randevu oluşturulma zamanı
     notes = models.TextField(blank=True, null=True) # Randevu notları (isteğe bağlı)
+    duration_minutes = models.PositiveIntegerField(null=True, blank=True, help_text='Randevu alindigi andaki seans suresi (dakika)')
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text='Randevu alindigi andaki fiyat (TL)')
+    hold_expires_at = models.DateTimeField(null=True, blank=True, help_text='Odeme yapilmazsa slotun serbest birakilacagi zaman')
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, help_text='Hatirlatma email\'inin gonderildigi (gonderim icin alindigi) zaman')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['time_slot'], condition=~models.Q(status='cancelled'), name='appt_active_slot_uniq'
+            ),
+        ]
+        indexes = [
+            # Süresi dolan ödeme bekletmelerini bulmak için (bkz. release_expired_holds komutu)
+            models.Index(fields=['hold_expires_at'], condition=models.Q(status='pending_payment'), name='appt_hold_expiry_idx'),
+            # Keyset sayfalama sırası (-created_at, id) - bkz. appointments/pagination.py
+            models.Index(fields=['-created_at', 'id'], name='appt_created_id_idx'),
+            models.Index(fields=['patient', '-created_at', 'id'], name='appt_patient_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='appt_status_created_idx'),
+            # Varsayılan liste iptal edilenleri içermez (bkz. AppointmentFilterBackend)
+            models.Index(fields=['-created_at', 'id'], condition=~models.Q(status='cancelled'), name='appt_active_created_idx'),
+            models.Index(fields=['patient', '-created_at', 'id'], condition=~models.Q(status='cancelled'), name='appt_active_patient_idx'),
+            # Hatırlatması gönderilmemiş ödenmiş randevular (bkz. send_reminders komutu)
+            models.Index(fields=['time_slot'], condition=models.Q(status='paid', reminder_sent_at__isnull=True), name='appt_reminder_due_idx'),
+        ]
 
     def __str__(self):
         return f"Randevu: {self.patient.first_name} @ {self.time_slot.start_time.strftime('%Y-%m-%d %H:%M')}"
     
-    def calculate_price(self):
+    def save(self, *args, **kwargs):
+        """
+        Randevu ilk kaydedilirken sure ve fiyat o anki saatlik ucretle sabitlenir (fiyat snapshot'i).
+        Okumalarda fiyat tekrar hesaplanmaz; ucret degisirse bekleyen randevular
+        reprice_pending_appointments() ile toplu guncellenir.
+        """
+        if self._state.adding and self.price is None:
+            self.duration_minutes = self.get_duration_minutes()
+            self.price = self.calculate_price()
+        if self._state.adding and self.hold_expires_at is None and self.status == 'pending_payment':
+            self.hold_expires_at = self.get_hold_expires_at()
+        super().save(*args, **kwargs)
+
+    def get_hold_expires_at(self):
+        """
+        Odeme son tarihi: seanstan PAYMENT_DEADLINE_HOURS saat once.
+        Seansa az kalmis randevularda hastaya en az PAYMENT_HOLD_MIN_MINUTES dakika verilir (seans baslangicini gecmez).
+        """
+        start_time = self.time_slot.start_time
+        deadline = start_time - timedelta(hours=getattr(settings, 'PAYMENT_DEADLINE_HOURS', 24))
+        minimum = timezone.now() + timedelta(minutes=getattr(settings, 'PAYMENT_HOLD_MIN_MINUTES', 30))
+        return min(start_time, max(deadline, minimum))
+
+    def get_duration_minutes(self):
+        duration = self.time_slot.end_time - self.time_slot.start_time
+        return int(duration.total_seconds() // 60)
+
+    def calculate_price(self, hourly_rate=None):
         """
         Randevu fiyatini hesaplar (saatlik ucrete gore)
+        hourly_rate verilirse onbellekten tekrar okunmaz
         """
         try:
-            # Randevu suresini hesapla
-            duration = self.time_slot.end_time - self.time_slot.start_time
-            hours = duration.total_seconds() / 3600.0  # Saat cinsinden
+            # Randevu suresini dakika cinsinden al
+            minutes = self.duration_minutes if self.duration_minutes is not None else self.get_duration_minutes()
             
             # Saatlik ucreti al
-            hourly_rate = AppointmentPrice.get_hourly_rate()
+            if hourly_rate is None:
+                hourly_rate = AppointmentPrice.get_hourly_rate()
             
-            # Toplam fiyat = saat sayisi * saatlik ucret
-            total_price = Decimal(str(hours)) * hourly_rate
-            
-            return total_price
+            # Toplam fiyat = dakika * saatlik ucret / 60 (float'a cevirmeden, Decimal ile)
+            return calculate_session_price(minutes, hourly_rate)
         except Exception:
             # Hata durumunda default deger dondur
             return Decimal('500.00')
 
 
+def calculate_session_price(minutes, hourly_rate):
+    """Seans suresi (dakika) ve saatlik ucretten kurus hassasiyetinde fiyat"""
+    return (Decimal(minutes) * hourly_rate / Decimal(60)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
 class AppointmentPrice(models.Model):
     """
     Randevu saatlik ucret ayari (Singleton pattern)
@@ -101,10 +245,140 @@ class AppointmentPrice(models.Model):
     def get_hourly_rate(cls):
         """
         Saatlik ucreti dondurur, yoksa default deger dondurur
+        Deger surec icinde onbelleklenir (bkz. appointments/pricing.py); sicak yollarda sorgu atilmaz.
+        Fiyat ayari kaydi migration (0009) ile olusturulur.
         """
-        price_setting = cls.objects.first()
-        if price_setting:
-            return price_setting.hourly_rate
-        # Ilk defa olusturuluyorsa default deger ile olustur
-        default_price = cls.objects.create(hourly_rate=Decimal('500.00'))
-        return default_price.hourly_rate
\ No newline at end of file
+        from .pricing import get_cached_hourly_rate
+        return get_cached_hourly_rate()
+
+class EmailOutbox(models.Model):
+    """
+    Gönderilecek email kuyruğu (EMAIL_DELIVERY='outbox')
+    Satırlar iş değişikliğiyle aynı transaction'da yazılır, 'send_outbox_emails' komutu
+    tarafından toplu olarak gönderilir. Başarısız gönderimler üstel bekleme ile tekrar denenir
+    (bkz. appointments/outbox.py).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Beklemede'),
+        ('sent', 'Gönderildi'),
+        ('failed', 'Başarısız'),  # Deneme hakkı bitti
+    ]
+
+    subject = models.CharField(max_length=998)
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField(default=list)  # Alıcı adresleri
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Kiralama (lease): satırı alan worker bu zamana kadar gönderir; süre dolarsa başka worker alabilir
+    locked_until = models.DateTimeField(null=True, blank=True)
+    lease_token = models.UUIDField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        verbose_name = 'Email Kuyrugu'
+        verbose_name_plural = 'Email Kuyrugu'
+        indexes = [
+            # Worker sadece bekleyen satırları tarar
+            models.Index(
+                fields=['next_attempt_at'],
+                name='outbox_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+class DigestEvent(models.Model):
+    """
+    Psikolog özet (digest) email'inde gösterilecek bildirim.
+    Özet modunu açan psikologlara (CustomUser.email_digest) randevu, iptal, taşıma ve ödeme
+    email'leri tek tek gönderilmez; olaylar burada birikir ve 'send_psychologist_digests'
+    komutu psikolog başına tek özet email'i gönderir (bkz. appointments/digest.py).
+    Email'de gösterilecek bilgiler olay anındaki haliyle 'details' alanında saklanır
+    (randevu sonradan silinse/değişse de özet doğru kalır).
+    """
+    KIND_CHOICES = [
+        ('created', 'Yeni Randevu'),
+        ('cancelled', 'Randevu İptali'),
+        ('rescheduled', 'Randevu Taşındı'),
+        ('payment_completed', 'Ödeme Tamamlandı'),
+    ]
+
+    psychologist = models.ForeignKey(AUTH_USER_MODEL, related_name='digest_events', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    details = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)  # Özet email'ine eklendiği zaman
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        verbose_name = 'Ozet Bildirimi'
+        verbose_name_plural = 'Ozet Bildirimleri'
+        indexes = [
+            # Özet gönderimi sadece gönderilmemiş olayları tarar
+            models.Index(
+                fields=['psychologist', 'created_at'],
+                name='digest_pending_idx',
+                condition=models.Q(sent_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} -> {self.psychologist_id} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
+class EmailEvent(models.Model):
+    """
+    SendGrid event webhook'undan gelen teslimat olayları (processed, delivered, bounce, dropped, ...).
+    Sadece eklenir, güncellenmez. SendGrid tekrar gönderdiğinde aynı olay sg_event_id ile ayıklanır.
+    Bounce/drop sayıları için ham tabloyu taramak yerine EmailEventCount kullanılır
+    (bkz. appointments/email_events.py).
+    """
+    sg_event_id = models.CharField(max_length=100, unique=True)
+    sg_message_id = models.CharField(max_length=255, blank=True)
+    email = models.CharField(max_length=254)
+    event = models.CharField(max_length=20)
+    timestamp = models.DateTimeField()  # Olayın SendGrid'deki zamanı
+    reason = models.CharField(max_length=255, blank=True)  # bounce/drop/deferred sebebi
+
+    class Meta:
+        verbose_name = 'Email Olayi'
+        verbose_name_plural = 'Email Olaylari'
+        indexes = [
+            models.Index(fields=['sg_message_id'], name='email_event_msg_idx'),
+            models.Index(fields=['email', 'timestamp'], name='email_event_email_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} -> {self.email} ({self.timestamp:%Y-%m-%d %H:%M})"
+
+
+class EmailEventCount(models.Model):
+    """
+    Alıcı ve olay türü başına toplam sayı (bounce, dropped, spamreport).
+    Her webhook isteğinde toplu olarak artırılır; sorgular ham olay tablosunu taramaz.
+    """
+    email = models.CharField(max_length=254)
+    event = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+    last_event_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Email Olay Sayaci'
+        verbose_name_plural = 'Email Olay Sayaclari'
+        constraints = [
+            models.UniqueConstraint(fields=['email', 'event'], name='email_event_count_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.email} {self.event}: {self.count}"
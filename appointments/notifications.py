@@ -0,0 +1,166 @@
+"""
+Email bildirimlerinin hazırlanması (render katmanı)
+
+- templates/emails/* şablonları süreç başına bir kez derlenir (render_to_string her çağrıda
+  şablonu yükleyicide arar ve yeni bir Context kurar).
+- Tarihler önceden hesaplanmış Türkçe ay tablosu ile biçimlendirilir (strftime('%B') +
+  replace döngüsü yerine).
+- Hasta/psikolog/randevu bilgileri olay başına bir kez hesaplanır (NotificationContext);
+  her alıcının şablonu metin ve HTML olarak aynı Context ile tek seferde üretilir.
+
+- Birçok alıcıya giden aynı şablonlu email'ler (hatırlatmalar, toplu iptaller) render_personalized
+  ile şablon başına bir kez üretilir: kişiye özel alanlar (bkz. PERSONAL_FIELDS) gövdede ve konuda
+  yer tutucu olarak kalır, değerleri mesaja 'substitutions' olarak eklenir. SendGridBackend bu
+  mesajları tek istekte gönderir; diğer gönderim yollarında yer tutucular resolve_substitutions
+  ile yerel olarak doldurulur.
+
+Kullanım:
+    ctx = NotificationContext(appointment)
+    message = render_message('appointment_created_patient', subject, ctx.patient_context(), recipient)
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template import Context, engines
+from django.utils.html import escape
+
+TURKISH_MONTHS = (
+    None, 'Ocak', 'Şubat', 'Mart', 'Nisan', 'Mayıs', 'Haziran',
+    'Temmuz', 'Ağustos', 'Eylül', 'Ekim', 'Kasım', 'Aralık',
+)
+
+
+def format_turkish_date(dt):
+    """Tarihi Türkçe formatında döndürür: ('gün ay yıl', 'saat:dakika')"""
+    return f"{dt.day:02d} {TURKISH_MONTHS[dt.month]} {dt.year}", f"{dt.hour:02d}:{dt.minute:02d}"
+
+
+def format_turkish_datetime(dt):
+    """'19 Ekim 2026, 14:30'"""
+    date_str, time_str = format_turkish_date(dt)
+    return f"{date_str}, {time_str}"
+
+
+def person_name(user):
+    """Ad soyad; ikisi de boşsa email"""
+    return ' '.join(part for part in (user.first_name, user.last_name) if part) or user.email
+
+
+@lru_cache(maxsize=None)
+def get_templates(name):
+    """emails/<name>.txt ve emails/<name>.html şablonlarını derler (süreç başına bir kez)"""
+    engine = engines['django'].engine
+    return engine.get_template(f'emails/{name}.txt'), engine.get_template(f'emails/{name}.html')
+
+
+def render_pair(name, context):
+    """Metin ve HTML gövdesini aynı Context ile üretir. Metin şablonunda HTML kaçışı yapılmaz."""
+    text_template, html_template = get_templates(name)
+    context = Context(context, autoescape=False)
+    text = text_template.render(context)
+    context.autoescape = True
+    return text, html_template.render(context)
+
+
+def render_message(name, subject, context, recipient):
+    """Şablondan hazır EmailMultiAlternatives oluşturur"""
+    text, html = render_pair(name, context)
+    message = EmailMultiAlternatives(subject, text, settings.DEFAULT_FROM_EMAIL, [recipient])
+    message.attach_alternative(html, 'text/html')
+    return message
+
+
+# Alıcıya göre değişen, şablonlarda filtresiz kullanılan alanlar (NotificationContext.base)
+PERSONAL_FIELDS = ('patient_name', 'psychologist_name', 'appointment_date', 'appointment_time', 'appointment_datetime')
+
+
+def placeholder(field):
+    """SendGrid substitution yer tutucusu: 'patient_name' -> '-patient_name-'"""
+    return f'-{field}-'
+
+
+def render_personalized(name, subject, items):
+    """
+    Aynı şablonlu email'leri şablon başına bir kez üretir.
+    subject: str.format kalıbı (ör. 'Randevu Hatırlatması - {appointment_datetime}')
+    items: [(context, alıcı), ...]; mesaj listesini aynı sırada döndürür.
+    PERSONAL_FIELDS dışındaki değerleri aynı olan alıcılar aynı gövdeyi paylaşır. Değeri HTML
+    kaçışı gerektiren alıcının email'i ayrı üretilir (yer tutucu metin ve HTML'de aynı değerle doldurulur).
+    """
+    rendered = {}
+    messages = []
+    for context, recipient in items:
+        values = {field: str(context[field]) for field in PERSONAL_FIELDS if field in context}
+        if any(escape(value) != value for value in values.values()):
+            messages.append(render_message(name, subject.format(**context), context, recipient))
+            continue
+        shared = dict(context, **{field: placeholder(field) for field in values})
+        key = tuple(sorted((field, repr(value)) for field, value in shared.items()))
+        if key not in rendered:
+            rendered[key] = (subject.format(**shared), *render_pair(name, shared))
+        shared_subject, text, html = rendered[key]
+        message = EmailMultiAlternatives(shared_subject, text, settings.DEFAULT_FROM_EMAIL, [recipient])
+        message.attach_alternative(html, 'text/html')
+        message.substitutions = {placeholder(field): value for field, value in values.items()}
+        messages.append(message)
+    return messages
+
+
+def resolve_substitutions(message):
+    """Yer tutucuları doldurulmuş kopyayı döndürür (substitutions desteklemeyen gönderim yolları için)"""
+    substitutions = getattr(message, 'substitutions', None)
+    if not substitutions:
+        return message
+    pattern = re.compile('|'.join(re.escape(key) for key in substitutions))
+
+    def fill(text):
+        return pattern.sub(lambda match: substitutions[match.group(0)], text)
+
+    resolved = EmailMultiAlternatives(
+        fill(message.subject), fill(message.body), message.from_email, message.to,
+        cc=message.cc, bcc=message.bcc, reply_to=message.reply_to,
+    )
+    for content, mimetype in message.alternatives:
+        resolved.attach_alternative(fill(content), mimetype)
+    return resolved
+
+
+class NotificationContext:
+    """
+    Bir randevu olayının email'lerinde ortak kullanılan bilgiler (bir kez hesaplanır).
+    appointment: patient ve time_slot__psychologist ile birlikte getirilmiş olmalı.
+    """
+
+    def __init__(self, appointment):
+        self.appointment = appointment
+        self.patient = appointment.patient
+        self.psychologist = appointment.time_slot.psychologist
+        self.patient_name = person_name(self.patient)
+        self.psychologist_name = self.psychologist.first_name or self.psychologist.email
+        self.appointment_date, self.appointment_time = format_turkish_date(appointment.time_slot.start_time)
+        self.appointment_datetime = f"{self.appointment_date}, {self.appointment_time}"
+
+    def base(self):
+        return {
+            'patient_name': self.patient_name,
+            'psychologist_name': self.psychologist_name,
+            'appointment_date': self.appointment_date,
+            'appointment_time': self.appointment_time,
+            'appointment_datetime': self.appointment_datetime,
+        }
+
+    def patient_context(self, **extra):
+        context = self.base()
+        context.update(extra)
+        return context
+
+    def psychologist_context(self, **extra):
+        context = self.base()
+        context.update({
+            'patient_email': self.patient.email,
+            'patient_phone': self.patient.phone_number or 'Belirtilmemiş',
+        })
+        context.update(extra)
+        return context
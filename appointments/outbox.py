@@ -0,0 +1,217 @@
+"""
+Email outbox (EMAIL_DELIVERY='outbox')
+
+Email'ler web isteği içinde gönderilmez: hazırlanan mesajlar iş değişikliğiyle aynı
+transaction'da EmailOutbox tablosuna yazılır (enqueue_messages). Ayrı bir süreçte çalışan
+'send_outbox_emails' komutu satırları partiler halinde alır ve tek email bağlantısı
+üzerinden gönderir. Böylece web worker'ı yeniden başlatıldığında email kaybolmaz,
+gönderim hızı web eşzamanlılığından bağımsız ayarlanır.
+
+Satır alma (claim_batch):
+- PostgreSQL: bekleyen satırlar SELECT ... FOR UPDATE SKIP LOCKED ile seçilir; eşzamanlı
+  worker'lar birbirini beklemeden farklı satırları alır.
+- Her veritabanında: seçilen satırlara koşullu UPDATE ile kiralama (locked_until + lease_token)
+  yazılır. Kiralamayı alamayan worker o satırı göndermez; worker çökerse satır kiralama
+  süresi dolunca tekrar alınır (SQLite'da tek koruma budur).
+
+Başarısız gönderim üstel bekleme ile tekrar denenir:
+EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2^(deneme-1), en fazla EMAIL_OUTBOX_MAX_ATTEMPTS deneme.
+"""
+import logging
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+from .models import EmailOutbox
+from .notifications import resolve_substitutions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+# Üstel beklemenin üst sınırı
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_messages(messages):
+    """
+    EmailMultiAlternatives listesini outbox'a yazar (tek INSERT). Çağıranın transaction'ında çalışır.
+    Satırlar alıcıya özel saklandığı için yer tutucular (substitutions) yazmadan önce doldurulur.
+    """
+    rows = []
+    for message in map(resolve_substitutions, messages):
+        html_body = next((content for content, mimetype in message.alternatives if mimetype == 'text/html'), '')
+        rows.append(EmailOutbox(
+            subject=message.subject,
+            body=message.body,
+            html_body=html_body,
+            from_email=message.from_email or '',
+            to=list(message.to),
+        ))
+    # Savepoint: kuyruğa yazma hatası çağıranın transaction'ını bozmasın
+    with transaction.atomic():
+        EmailOutbox.objects.bulk_create(rows)
+    logger.info(f"📥 {len(rows)} email outbox'a yazildi")
+    return rows
+
+
+def retry_delay(attempts):
+    """attempts. denemeden sonra beklenecek süre (üstel, %10 jitter)"""
+    base = _setting('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30)
+    delay = min(timedelta(seconds=base * 2 ** (attempts - 1)), MAX_RETRY_DELAY)
+    return delay * random.uniform(1.0, 1.1)
+
+
+def due_messages(now=None):
+    """Gönderim zamanı gelmiş, kiralanmamış (veya kiralaması dolmuş) satırlar ('outbox_pending_idx')"""
+    now = now or timezone.now()
+    return (
+        EmailOutbox.objects
+        .filter(status='pending', next_attempt_at__lte=now)
+        .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+        .order_by('next_attempt_at', 'id')
+    )
+
+
+def claim_batch(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Gönderilecek en fazla batch_size satırı bu worker adına kiralar ve döndürür.
+    Kiralama commit edilir; gönderim transaction dışında yapılır (uzun süren kilit yok).
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4()
+    lease = timedelta(seconds=_setting('EMAIL_OUTBOX_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        candidates = due_messages(now)
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        # Koşullu UPDATE: arada başka worker'ın kiraladığı satırlar etkilenmez
+        due_messages(now).filter(id__in=ids).update(locked_until=now + lease, lease_token=token)
+    return list(EmailOutbox.objects.filter(lease_token=token, status='pending').order_by('id'))
+
+
+def _to_message(row):
+    message = EmailMultiAlternatives(row.subject, row.body, row.from_email or settings.DEFAULT_FROM_EMAIL, row.to)
+    if row.html_body:
+        message.attach_alternative(row.html_body, 'text/html')
+    return message
+
+
+def send_each(messages):
+    """
+    Mesajları tek email bağlantısı üzerinden gönderir; [(mesaj, hata mesajı veya None), ...] döndürür.
+    SendGridBackend'de aynı içerikli mesajlar tek istekte gönderilir; diğer backend'lerde mesaj
+    bazında sonuç almak için tek tek, yer tutucuları doldurularak gönderilir. Sonucu dönmeyen (ör. alıcısız) mesaj başarısız sayılır.
+    """
+    results = []
+    missing_error = 'Gonderilemedi'
+    email_connection = get_connection(fail_silently=False)
+    try:
+        email_connection.open()
+        if hasattr(email_connection, 'deliver'):
+            results.extend(email_connection.deliver(messages))
+        else:
+            for message in messages:
+                try:
+                    sent = email_connection.send_messages([resolve_substitutions(message)])
+                    results.append((message, None if sent else 'Gonderilemedi'))
+                except Exception as e:
+                    results.append((message, str(e)))
+    except Exception as e:
+        # Bağlantı kurulamadı: gönderilmemiş mesajların hepsi başarısız
+        missing_error = str(e)
+    finally:
+        try:
+            email_connection.close()
+        except Exception:
+            pass
+
+    done = {id(message) for message, _ in results}
+    results.extend((message, missing_error) for message in messages if id(message) not in done)
+    return results
+
+
+def deliver_batch(rows, now=None):
+    """
+    Kiralanmış satırları (tek claim_batch partisi) tek email bağlantısı üzerinden gönderir ve
+    sonuçları yazar: gönderilenler tek UPDATE ile 'sent', başarısızlar tek UPDATE (CASE) ile
+    tekrar denemeye alınır. Her iki UPDATE de lease_token ile koşulludur.
+    Sonucu yazılan (gönderilen, başarısız) sayılarını döndürür.
+    """
+    if not rows:
+        return 0, 0
+    max_attempts = _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 8)
+    sent_ids, failed = [], []
+
+    messages = [_to_message(row) for row in rows]
+    row_by_message = {id(message): row for message, row in zip(messages, rows)}
+    for message, error in send_each(messages):
+        row = row_by_message[id(message)]
+        if error:
+            failed.append((row, error))
+        else:
+            sent_ids.append(row.id)
+
+    now = now or timezone.now()
+    # Sonuçlar sadece kiralama hâlâ bu worker'daysa yazılır: kiralama süresi dolup satırı
+    # başka bir worker aldıysa (yeni lease_token) onun kaydı ezilmez
+    owned = EmailOutbox.objects.filter(lease_token=rows[0].lease_token)
+    sent_count = failed_count = 0
+    if sent_ids:
+        sent_count = owned.filter(id__in=sent_ids).update(
+            status='sent', sent_at=now, locked_until=None, lease_token=None, last_error=''
+        )
+    for row, error in failed:
+        row.attempts += 1
+        row.last_error = error[:2000]
+        if row.attempts >= max_attempts:
+            row.status = 'failed'
+            logger.error(f"❌ Email kalici olarak basarisiz (ID: {row.id}, {row.attempts} deneme): {error}")
+        else:
+            row.next_attempt_at = now + retry_delay(row.attempts)
+    if failed:
+        def per_row(field, output_field):
+            return Case(
+                *[When(id=row.id, then=Value(getattr(row, field))) for row, _ in failed],
+                output_field=output_field,
+            )
+
+        failed_count = owned.filter(id__in=[row.id for row, _ in failed]).update(
+            attempts=per_row('attempts', EmailOutbox._meta.get_field('attempts')),
+            last_error=per_row('last_error', EmailOutbox._meta.get_field('last_error')),
+            status=per_row('status', EmailOutbox._meta.get_field('status')),
+            next_attempt_at=per_row('next_attempt_at', EmailOutbox._meta.get_field('next_attempt_at')),
+            locked_until=None,
+            lease_token=None,
+        )
+    lost = len(sent_ids) + len(failed) - sent_count - failed_count
+    if lost:
+        logger.warning(f"⚠️ {lost} outbox satirinin kiralamasi baska worker'a gecmis, sonuc yazilmadi")
+    logger.info(f"📤 Outbox partisi: {sent_count} gonderildi, {failed_count} basarisiz")
+    return sent_count, failed_count
+
+
+def process_outbox(batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """Bekleyen satır kalmayana (veya max_batches'e) kadar parti parti gönderir. (gönderilen, başarısız) döner."""
+    total_sent = total_failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = claim_batch(batch_size)
+        if not rows:
+            break
+        sent, failed = deliver_batch(rows)
+        total_sent += sent
+        total_failed += failed
+        batches += 1
+    return total_sent, total_failed
@@ -0,0 +1,97 @@
+"""
+Randevu listesi için keyset (cursor) sayfalama
+
+OFFSET kullanılmaz; her sayfa bir önceki sayfanın son satırının (created_at, id)
+değerinden devam eder. Böylece sayfa sorgusu geçmiş randevu sayısından bağımsız olarak
+'appt_created_id_idx' / 'appt_patient_created_idx' indeksleri üzerinden okunur.
+"""
+import base64
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class AppointmentKeysetPagination(BasePagination):
+    """
+    Sıralama: (-created_at, id)
+    Frontend, ?cursor=... veya ?page_size=... göndererek sayfalı cevaba geçer.
+    Bu parametreler yoksa liste eskisi gibi düz dizi olarak döner (bkz. AppointmentViewSet.list).
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 200
+    ordering = ('-created_at', 'id')
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, instance):
+        raw = f"{instance.created_at.isoformat()}|{instance.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, token):
+        try:
+            created_at, pk = base64.urlsafe_b64decode(token.encode()).decode().rsplit('|', 1)
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError(token)
+            return created_at, int(pk)
+        except (ValueError, TypeError, UnicodeDecodeError):
+            raise NotFound("Geçersiz cursor.")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            created_at, pk = self.decode_cursor(token)
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__gt=pk))
+
+        # Bir fazla satır çekerek sonraki sayfanın varlığını ek sorgu olmadan anla
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        self.next_cursor = self.encode_cursor(self.page[-1]) if self.has_next else None
+        return self.page
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('next_cursor', self.next_cursor),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
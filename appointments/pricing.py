@@ -0,0 +1,117 @@
+"""
+Saatlik ücret önbelleği
+
+AppointmentPrice.get_hourly_rate() her randevu serialization'ında, ödeme
+başlatmada ve signal'lerde çağrılır. Değer süreç içinde tutulur:
+- TTL (HOURLY_RATE_CACHE_TTL saniye) dolana kadar hiç sorgu atılmaz.
+- TTL dolunca, cache tüm worker'larca paylaşılıyorsa (REDIS_URL) sürüm sayacı okunur;
+  sürüm değişmediyse değer veritabanına gitmeden yenilenir. Cache süreç içiyse
+  (LocMemCache) diğer worker'ların artırdığı sürüm görülemez, değer her TTL'de
+  veritabanından tekrar okunur. Yani başka bir worker'da değişen ücret en geç TTL sonra görülür.
+- AppointmentPrice kaydedildiğinde/silindiğinde (bkz. signals.py) süreç içi
+  değer temizlenir ve sürüm artırılır.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+
+from .cache_versions import bump_version, get_version, versions_shared
+
+VERSION_NAME = 'appointment_price'
+DEFAULT_HOURLY_RATE = Decimal('500.00')
+# Tutari yeni ucretle guncellenebilecek odeme durumlari (odeme henuz baslamamis veya basarisiz)
+REPRICEABLE_PAYMENT_STATUSES = ('pending', 'failed')
+
+_lock = threading.Lock()
+_state = {
+    'rate': None,
+    'version': None,
+    'checked_at': 0.0,
+}
+
+
+def _ttl():
+    return getattr(settings, 'HOURLY_RATE_CACHE_TTL', 60)
+
+
+def get_cached_hourly_rate():
+    now = time.monotonic()
+    rate = _state['rate']
+    if rate is not None and now - _state['checked_at'] < _ttl():
+        return rate
+
+    # Sürüm, veritabanı okumasından ÖNCE alınır; arada bir güncelleme olursa
+    # bir sonraki kontrolde sürüm farklı görünür ve değer tekrar okunur.
+    version = None
+    if versions_shared():
+        version = get_version(VERSION_NAME)
+        if rate is not None and version == _state['version']:
+            _state['checked_at'] = now
+            return rate
+
+    from .models import AppointmentPrice
+    rate = AppointmentPrice.objects.values_list('hourly_rate', flat=True).first()
+    if rate is None:
+        rate = DEFAULT_HOURLY_RATE
+
+    with _lock:
+        _state.update(rate=rate, version=version, checked_at=now)
+    return rate
+
+
+def invalidate_hourly_rate():
+    """Süreç içi değeri temizler ve diğer worker'lar için sürümü artırır"""
+    with _lock:
+        _state.update(rate=None, version=None, checked_at=0.0)
+    bump_version(VERSION_NAME)
+
+
+def reprice_pending_appointments(hourly_rate=None):
+    """
+    Odemesi beklenen randevularin fiyat snapshot'ini yeni saatlik ucretle gunceller.
+    Odemesi islemde olan (processing, ör. 3D Secure adiminda) randevular atlanir: hasta eski
+    tutari onaylamistir, randevu fiyati ile odeme tutari ayni kalir.
+    Satir satir hesaplama yapilmaz: farkli seans sureleri okunur, randevular ve bekleyen
+    odemeler icin birer set-based UPDATE calisir. Guncellenen randevu sayisini dondurur.
+    """
+    from django.db import transaction
+    from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Value, When
+
+    from payments.models import Payment
+    from .models import Appointment, calculate_session_price
+
+    if hourly_rate is None:
+        hourly_rate = get_cached_hourly_rate()
+    hourly_rate = Decimal(hourly_rate)
+
+    with transaction.atomic():
+        pending = Appointment.objects.filter(
+            Q(payment__isnull=True) | Q(payment__status__in=REPRICEABLE_PAYMENT_STATUSES),
+            status='pending_payment',
+            duration_minutes__isnull=False,
+        )
+        # Fiyat SQL'de bölünerek hesaplanmaz (SQLite kesirsiz ondalıkları tam sayı bölmesine çevirir,
+        # 50 dk * 700 TL -> 583). Seans süreleri az sayıdadır: her süre için fiyat
+        # calculate_session_price ile bir kez hesaplanır ve CASE ile yazılır.
+        durations = set(pending.values_list('duration_minutes', flat=True).distinct())
+        if not durations:
+            return 0
+        updated = pending.update(price=Case(
+            *[
+                When(duration_minutes=minutes, then=Value(calculate_session_price(minutes, hourly_rate)))
+                for minutes in sorted(durations)
+            ],
+            # Okumadan sonra eklenen farklı süreli randevunun fiyatı değişmez (NULL yazılmaz)
+            default=F('price'),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ))
+        Payment.objects.filter(
+            status__in=REPRICEABLE_PAYMENT_STATUSES,
+            appointment__status='pending_payment',
+            appointment__price__isnull=False,
+        ).update(
+            amount=Subquery(Appointment.objects.filter(pk=OuterRef('appointment_id')).values('price')[:1])
+        )
+    return updated
@@ -0,0 +1,134 @@
+"""
+Randevu hatırlatma email'leri (send_reminders komutu)
+
+Seansı önümüzdeki REMINDER_LEAD_HOURS saat içinde başlayan, ödenmiş ve hatırlatması henüz
+gönderilmemiş randevular akış halinde okunur (.iterator(chunk_size) + select_related);
+bellek kullanımı randevu sayısından bağımsız, parti büyüklüğü kadardır. Her parti için:
+
+1. Partideki randevular tek UPDATE ile reminder_sent_at yazılarak alınır (claim).
+   Aynı anda çalışan başka bir işin aldığı satırlar atlanır (PostgreSQL'de SKIP LOCKED).
+2. Alınan randevuların email'leri şablon bir kez üretilerek hazırlanır (kişiye özel alanlar
+   substitutions ile, bkz. notifications.render_personalized) ve gönderilir:
+   - EMAIL_DELIVERY='outbox': email'ler claim ile aynı transaction'da outbox'a yazılır.
+   - Diğer modlar: commit'ten sonra tek email bağlantısıyla gönderilir; gönderilemeyenlerin
+     işareti tek UPDATE ile geri alınır ve sonraki çalıştırmada tekrar denenir.
+
+İşaret gönderimden önce yazıldığı için iş yarıda kesilip tekrar çalıştırıldığında aynı
+randevuya ikinci hatırlatma gitmez (gönderim sırasında çöken partinin email'leri en fazla
+bir kez gider). Taşınan randevuların işareti sıfırlanır (bkz. AppointmentViewSet.reschedule).
+"""
+import logging
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Appointment
+from .notifications import NotificationContext, render_personalized
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def due_reminders(now=None, lead=None):
+    """Hatırlatması gönderilecek randevular ('appt_reminder_due_idx'), seans saatine göre sıralı"""
+    now = now or timezone.now()
+    if lead is None:
+        lead = timedelta(hours=_setting('REMINDER_LEAD_HOURS', 24))
+    return (
+        Appointment.objects
+        .filter(
+            status='paid',
+            reminder_sent_at__isnull=True,
+            time_slot__start_time__gt=now,
+            time_slot__start_time__lte=now + lead,
+        )
+        .select_related('patient', 'time_slot__psychologist')
+        .order_by('time_slot__start_time', 'id')
+    )
+
+
+def claim_reminders(appointments, now):
+    """
+    Partideki randevuları bu çalıştırma adına işaretler (reminder_sent_at=now) ve
+    işaretlenebilenleri döndürür. Çağıranın transaction'ında çalışmalıdır.
+    """
+    ids = [appointment.id for appointment in appointments]
+    claimable = Appointment.objects.filter(id__in=ids, status='paid', reminder_sent_at__isnull=True)
+    if connection.features.has_select_for_update_skip_locked:
+        claimable = claimable.select_for_update(skip_locked=True)
+    claimed_ids = set(claimable.values_list('id', flat=True))
+    if not claimed_ids:
+        return []
+    # Koşullu UPDATE: arada başka bir işin işaretlediği satırlar etkilenmez
+    updated = (
+        Appointment.objects
+        .filter(id__in=claimed_ids, reminder_sent_at__isnull=True)
+        .update(reminder_sent_at=now)
+    )
+    if updated != len(claimed_ids):
+        # Satır kilidi olmayan veritabanlarında (SQLite) yarış: sadece bu işin yazdıklarını al
+        claimed_ids = set(
+            Appointment.objects.filter(id__in=claimed_ids, reminder_sent_at=now).values_list('id', flat=True)
+        )
+    return [appointment for appointment in appointments if appointment.id in claimed_ids]
+
+
+def render_reminders(appointments):
+    """Partinin hatırlatma email'leri; şablon parti başına bir kez üretilir. [(randevu, mesaj), ...]"""
+    contexts = [NotificationContext(appointment) for appointment in appointments]
+    messages = render_personalized(
+        'appointment_reminder_patient',
+        'Randevu Hatırlatması - {appointment_datetime}',
+        [(ctx.patient_context(), ctx.patient.email) for ctx in contexts],
+    )
+    return list(zip(appointments, messages))
+
+
+def process_chunk(appointments, now):
+    """Bir partiyi alır, hazırlar ve gönderir. (gönderilen, başarısız) döndürür."""
+    from .outbox import enqueue_messages, send_each
+
+    outbox_mode = _setting('EMAIL_DELIVERY', 'thread') == 'outbox'
+    with transaction.atomic():
+        claimed = claim_reminders(appointments, now)
+        messages = render_reminders(claimed)
+        if outbox_mode and messages:
+            enqueue_messages([message for _, message in messages])
+    if outbox_mode or not messages:
+        return len(messages), 0
+
+    appointment_by_message = {id(message): appointment for appointment, message in messages}
+    failed_ids = [
+        appointment_by_message[id(message)].id
+        for message, error in send_each([message for _, message in messages])
+        if error
+    ]
+    if failed_ids:
+        # Gönderilemeyenler sonraki çalıştırmada tekrar denenir
+        Appointment.objects.filter(id__in=failed_ids, reminder_sent_at=now).update(reminder_sent_at=None)
+        logger.warning(f"⚠️ {len(failed_ids)} hatirlatma gonderilemedi, sonraki calistirmada tekrar denenecek")
+    return len(messages) - len(failed_ids), len(failed_ids)
+
+
+def send_reminders(chunk_size=DEFAULT_CHUNK_SIZE, lead=None, now=None):
+    """Zamanı gelen tüm hatırlatmaları parti parti gönderir. (gönderilen, başarısız) döndürür."""
+    now = now or timezone.now()
+    stream = due_reminders(now, lead).iterator(chunk_size=chunk_size)
+    total_sent = total_failed = 0
+    while True:
+        chunk = list(islice(stream, chunk_size))
+        if not chunk:
+            break
+        sent, failed = process_chunk(chunk, now)
+        total_sent += sent
+        total_failed += failed
+        logger.info(f"⏰ Hatirlatma partisi: {sent} gonderildi, {failed} basarisiz")
+    return total_sent, total_failed
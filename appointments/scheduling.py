@@ -0,0 +1,206 @@
+"""
+Tekrarlayan çalışma kurallarından (ScheduleRule) toplu slot üretimi.
+
+Akış:
+1. Kural bellekte (sıralı) slot aralıklarına açılır.
+2. Üretilen aralıklar ve veritabanındaki mevcut slotlar tek bir sıralı taramada
+   (sweep) birleştirilip çakışmalar bulunur.
+3. Çakışma yoksa slotlar bulk_create ile partiler halinde yazılır.
+"""
+import heapq
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AvailableTimeSlot
+
+# bulk_create parti boyutu (SQLite'ın değişken limitine takılmamak için)
+SLOT_BULK_BATCH_SIZE = getattr(settings, 'SLOT_BULK_BATCH_SIZE', 500)
+
+
+class SlotConflictError(Exception):
+    """
+    Üretilen slotlar birbiriyle veya mevcut slotlarla çakışıyor.
+    conflicts: [(yeni_aralık, çakıştığı_aralık), ...]
+    """
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(f"{len(conflicts)} slot çakışması bulundu")
+
+
+def _parse_blackouts(rule, tz):
+    """Kuralın hariç tutulan aralıklarını UTC (start, end) listesi olarak sıralı döndür"""
+    blackouts = []
+    for item in rule.blackouts or []:
+        start = parse_datetime(item['start'])
+        end = parse_datetime(item['end'])
+        # Saat dilimi belirtilmemişse kuralın saat diliminde yorumla
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=tz)
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=tz)
+        blackouts.append((start.astimezone(dt_timezone.utc), end.astimezone(dt_timezone.utc)))
+    blackouts.sort()
+    return blackouts
+
+
+def iter_rule_intervals(rule, window_start=None, window_end=None):
+    """
+    Kuralı başlangıç zamanına göre sıralı (start, end) UTC aralıklarına açar.
+    window_start/window_end verilirse sadece bu pencereyle kesişen aralıklar üretilir.
+    Hariç tutulan (blackout) aralıklarla kesişen seanslar atlanır.
+    """
+    tz = ZoneInfo(rule.timezone)
+    session = timedelta(minutes=rule.session_minutes)
+    step = session + timedelta(minutes=rule.break_minutes)
+    weekdays = set(rule.weekdays)
+    blackouts = _parse_blackouts(rule, tz)
+    blackout_index = 0
+
+    day = rule.start_date
+    if window_start is not None:
+        # Pencereden önceki günleri atla (gece yarısını aşan kurallar için bir gün pay bırak)
+        day = max(day, window_start.astimezone(tz).date() - timedelta(days=1))
+    last_day = rule.end_date
+    if window_end is not None:
+        last_day = min(last_day, window_end.astimezone(tz).date())
+
+    while day <= last_day:
+        if day.weekday() in weekdays:
+            local_start = datetime.combine(day, rule.day_start, tzinfo=tz)
+            local_day_end = datetime.combine(day, rule.day_end, tzinfo=tz)
+            while local_start + session <= local_day_end:
+                start = local_start.astimezone(dt_timezone.utc)
+                end = (local_start + session).astimezone(dt_timezone.utc)
+                local_start += step
+
+                if window_start is not None and end <= window_start:
+                    continue
+                if window_end is not None and start >= window_end:
+                    return
+
+                # Bu seanstan önce biten blackout'ları geç
+                while blackout_index < len(blackouts) and blackouts[blackout_index][1] <= start:
+                    blackout_index += 1
+                if blackout_index < len(blackouts) and blackouts[blackout_index][0] < end:
+                    continue
+                yield start, end
+        day += timedelta(days=1)
+
+
+def expand_rule(rule):
+    """Kuralın ürettiği tüm slot aralıklarını liste olarak döndür"""
+    return list(iter_rule_intervals(rule))
+
+
+def find_conflicts(candidates, existing=()):
+    """
+    Sıralı iki aralık akışını (yeni ve mevcut) başlangıç zamanına göre birleştirip
+    tek geçişte çakışmaları bulur. Hem yeni-yeni hem yeni-mevcut çakışmaları raporlanır
+    (mevcut-mevcut çakışmalar yeni slotları ilgilendirmediği için atlanır).
+    Her iki liste de (start, end) çiftlerinden oluşur ve start'a göre sıralı olmalıdır.
+    """
+    conflicts = []
+    # Şu ana kadar görülen en geç biten aralık ve kaynağı
+    latest = None
+    latest_is_new = False
+    merged = heapq.merge(
+        ((start, end, True) for start, end in candidates),
+        ((start, end, False) for start, end in existing),
+    )
+    for start, end, is_new in merged:
+        if latest is not None and start < latest[1] and (is_new or latest_is_new):
+            if is_new:
+                conflicts.append(((start, end), latest))
+            else:
+                conflicts.append((latest, (start, end)))
+        if latest is None or end > latest[1]:
+            latest = (start, end)
+            latest_is_new = is_new
+    return conflicts
+
+
+def slot_has_overlap(slot):
+    """
+    Kaydedilmiş slot aynı psikoloğun başka bir slotu ile çakışıyor mu?
+    Kayıttan sonra, aynı transaction içinde çağrılmalıdır (bkz. AvailableTimeSlotViewSet.create).
+    PostgreSQL'de bu kontrolü EXCLUDE constraint zaten yaptığı için ek sorgu atılmaz.
+    """
+    if connection.vendor == 'postgresql':
+        return False
+    return AvailableTimeSlot.objects.overlapping(
+        slot.psychologist_id, slot.start_time, slot.end_time
+    ).exclude(pk=slot.pk).exists()
+
+
+def _existing_intervals(psychologist_id, start, end):
+    """Pencereyle kesişen mevcut slotları tek bir indeksli aralık sorgusuyla getir"""
+    return list(
+        AvailableTimeSlot.objects.overlapping(psychologist_id, start, end)
+        .order_by('start_time')
+        .values_list('start_time', 'end_time')
+    )
+
+
+def publish_schedule_rule(rule):
+    """
+    Kuralın slotlarını üretip tek transaction içinde kaydeder.
+    Çakışma varsa hiçbir slot yazılmaz ve SlotConflictError fırlatılır.
+    Oluşturulan slot sayısını döndürür.
+    """
+    candidates = expand_rule(rule)
+    if not candidates:
+        return 0
+
+    window_start = candidates[0][0]
+    window_end = max(end for _, end in candidates)
+
+    with transaction.atomic():
+        existing = _existing_intervals(rule.psychologist_id, window_start, window_end)
+        conflicts = find_conflicts(candidates, existing)
+        if conflicts:
+            raise SlotConflictError(conflicts)
+
+        AvailableTimeSlot.objects.bulk_create(
+            [
+                AvailableTimeSlot(psychologist_id=rule.psychologist_id, schedule_rule=rule, start_time=start, end_time=end)
+                for start, end in candidates
+            ],
+            batch_size=SLOT_BULK_BATCH_SIZE,
+        )
+
+        # PostgreSQL'de EXCLUDE constraint eşzamanlı yazmaları zaten engeller.
+        # Diğer veritabanlarında kayıttan sonra pencereyi tekrar tarayıp doğrula
+        # (SQLite yazma kilidi sayesinde araya giren slotlar burada görünür).
+        if connection.vendor != 'postgresql':
+            conflicts = find_conflicts(_existing_intervals(rule.psychologist_id, window_start, window_end))
+            if conflicts:
+                raise SlotConflictError(conflicts)
+
+        # bulk_create signal tetiklemez; psikoloğun müsaitlik özetini yeniden kur
+        from .snapshots import rebuild_snapshot
+        rebuild_snapshot(rule.psychologist_id)
+
+    return len(candidates)
+
+
+def retract_schedule_rule(rule, now=None):
+    """
+    Kuralı siler. Kuralın ürettiği, henüz alınmamış ve hiç randevusu olmamış gelecekteki slotlar
+    da silinir; böylece düzeltilmiş kural aynı saatler için çakışmadan yayınlanabilir. Randevu
+    alınmış, iptal edilmiş randevusu olan ve geçmiş slotlar korunur (kural bağlantıları SET_NULL
+    ile boşaltılır); iptal edilen randevular ve ödeme kayıtları silinmez. Silinen slot sayısını döndürür.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        _, deleted = (
+            AvailableTimeSlot.objects
+            .filter(schedule_rule=rule, is_booked=False, start_time__gt=now, appointments__isnull=True)
+            .delete()
+        )
+        rule.delete()
+    return deleted.get(AvailableTimeSlot._meta.label, 0)
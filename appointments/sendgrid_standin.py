@@ -0,0 +1,141 @@
+"""
+SendGrid v3 /mail/send için yerel test sunucusu (stand-in)
+
+Gerçek email göndermeden bildirim yük testi yapmak içindir. SendGridBackend
+SENDGRID_API_HOST=http://127.0.0.1:<port> ile bu sunucuya yönlendirilir.
+- Keep-alive (HTTP/1.1) destekler; backend'in bağlantı yeniden kullanımı ölçülebilir.
+- Yapay gecikme (latency + jitter), rastgele 500 hatası (error_rate) ve
+  429 Too Many Requests (rate_limit_rate, Retry-After başlığı ile) üretebilir.
+- GET /stats: istek, mesaj (personalization), alıcı ve hata sayaçları (JSON)
+
+Sunucu 'sendgrid_standin' komutu ile ayrı süreçte ya da 'benchmark_email' komutu
+içinde thread olarak çalıştırılır.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SEND_PATH = '/v3/mail/send'
+
+
+class StandinStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            'requests': 0,
+            'accepted': 0,
+            'messages': 0,
+            'recipients': 0,
+            'rate_limited': 0,
+            'errors': 0,
+            'bad_requests': 0,
+            'connections': 0,
+        }
+
+    def add(self, **values):
+        with self._lock:
+            for key, value in values.items():
+                self.counters[key] += value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive
+    server_version = 'SendGridStandin/1.0'
+
+    def setup(self):
+        super().setup()
+        self.server.stats.add(connections=1)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _respond(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._respond(200, self.server.stats.snapshot())
+        else:
+            self._respond(404, {'errors': [{'message': 'not found'}]})
+
+    def do_POST(self):
+        stats = self.server.stats
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+        stats.add(requests=1)
+
+        if self.path != SEND_PATH:
+            self._respond(404, {'errors': [{'message': 'not found'}]})
+            return
+        if not (self.headers.get('Authorization') or '').startswith('Bearer '):
+            stats.add(bad_requests=1)
+            self._respond(401, {'errors': [{'message': 'authorization required'}]})
+            return
+        try:
+            payload = json.loads(raw)
+            personalizations = payload['personalizations']
+            if not personalizations or not payload.get('content') or not payload.get('from'):
+                raise ValueError('eksik alan')
+        except (ValueError, KeyError, TypeError) as e:
+            stats.add(bad_requests=1)
+            self._respond(400, {'errors': [{'message': f'invalid payload: {e}'}]})
+            return
+
+        server = self.server
+        if server.latency:
+            time.sleep(max(0.0, random.gauss(server.latency, server.latency * server.jitter)))
+        roll = random.random()
+        if roll < server.rate_limit_rate:
+            stats.add(rate_limited=1)
+            self._respond(429, {'errors': [{'message': 'too many requests'}]}, {'Retry-After': '1'})
+            return
+        if roll < server.rate_limit_rate + server.error_rate:
+            stats.add(errors=1)
+            self._respond(500, {'errors': [{'message': 'internal error'}]})
+            return
+
+        recipients = sum(
+            len(p.get('to', [])) + len(p.get('cc', [])) + len(p.get('bcc', [])) for p in personalizations
+        )
+        stats.add(accepted=1, messages=len(personalizations), recipients=recipients)
+        self._respond(202)
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.1, error_rate=0.0, rate_limit_rate=0.0, verbose=False):
+        super().__init__(address, StandinHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.verbose = verbose
+        self.stats = StandinStats()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start_in_thread(**kwargs):
+    """Sunucuyu rastgele bir portta arka plan thread'inde başlatır (benchmark için)"""
+    server = StandinServer(('127.0.0.1', 0), **kwargs)
+    threading.Thread(target=server.serve_forever, name='SendGridStandin', daemon=True).start()
+    return server
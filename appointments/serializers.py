@@ -1,7 +1,11 @@
 # appointments/serializers.py
 
+from datetime import timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.utils.dateparse import parse_datetime
 from rest_framework import serializers
-from .models import AvailableTimeSlot, Appointment, AppointmentPrice
+from .models import AvailableTimeSlot, Appointment, AppointmentPrice, ScheduleRule
 # NOT: Hastanın detaylarını (isim vb.) göstermek için UserSerializer'a ihtiyacımız var
 from users.serializers import UserSerializer  # Hata yok; import doğru şekilde yapılmış.
 
@@ -15,6 +19,79 @@ class AvailableTimeSlotSerializer(serializers.ModelSerializer):
         fields = ['id', 'start_time', 'end_time', 'is_booked']
 
 
+class FreeSlotSerializer(serializers.Serializer):
+    """
+    Sanal slot motorunda (SLOT_ENGINE='virtual') listelenen müsait zamanlar.
+    Sanal slotların 'id' alanı boştur; randevu psychologist + start_time + end_time ile alınır.
+    """
+    id = serializers.IntegerField(allow_null=True)
+    psychologist = serializers.IntegerField()
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    is_booked = serializers.BooleanField()
+    virtual = serializers.BooleanField()
+
+
+class ScheduleRuleSerializer(serializers.ModelSerializer):
+    """
+    Tekrarlayan çalışma kuralı serializer
+    Kural oluşturulduğunda slotlar toplu olarak üretilir (bkz. ScheduleRuleViewSet)
+    """
+    # Bir istekte açılabilecek en uzun tarih aralığı
+    MAX_RANGE_DAYS = 366
+
+    class Meta:
+        model = ScheduleRule
+        fields = [
+            'id', 'weekdays', 'day_start', 'day_end', 'session_minutes', 'break_minutes',
+            'start_date', 'end_date', 'blackouts', 'timezone', 'created_at',
+        ]
+        read_only_fields = ['id', 'created_at']
+
+    def validate_weekdays(self, value):
+        if not isinstance(value, list) or not value:
+            raise serializers.ValidationError("En az bir gün seçilmelidir.")
+        if any(not isinstance(day, int) or day < 0 or day > 6 for day in value):
+            raise serializers.ValidationError("Günler 0 (Pazartesi) ile 6 (Pazar) arasında olmalıdır.")
+        return sorted(set(value))
+
+    def validate_session_minutes(self, value):
+        if value < 5:
+            raise serializers.ValidationError("Seans süresi en az 5 dakika olmalıdır.")
+        return value
+
+    def validate_timezone(self, value):
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError("Geçersiz zaman dilimi.")
+        return value
+
+    def validate_blackouts(self, value):
+        if not isinstance(value, list):
+            raise serializers.ValidationError("Liste bekleniyor.")
+        for item in value:
+            try:
+                start = parse_datetime(item['start'])
+                end = parse_datetime(item['end'])
+            except (KeyError, TypeError, ValueError):
+                start = end = None
+            if start is None or end is None:
+                raise serializers.ValidationError('Her aralık ISO formatında "start" ve "end" içermelidir.')
+            if (start.tzinfo is None) != (end.tzinfo is None) or end <= start:
+                raise serializers.ValidationError("Aralık bitişi başlangıcından sonra olmalıdır.")
+        return value
+
+    def validate(self, attrs):
+        if attrs['day_end'] <= attrs['day_start']:
+            raise serializers.ValidationError({"day_end": "Günlük bitiş saati başlangıçtan sonra olmalıdır."})
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError({"end_date": "Bitiş tarihi başlangıç tarihinden önce olamaz."})
+        if attrs['end_date'] - attrs['start_date'] > timedelta(days=self.MAX_RANGE_DAYS):
+            raise serializers.ValidationError({"end_date": f"Kural en fazla {self.MAX_RANGE_DAYS} günü kapsayabilir."})
+        return attrs
+
+
 class AppointmentPriceSerializer(serializers.ModelSerializer):
     """
     Randevu fiyat ayari serializer
@@ -40,69 +117,35 @@ class AppointmentSerializer(serializers.ModelSerializer):
     # Randevu fiyati (hesaplanmis)
     calculated_price = serializers.SerializerMethodField()
     
-    def to_representation(self, instance):
-        """
-        Randevu serialize edilirken, eğer time_slot veya patient silinmişse
-        veya bozuk bir ilişki varsa, güvenli bir şekilde işle.
-        """
-        try:
-            # Normal serialization'ı dene
-            representation = super().to_representation(instance)
-            
-            # Eğer time_slot None ise veya ilişki bozuksa
-            if not representation.get('time_slot'):
-                representation['time_slot'] = None
-            
-            # Eğer patient None ise veya ilişki bozuksa
-            if not representation.get('patient'):
-                representation['patient'] = None
-            
-            # Eğer kritik alanlar eksikse, serialization hatası fırlat
-            # Böylece view'da bu randevu filtrelenecek
-            if not representation.get('time_slot') or not representation.get('id'):
-                raise serializers.ValidationError("Randevu serialization hatası: Eksik ilişki verileri")
-                
-            return representation
-        except Exception as e:
-            # Serialization sırasında bir hata olursa, ValidationError fırlat
-            # Bu durumda view bu randevuyu atlayacak
-            print(f"AppointmentSerializer hatası (ID: {getattr(instance, 'id', 'unknown')}): {str(e)}")
-            raise serializers.ValidationError(f"Randevu serialization hatası: {str(e)}")
-
     def get_payment(self, obj):
         """
         Payment bilgisini serialize et (circular import'u onlemek icin)
-        Payment tablosu yoksa veya payment yoksa None dondurur
+        Payment, view'da select_related ile randevuyla birlikte getirilir; ek sorgu atilmaz.
+        Payment yoksa None dondurur.
         """
-        try:
-            # Payment tablosu var mi kontrol et
-            from payments.models import Payment
-            if hasattr(obj, 'payment'):
-                try:
-                    payment = obj.payment
-                    if payment:
-                        return {
-                            'id': str(payment.id),
-                            'status': payment.status,
-                            'amount': str(payment.amount),
-                            'currency': payment.currency,
-                            'created_at': payment.created_at.isoformat() if payment.created_at else None,
-                            'paid_at': payment.paid_at.isoformat() if payment.paid_at else None,
-                        }
-                except (AttributeError, Exception) as e:
-                    # Payment iliskisi yoksa veya hata varsa None dondur
-                    return None
-        except (ImportError, Exception):
-            # Payment modeli yoksa veya tablo yoksa None dondur
+        # Ters OneToOne iliskide kayit yoksa RelatedObjectDoesNotExist (AttributeError) firlatilir
+        payment = getattr(obj, 'payment', None)
+        if payment is None:
             return None
-        return None
+        return {
+            'id': str(payment.id),
+            'status': payment.status,
+            'amount': str(payment.amount),
+            'currency': payment.currency,
+            'created_at': payment.created_at.isoformat() if payment.created_at else None,
+            'paid_at': payment.paid_at.isoformat() if payment.paid_at else None,
+        }
     
     def get_calculated_price(self, obj):
         """
-        Randevu fiyatini hesaplar ve dondurur
+        Randevu fiyatini dondurur
+        Fiyat randevu alinirken kaydedilir (snapshot); eski kayitlarda hesaplanir.
+        Saatlik ucret view tarafindan context'e bir kez konur (her satirda sorgu atilmaz)
         """
+        if obj.price is not None:
+            return str(obj.price)
         try:
-            price = obj.calculate_price()
+            price = obj.calculate_price(hourly_rate=self.context.get('hourly_rate'))
             return str(price)
         except Exception:
             return None
@@ -111,7 +154,24 @@ class AppointmentSerializer(serializers.ModelSerializer):
     # bize 'id' olarak göndermesi için bu alanı ekliyoruz.
     # 'write_only=True' = Bu alan sadece POST/PUT ile veri ALIRKEN kullanılır,
     # GET ile veri GÖSTERİRKEN kullanılmaz.
-    time_slot_id = serializers.IntegerField(write_only=True)
+    time_slot_id = serializers.IntegerField(write_only=True, required=False)
+
+    # Sanal slot motorunda (SLOT_ENGINE='virtual') slot satırı henüz yoktur;
+    # hasta slotu psikolog + başlangıç/bitiş zamanı ile seçer.
+    psychologist_id = serializers.IntegerField(write_only=True, required=False)
+    start_time = serializers.DateTimeField(write_only=True, required=False)
+    end_time = serializers.DateTimeField(write_only=True, required=False)
+
+    def validate(self, attrs):
+        if self.instance is None and attrs.get('time_slot_id') is None:
+            virtual_fields = ('psychologist_id', 'start_time', 'end_time')
+            if any(attrs.get(field) is None for field in virtual_fields):
+                raise serializers.ValidationError(
+                    {"time_slot_id": "Slot ID'si veya psychologist_id, start_time ve end_time gereklidir."}
+                )
+            if attrs['end_time'] <= attrs['start_time']:
+                raise serializers.ValidationError({"end_time": "Bitiş zamanı başlangıç zamanından sonra olmalıdır."})
+        return attrs
 
     class Meta:
         model = Appointment
@@ -120,10 +180,55 @@ class AppointmentSerializer(serializers.ModelSerializer):
             'patient',      # Okumak için (Detaylı Obje)
             'time_slot',    # Okumak için (Detaylı Obje)
             'time_slot_id', # Yazmak için (Sadece ID)
+            'psychologist_id', 'start_time', 'end_time',  # Yazmak için (Sanal slot)
             'status',       # Randevu durumu (pending_payment, paid, cancelled)
             'payment',      # Odeme bilgisi (varsa)
             'calculated_price',  # Hesaplanan fiyat
             'created_at', 
             'notes'
         ]
-        read_only_fields = ['status']  # Status sadece backend'de guncellenir
\ No newline at end of file
+        read_only_fields = ['status']  # Status sadece backend'de guncellenir
+
+class BulkCancelSerializer(serializers.Serializer):
+    """
+    Toplu iptal istegi: ya randevu ID listesi ya da tarih araligi (slot baslangic zamani).
+    Tarih araliginda varsayilan olarak istegi yapan psikologun randevulari iptal edilir.
+    """
+    MAX_IDS = 1000
+
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False, max_length=MAX_IDS)
+    date_from = serializers.DateTimeField(required=False)
+    date_to = serializers.DateTimeField(required=False, help_text='Haric (ornek: tek gun icin ertesi gunun baslangici)')
+    psychologist = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        has_range = 'date_from' in attrs or 'date_to' in attrs
+        if 'ids' in attrs and has_range:
+            raise serializers.ValidationError("'ids' veya 'date_from'/'date_to' verilmelidir, ikisi birden degil.")
+        if 'ids' not in attrs:
+            if 'date_from' not in attrs or 'date_to' not in attrs:
+                raise serializers.ValidationError("'ids' veya 'date_from' ve 'date_to' gereklidir.")
+            if attrs['date_to'] <= attrs['date_from']:
+                raise serializers.ValidationError({"date_to": "Bitis zamani baslangic zamanindan sonra olmalidir."})
+        return attrs
+
+
+class RescheduleSerializer(serializers.Serializer):
+    """
+    Randevu tasima istegi: yeni slot ID'si veya (sanal slot motorunda) psikolog + baslangic/bitis zamani
+    """
+    time_slot_id = serializers.IntegerField(required=False)
+    psychologist_id = serializers.IntegerField(required=False)
+    start_time = serializers.DateTimeField(required=False)
+    end_time = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get('time_slot_id') is None:
+            virtual_fields = ('psychologist_id', 'start_time', 'end_time')
+            if any(attrs.get(field) is None for field in virtual_fields):
+                raise serializers.ValidationError(
+                    {"time_slot_id": "Slot ID'si veya psychologist_id, start_time ve end_time gereklidir."}
+                )
+            if attrs['end_time'] <= attrs['start_time']:
+                raise serializers.ValidationError({"end_time": "Bitiş zamanı başlangıç zamanından sonra olmalıdır."})
+        return attrs
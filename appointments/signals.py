@@ -1,10 +1,16 @@
 """
 Django Signals - Randevu oluşturma/iptal işlemlerinde otomatik email gönderimi
 """
-from django.db.models.signals import post_save, pre_delete
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Appointment
+from .models import Appointment, AppointmentPrice, AvailableTimeSlot, ScheduleRule
+from .cache_versions import bump_version
+from .conditional import SLOTS_RESOURCE
+from .snapshots import slots_changed
+from .pricing import invalidate_hourly_rate, reprice_pending_appointments
 from .email_service import send_appointment_created_email, send_appointment_cancelled_email
+from .booking_service import signal_side_effects_enabled
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,7 +22,14 @@ def appointment_created_signal(sender, instance, created, **kwargs):
     Yeni randevu oluşturulduğunda:
     1. Payment otomatik oluştur
     2. Email gönder
+
+    Sadece BOOKING_SIGNAL_SIDE_EFFECTS=True iken çalışır (eski davranış). Varsayılan olarak
+    bu işler BookingService tarafından aynı transaction'da / commit'ten sonra yapılır
+    (bkz. appointments/booking_service.py).
     """
+    if not signal_side_effects_enabled():
+        return
+
     # DEBUG: Signal'in çalışıp çalışmadığını kontrol et
     print(f"🔔 [SIGNAL DEBUG] post_save signal tetiklendi - created={created}, instance_id={instance.id if hasattr(instance, 'id') else 'N/A'}")
     logger.info(f"🔔 [SIGNAL] post_save signal tetiklendi - created={created}, instance_id={instance.id if hasattr(instance, 'id') else 'N/A'}")
@@ -30,7 +43,7 @@ def appointment_created_signal(sender, instance, created, **kwargs):
             try:
                 from payments.models import Payment
                 if not hasattr(instance, 'payment'):
-                    amount = instance.calculate_price()
+                    amount = instance.price if instance.price is not None else instance.calculate_price()
                     payment = Payment.objects.create(
                         appointment=instance,
                         patient=instance.patient,
@@ -70,38 +83,81 @@ def appointment_created_signal(sender, instance, created, **kwargs):
 @receiver(pre_delete, sender=Appointment)
 def appointment_cancelled_signal(sender, instance, **kwargs):
     """
-    Randevu silinmeden önce (iptal edildiğinde):
-    1. Payment durumunu 'cancelled' yap (eğer varsa)
-    2. Randevu status'unu 'cancelled' yap
-    3. Email gönder
+    Randevu silinmeden önce (admin DELETE) hasta ve psikologa iptal email'i gönder.
+    Silinecek satıra status/ödeme yazılmaz: ödeme kaydı CASCADE ile zaten silinir.
+    Daha önce iptal edilmiş (cancel ile durumu değişmiş) randevular için tekrar email gönderilmez.
     """
     try:
-        # Randevu status'unu 'cancelled' olarak işaretle (silinmeden önce)
-        if instance.status != 'cancelled':
-            instance.status = 'cancelled'
-            instance.save(update_fields=['status'])
-            logger.info(f"Randevu status'u 'cancelled' olarak guncellendi - ID: {instance.id}")
-        
-        # Payment varsa durumunu 'cancelled' yap
-        try:
-            from payments.models import Payment
-            if hasattr(instance, 'payment'):
-                payment = instance.payment
-                if payment.status not in ['completed', 'refunded']:
-                    payment.status = 'cancelled'
-                    payment.save()
-                    logger.info(f"Payment status'u 'cancelled' olarak guncellendi - Payment ID: {payment.id}")
-        except Exception as e:
-            logger.error(f"Payment iptal edilirken hata: {str(e)}", exc_info=True)
-            # Payment hatası email gönderimini engellememeli
+        if instance.status == 'cancelled':
+            logger.info(f"Randevu zaten iptal edilmis, email gonderilmiyor: {instance.id}")
+            return
         
         # Silme işlemini yapan kullanıcı admin mi kontrol et
-        cancelled_by_admin = False
-        if hasattr(instance, '_cancelled_by_admin'):
-            cancelled_by_admin = instance._cancelled_by_admin
+        cancelled_by_admin = getattr(instance, '_cancelled_by_admin', False)
         
         logger.info(f"Randevu iptal edildi, email gönderiliyor: {instance.id}")
         send_appointment_cancelled_email(instance, cancelled_by_admin)
     except Exception as e:
         logger.error(f"Randevu iptal signal'inde hata: {str(e)}", exc_info=True)
 
+
+@receiver(post_save, sender=AppointmentPrice)
+@receiver(post_delete, sender=AppointmentPrice)
+def appointment_price_changed_signal(sender, instance, **kwargs):
+    """
+    Saatlik ucret degistiginde onbellegi gecersiz kil.
+    Transaction commit edildikten sonra calisir; boylece diger worker'lar eski degeri yeni surumle onbelleklemez.
+    """
+    transaction.on_commit(invalidate_hourly_rate)
+
+
+@receiver(pre_save, sender=AppointmentPrice)
+def appointment_price_remember_rate_signal(sender, instance, raw=False, **kwargs):
+    """Kaydedilmeden onceki saatlik ucreti sakla (ucret degismediyse yeniden fiyatlama yapilmaz)"""
+    if raw or instance.pk is None:
+        instance._previous_hourly_rate = None
+        return
+    instance._previous_hourly_rate = (
+        AppointmentPrice.objects.filter(pk=instance.pk).values_list('hourly_rate', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=AppointmentPrice)
+def appointment_price_reprice_signal(sender, instance, raw=False, **kwargs):
+    """
+    Saatlik ucret degistiginde odemesi beklenen randevularin fiyat snapshot'ini guncelle.
+    Ucret ayni kaldiysa (ör. sadece updated_by degisti) calismaz.
+    Odenmis/iptal edilmis randevularin fiyati degismez.
+    """
+    if raw or getattr(instance, '_previous_hourly_rate', None) == instance.hourly_rate:
+        return
+    hourly_rate = instance.hourly_rate
+    transaction.on_commit(lambda: reprice_pending_appointments(hourly_rate))
+
+
+@receiver(post_save, sender=AvailableTimeSlot)
+@receiver(post_delete, sender=AvailableTimeSlot)
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=ScheduleRule)
+@receiver(post_delete, sender=ScheduleRule)
+def slots_changed_signal(sender, instance, **kwargs):
+    """
+    Musait slotlari etkileyen her degisiklikte slot surumunu artir (ETag / 304 icin, bkz. conditional.py).
+    Commit'ten sonra artirilir; boylece istemci eski veriyi yeni surumle onbelleklemez.
+    """
+    transaction.on_commit(lambda: bump_version(SLOTS_RESOURCE))
+
+
+@receiver(post_save, sender=AvailableTimeSlot)
+def slot_saved_signal(sender, instance, raw=False, **kwargs):
+    """Slot olusturuldu/guncellendi/rezervasyonu kaldirildi: musaitlik ozetini commit'ten sonra guncelle"""
+    if raw:
+        return
+    slots_changed(instance.psychologist_id, [instance])
+
+
+@receiver(post_delete, sender=AvailableTimeSlot)
+def slot_deleted_signal(sender, instance, **kwargs):
+    """Slot silindi: commit'ten sonra musaitlik ozetinden cikar"""
+    slots_changed(instance.psychologist_id, [instance])
@@ -0,0 +1,218 @@
+"""
+Psikolog bazında müsaitlik özeti (AvailabilitySnapshot)
+
+GET /api/v1/slots/ ve "en yakın müsait zaman" sorguları AvailableTimeSlot tablosunu
+taramak yerine bu özetten okunur. Özet her istekte yeniden hesaplanmaz; slotu
+değiştiren yazma yolları slots_changed() ile değişen slotları bildirir:
+- Tek satırlık değişiklikler (slot oluşturma/güncelleme/silme, sanal slotun oluşturulması):
+  signals.py (post_save / post_delete)
+- Signal tetiklemeyen toplu yazmalar: randevu alma (koşullu UPDATE, bkz. booking_service.claim_slot),
+  iptal (cancellation_service) ve taşıma bu modülü doğrudan çağırır.
+- Kural yayınlama (bulk_create) psikoloğun özetini yeniden kurar (bkz. scheduling.publish_schedule_rule).
+
+Özet, yazan transaction commit edildikten SONRA güncellenir: randevu transaction'ı özet
+satırını kilitlemez, aynı psikoloğun randevuları özet yazımı yüzünden birbirini beklemez.
+Güncelleme sınırlıdır: özet satırı kısa bir transaction'da kilitlenir, değişen slotların
+girişleri ve etkilenen (UTC) günlerin girişleri atılır, o günlerin boş slotları veritabanından
+tekrar okunur. Özet kısa bir süre (commit ile callback arası) eski kalabilir; randevu
+alma her zaman koşullu UPDATE ile yapıldığından bu sadece listeyi etkiler.
+Tutarlılık 'rebuild_availability_snapshots' komutu ile sıfırdan kurulup doğrulanabilir.
+"""
+import bisect
+import heapq
+import threading
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .availability import FreeSlot
+from .models import AvailabilitySnapshot, AvailableTimeSlot
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# Commit'i bekleyen değişiklikler: {psychologist_id: (slot id'leri, UTC günleri)} (thread başına)
+_pending = threading.local()
+
+
+def format_timestamp(value):
+    return value.astimezone(dt_timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value)
+
+
+def _entry(slot_id, start_time, end_time):
+    return [slot_id, format_timestamp(start_time), format_timestamp(end_time)]
+
+
+def _next_available(entries, now_text):
+    index = bisect.bisect_left(entries, now_text, key=lambda entry: entry[1])
+    return parse_timestamp(entries[index][1]) if index < len(entries) else None
+
+
+def _save(snapshot, entries):
+    """Geçmişte kalmış slotları atıp özeti kaydeder"""
+    now_text = format_timestamp(timezone.now())
+    entries = entries[bisect.bisect_left(entries, now_text, key=lambda entry: entry[1]):]
+    snapshot.free_slots = entries
+    snapshot.next_available_at = _next_available(entries, now_text)
+    snapshot.save()
+
+
+def _load_entries(psychologist_id, now=None, days=None):
+    """
+    Psikoloğun gelecekteki boş slotlarını veritabanından okur (kısmi indeks: slot_free_psych_start_idx).
+    days verilirse sadece o UTC günlerinde başlayan slotlar okunur.
+    """
+    rows = AvailableTimeSlot.objects.filter(
+        psychologist_id=psychologist_id, is_booked=False, start_time__gte=now or timezone.now()
+    )
+    if days is not None:
+        day_filter = Q()
+        for day in days:
+            day_start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+            day_filter |= Q(start_time__gte=day_start, start_time__lt=day_start + timedelta(days=1))
+        rows = rows.filter(day_filter)
+    rows = rows.order_by('start_time', 'id').values_list('id', 'start_time', 'end_time')
+    return [_entry(*row) for row in rows]
+
+
+def rebuild_snapshot(psychologist_id):
+    """Tek psikoloğun özetini sıfırdan kurar"""
+    snapshot, _ = AvailabilitySnapshot.objects.select_for_update().get_or_create(psychologist_id=psychologist_id)
+    _save(snapshot, _load_entries(psychologist_id))
+    return snapshot
+
+
+def slots_changed(psychologist_id, slots):
+    """
+    Slotları oluşturulan/değişen/silinen/rezerve edilen ya da serbest kalan psikoloğun özetini
+    commit'ten sonra günceller. slots: AvailableTimeSlot veya (id, start_time, end_time).
+    Transaction dışında çağrılırsa hemen çalışır.
+    """
+    pending = getattr(_pending, 'changes', None)
+    if pending is None:
+        pending = _pending.changes = {}
+    slot_ids, days = pending.setdefault(psychologist_id, (set(), set()))
+    for slot in slots:
+        if isinstance(slot, AvailableTimeSlot):
+            slot = (slot.id, slot.start_time, slot.end_time)
+        slot_ids.add(slot[0])
+        days.add(slot[1].astimezone(dt_timezone.utc).date())
+    # Her çağrı callback kaydeder; ilk çalışan callback biriken tüm değişiklikleri işler.
+    # Geri alınan (rollback) transaction'ların değişiklikleri de işlenebilir: günler veritabanından
+    # okunduğu için sonuç yine doğrudur. Hata commit edilmiş işlemi bozmamalı (robust).
+    transaction.on_commit(lambda: _flush_pending(psychologist_id), robust=True)
+
+
+def _flush_pending(psychologist_id):
+    pending = getattr(_pending, 'changes', None) or {}
+    changes = pending.pop(psychologist_id, None)
+    if changes is None:
+        return
+    with transaction.atomic():
+        refresh_days(psychologist_id, *changes)
+
+
+def refresh_days(psychologist_id, slot_ids, days):
+    """
+    Özette verilen slotların ve günlerin girişlerini veritabanındaki güncel durumla değiştirir.
+    Çağıran transaction.atomic() içinde olmalıdır. Özet yoksa sıfırdan kurulur.
+    """
+    snapshot = AvailabilitySnapshot.objects.select_for_update().filter(psychologist_id=psychologist_id).first()
+    if snapshot is None:
+        try:
+            with transaction.atomic():
+                rebuild_snapshot(psychologist_id)
+            return
+        except IntegrityError:
+            # Eşzamanlı başka bir istek özeti az önce oluşturdu; gün bazında devam et
+            snapshot = AvailabilitySnapshot.objects.select_for_update().get(psychologist_id=psychologist_id)
+
+    day_prefixes = {day.isoformat() for day in days}
+    kept = [
+        entry for entry in snapshot.free_slots
+        if entry[0] not in slot_ids and entry[1][:10] not in day_prefixes
+    ]
+    fresh = _load_entries(psychologist_id, days=days)
+    _save(snapshot, list(heapq.merge(kept, fresh, key=lambda entry: (entry[1], entry[0]))))
+
+
+def iter_snapshot_slots(psychologist_id=None):
+    """
+    Özetlerdeki boş slotları başlangıç zamanına göre sıralı FreeSlot olarak üretir.
+    Tek sorgu atılır (psikolog verilirse tek satır).
+    """
+    snapshots = AvailabilitySnapshot.objects.all()
+    if psychologist_id is not None:
+        snapshots = snapshots.filter(psychologist_id=psychologist_id)
+
+    def stream(snapshot_psychologist_id, entries):
+        for slot_id, start, end in entries:
+            yield FreeSlot(slot_id, snapshot_psychologist_id, parse_timestamp(start), parse_timestamp(end), False, False)
+
+    streams = [
+        stream(snapshot_psychologist_id, entries)
+        for snapshot_psychologist_id, entries in snapshots.values_list('psychologist_id', 'free_slots')
+    ]
+    return heapq.merge(*streams, key=lambda slot: (slot.start_time, slot.psychologist))
+
+
+def next_available_slots(psychologist_id=None):
+    """
+    Her psikoloğun en yakın boş slotu: [FreeSlot, ...] (başlangıç zamanına göre sıralı).
+    Tek sorgu; next_available_at son yazmadaki değer olduğundan ilk gelecek giriş okumada bulunur.
+    """
+    now_text = format_timestamp(timezone.now())
+    snapshots = AvailabilitySnapshot.objects.exclude(next_available_at=None)
+    if psychologist_id is not None:
+        snapshots = snapshots.filter(psychologist_id=psychologist_id)
+
+    result = []
+    for snapshot_psychologist_id, entries in snapshots.values_list('psychologist_id', 'free_slots'):
+        index = bisect.bisect_left(entries, now_text, key=lambda entry: entry[1])
+        if index < len(entries):
+            slot_id, start, end = entries[index]
+            result.append(FreeSlot(slot_id, snapshot_psychologist_id, parse_timestamp(start), parse_timestamp(end), False, False))
+    return sorted(result, key=lambda slot: (slot.start_time, slot.psychologist))
+
+
+def rebuild_all_snapshots():
+    """Tüm özetleri sıfırdan kurar; boş slotu olmayan psikologların özetleri silinir. Kurulan özet sayısı döner."""
+    now = timezone.now()
+    with transaction.atomic():
+        psychologist_ids = set(
+            AvailableTimeSlot.objects.filter(is_booked=False, start_time__gte=now)
+            .values_list('psychologist_id', flat=True).distinct()
+        )
+        AvailabilitySnapshot.objects.exclude(psychologist_id__in=psychologist_ids).delete()
+        for psychologist_id in sorted(psychologist_ids):
+            rebuild_snapshot(psychologist_id)
+    return len(psychologist_ids)
+
+
+def verify_snapshots():
+    """
+    Özetleri veritabanındaki boş slotlarla karşılaştırır.
+    Geçmişte kalan girişler (henüz budanmamış) hata sayılmaz.
+    Tutarsız psikologların {psychologist_id: açıklama} sözlüğünü döndürür.
+    """
+    now = timezone.now()
+    now_text = format_timestamp(now)
+    problems = {}
+    stored = dict(AvailabilitySnapshot.objects.values_list('psychologist_id', 'free_slots'))
+    psychologist_ids = set(stored) | set(
+        AvailableTimeSlot.objects.filter(is_booked=False, start_time__gte=now)
+        .values_list('psychologist_id', flat=True).distinct()
+    )
+    for psychologist_id in sorted(psychologist_ids):
+        expected = _load_entries(psychologist_id, now)
+        actual = [list(entry) for entry in stored.get(psychologist_id, []) if entry[1] >= now_text]
+        if expected != actual:
+            missing = {entry[0] for entry in expected} - {entry[0] for entry in actual}
+            extra = {entry[0] for entry in actual} - {entry[0] for entry in expected}
+            problems[psychologist_id] = f"eksik: {sorted(missing)}, fazla: {sorted(extra)}"
+    return problems
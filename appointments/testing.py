@@ -0,0 +1,32 @@
+"""
+Testlerde ortak kullanılan yardımcılar (appointments ve payments testleri)
+"""
+from datetime import timedelta
+
+from django.test import TestCase
+
+from users.models import CustomUser
+from .models import AvailableTimeSlot
+
+
+class AppointmentTestCase(TestCase):
+    """
+    Ortak test verisi: bir psikolog (staff) ve bir hasta. setUpTestData ile sınıf başına bir kez
+    oluşturulur; her test kendi kopyasını kullanır.
+    """
+    psychologist_fields = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.psychologist = CustomUser.objects.create_user(
+            email='psikolog@example.com', first_name='Psk', is_staff=True, is_patient=False, **cls.psychologist_fields
+        )
+        cls.patient = cls.create_patient('hasta@example.com')
+
+    @staticmethod
+    def create_patient(email, first_name='Hasta'):
+        return CustomUser.objects.create_user(email=email, first_name=first_name)
+
+    def create_slot(self, start, minutes=50, **fields):
+        fields.setdefault('psychologist', self.psychologist)
+        return AvailableTimeSlot.objects.create(start_time=start, end_time=start + timedelta(minutes=minutes), **fields)
@@ -1,3 +1,1164 @@
-from django.test import TestCase
+import base64
+import http.client
+import json
+import tempfile
+import threading
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from payments.models import Payment
+from users.models import CustomUser
+from .availability import SlotUnavailableError
+from .booking_service import BookingService
+from .cancellation_service import cancel_appointments, release_expired_holds
+from .digest import flush_digests
+from .email_executor import BoundedEmailExecutor
+from .email_backend import SENDGRID_MAX_PERSONALIZATIONS, SendGridBackend, SendGridTransport, get_transport
+from .email_events import SIGNATURE_HEADER, TIMESTAMP_HEADER, event_counts
+from .models import (
+    AvailabilitySnapshot, AvailableTimeSlot, Appointment, AppointmentPrice, DigestEvent, EmailEvent, EmailOutbox,
+    ScheduleRule, calculate_session_price,
+)
+from .notifications import NotificationContext, placeholder, render_message, render_personalized, resolve_substitutions
+from .outbox import claim_batch, deliver_batch, enqueue_messages
+from .pricing import get_cached_hourly_rate, invalidate_hourly_rate, reprice_pending_appointments
+from .reminders import send_reminders
+from .scheduling import publish_schedule_rule
+from .sendgrid_standin import StandinServer
+from .snapshots import rebuild_all_snapshots, verify_snapshots
+from .testing import AppointmentTestCase
+
+
+class SlotOverlapTests(AppointmentTestCase):
+    """
+    Slot çakışma kontrolü sadece slotu oluşturan psikoloğun kendi slotlarına bakar.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.second = CustomUser.objects.create_user(email='psikolog2@example.com', is_staff=True, is_patient=False)
+
+    def setUp(self):
+        self.first = self.psychologist
+        self.client = APIClient()
+        self.start = (timezone.now() + timedelta(days=3)).replace(microsecond=0)
+
+    def _create(self, user, start, minutes=50):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/v1/slots/', {
+            'start_time': start.isoformat(),
+            'end_time': (start + timedelta(minutes=minutes)).isoformat(),
+        }, format='json')
+
+    def test_overlap_is_scoped_per_psychologist(self):
+        self.assertEqual(self._create(self.first, self.start).status_code, 201)
+        # Başka bir psikoloğun aynı saatteki slotu engellenmez
+        self.assertEqual(self._create(self.second, self.start).status_code, 201)
+        # Aynı psikoloğun çakışan slotu reddedilir ve kaydedilmez
+        self.assertEqual(self._create(self.first, self.start + timedelta(minutes=30)).status_code, 400)
+        # Bitişik (çakışmayan) slot kabul edilir
+        self.assertEqual(self._create(self.first, self.start + timedelta(minutes=50)).status_code, 201)
+        self.assertEqual(AvailableTimeSlot.objects.filter(psychologist=self.first).count(), 2)
+        self.assertEqual(AvailableTimeSlot.objects.filter(psychologist=self.second).count(), 1)
+
+
+@override_settings(SENDGRID_API_KEY='', SLOT_ENGINE='materialized')
+class ScheduleRuleTests(AppointmentTestCase):
+    """
+    Çalışma kuralı: slotlar kurala bağlı üretilir; kural silinince alınmamış gelecek slotları
+    da silinir ve düzeltilmiş kural aynı saatler için tekrar yayınlanabilir.
+    """
+    url = '/api/v1/schedule-rules/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.psychologist)
+        self.start_date = timezone.now().date() + timedelta(days=7)
+
+    def _create_rule(self, start_date=None, days=3):
+        start_date = start_date or self.start_date
+        return self.client.post(self.url, {
+            'weekdays': list(range(7)),
+            'day_start': '09:00',
+            'day_end': '12:00',
+            'session_minutes': 50,
+            'break_minutes': 10,
+            'start_date': start_date.isoformat(),
+            'end_date': (start_date + timedelta(days=days - 1)).isoformat(),
+        }, format='json')
+
+    def test_delete_rule_removes_free_future_slots(self):
+        response = self._create_rule()
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created_slots'], 9)
+        rule_id = response.data['id']
+        slots = list(AvailableTimeSlot.objects.filter(schedule_rule_id=rule_id).order_by('start_time'))
+        self.assertEqual(len(slots), 9)
+
+        booked = slots[0]
+        BookingService(self.patient).book(time_slot_id=booked.id)
+        manual_start = slots[-1].end_time + timedelta(days=1)
+        manual = self.create_slot(manual_start)
+
+        self.assertEqual(self.client.delete(f'{self.url}{rule_id}/').status_code, 204)
+        # Randevu alınmış slot ve elle oluşturulan slot korunur
+        remaining = AvailableTimeSlot.objects.filter(psychologist=self.psychologist)
+        self.assertEqual(set(remaining.values_list('id', flat=True)), {booked.id, manual.id})
+        booked.refresh_from_db()
+        self.assertIsNone(booked.schedule_rule_id)
+        self.assertTrue(Appointment.objects.filter(time_slot=booked).exists())
+
+        # Aynı kural tekrar yayınlanınca sadece randevulu slot çakışır
+        response = self._create_rule()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['conflicts']), 1)
+        # Düzeltilmiş kural (randevulu günden sonrası) yayınlanabilir
+        response = self._create_rule(start_date=self.start_date + timedelta(days=1), days=2)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created_slots'], 6)
+
+    def test_delete_keeps_cancelled_paid_appointments(self):
+        rule_id = self._create_rule().data['id']
+        slot = AvailableTimeSlot.objects.filter(schedule_rule_id=rule_id).order_by('start_time').first()
+        appointment = BookingService(self.patient).book(time_slot_id=slot.id)
+        Appointment.objects.filter(id=appointment.id).update(status='paid')
+        Payment.objects.filter(appointment=appointment).update(status='completed')
+        cancel_appointments(Appointment.objects.filter(id=appointment.id))
+        slot.refresh_from_db()
+        self.assertFalse(slot.is_booked)
+
+        # İptal edilmiş randevusu olan (serbest) slot tek başına da silinemez
+        self.assertEqual(self.client.delete(f'/api/v1/slots/{slot.id}/').status_code, 400)
+        self.assertEqual(self.client.delete(f'{self.url}{rule_id}/').status_code, 204)
+        self.assertEqual(set(AvailableTimeSlot.objects.values_list('id', flat=True)), {slot.id})
+        self.assertEqual(Appointment.objects.get(id=appointment.id).status, 'cancelled')
+        self.assertTrue(Payment.objects.filter(appointment_id=appointment.id).exists())
+
+
+@override_settings(SENDGRID_API_KEY='', SLOT_ENGINE='virtual')
+class VirtualEngineTests(AppointmentTestCase):
+    """
+    Sanal motor: müsaitlik kurallardan hesaplanır, slot satırı sadece randevu alınınca oluşur.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+        self.day = timezone.now().date() + timedelta(days=5)
+        ScheduleRule.objects.create(
+            psychologist=self.psychologist, weekdays=list(range(7)),
+            day_start=time(9), day_end=time(12), session_minutes=50, break_minutes=10,
+            start_date=self.day, end_date=self.day,
+        )
+
+    def _list(self):
+        response = self.client.get(f'/api/v1/slots/?from={self.day}&to={self.day}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_book_virtual_slot(self):
+        slots = self._list()
+        self.assertEqual(len(slots), 3)
+        self.assertTrue(all(slot['virtual'] and slot['id'] is None for slot in slots))
+        self.assertFalse(AvailableTimeSlot.objects.exists())
+
+        chosen = {key: slots[1][key] for key in ('start_time', 'end_time')}
+        payload = {'psychologist_id': self.psychologist.id, **chosen}
+        self.assertEqual(self.client.post('/api/v1/appointments/', payload, format='json').status_code, 201)
+        # Slot satırı randevu anında dolu olarak oluşur ve sanal listeden düşer
+        slot = AvailableTimeSlot.objects.get()
+        self.assertTrue(slot.is_booked)
+        self.assertEqual([s['start_time'] for s in self._list()], [slots[0]['start_time'], slots[2]['start_time']])
+
+        # Aynı sanal slot ikinci kez alınamaz; kuralın sunmadığı saat de alınamaz
+        self.assertEqual(self.client.post('/api/v1/appointments/', payload, format='json').status_code, 400)
+        offset = {'psychologist_id': self.psychologist.id, 'start_time': slot.start_time + timedelta(minutes=5),
+                  'end_time': slot.end_time + timedelta(minutes=5)}
+        self.assertEqual(self.client.post('/api/v1/appointments/', offset, format='json').status_code, 400)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+
+@override_settings(SENDGRID_API_KEY='', SLOT_ENGINE='materialized')
+class BookingConflictTests(AppointmentTestCase):
+    """
+    Randevu alma koşullu UPDATE (compare-and-set) ile yapılır: aynı slotu ikinci alan
+    400 alır ve hiçbir şey yazılmaz.
+    """
+
+    def setUp(self):
+        self.patients = [self.patient, self.create_patient('hasta2@example.com')]
+        self.slot = self.create_slot(timezone.now() + timedelta(days=2))
+        self.client = APIClient()
+
+    def _book(self, patient):
+        self.client.force_authenticate(patient)
+        return self.client.post('/api/v1/appointments/', {'time_slot_id': self.slot.id}, format='json')
+
+    def test_second_booking_of_same_slot_is_rejected(self):
+        self.assertEqual(self._book(self.patients[0]).status_code, 201)
+        response = self._book(self.patients[1])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Appointment.objects.get().patient, self.patients[0])
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_stale_free_flag_is_caught_by_active_slot_constraint(self):
+        # Slot boş görünse de aktif randevusu varsa ('appt_active_slot_uniq') işlem geri alınır
+        self.assertEqual(self._book(self.patients[0]).status_code, 201)
+        AvailableTimeSlot.objects.filter(id=self.slot.id).update(is_booked=False)
+        self.assertEqual(self._book(self.patients[1]).status_code, 400)
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertFalse(AvailableTimeSlot.objects.get(id=self.slot.id).is_booked)
+
+
+@override_settings(SENDGRID_API_KEY='')
+class AppointmentListQueryCountTests(AppointmentTestCase):
+    """
+    Randevu listesi satır sayısından bağımsız olarak sabit sayıda sorgu ile dönmeli (N+1 yok).
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.slot_count = 0
+
+    def _create_appointments(self, count):
+        base = timezone.now() + timedelta(days=1)
+        for _ in range(count):
+            start = base + timedelta(hours=self.slot_count)
+            self.slot_count += 1
+            slot = self.create_slot(start, is_booked=True)
+            appointment = Appointment.objects.create(patient=self.patient, time_slot=slot)
+            Payment.objects.create(appointment=appointment, patient=self.patient, amount=appointment.price)
+
+    def _list(self, user, path='/api/v1/appointments/'):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_is_constant_for_staff(self):
+        self._create_appointments(2)
+        response, small = self._list(self.psychologist)
+        self.assertEqual(len(response.data), 2)
+        self.assertIsNotNone(response.data[0]['payment'])
+
+        self._create_appointments(10)
+        response, large = self._list(self.psychologist)
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(small, large)
+
+    def test_query_count_is_constant_for_patient(self):
+        self._create_appointments(2)
+        _, small = self._list(self.patient)
+        self._create_appointments(10)
+        response, large = self._list(self.patient)
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(small, large)
+
+    def test_query_count_is_constant_for_paginated_list(self):
+        self._create_appointments(3)
+        _, small = self._list(self.psychologist, '/api/v1/appointments/?page_size=50')
+        self._create_appointments(20)
+        response, large = self._list(self.psychologist, '/api/v1/appointments/?page_size=50')
+        self.assertEqual(len(response.data['results']), 23)
+        self.assertEqual(small, large)
+
+    def test_retrieve_query_count(self):
+        self._create_appointments(1)
+        appointment = Appointment.objects.get()
+        _, queries = self._list(self.patient, f'/api/v1/appointments/{appointment.id}/')
+        # Randevu (slot, hasta, ödeme JOIN) + saatlik ücret
+        self.assertLessEqual(queries, 2)
+
+
+@override_settings(SENDGRID_API_KEY='')
+class AppointmentKeysetPaginationTests(AppointmentTestCase):
+    """
+    Keyset sayfalama: cursor ile sayfalar eksiksiz ve tekrarsız gezilir; bozuk cursor 404 döner.
+    """
+
+    def setUp(self):
+        base = timezone.now() + timedelta(days=1)
+        for i in range(5):
+            slot = self.create_slot(base + timedelta(hours=i), is_booked=True)
+            Appointment.objects.create(patient=self.patient, time_slot=slot, status='cancelled' if i == 4 else 'paid')
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def test_cursor_round_trip(self):
+        expected = list(
+            Appointment.objects.exclude(status='cancelled').order_by('-created_at', 'id').values_list('id', flat=True)
+        )
+        seen, path = [], '/api/v1/appointments/?page_size=2'
+        while path:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen += [row['id'] for row in response.data['results']]
+            path = response.data['next']
+        self.assertEqual(seen, expected)
+
+        # Filtreler cursor ile birlikte korunur
+        response = self.client.get('/api/v1/appointments/?page_size=2&status=cancelled')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/v1/appointments/?cursor=bozuk').status_code, 404)
+        # Sayfalama parametresi yoksa düz dizi döner
+        self.assertEqual(len(self.client.get('/api/v1/appointments/').data), 4)
+
+
+@override_settings(SENDGRID_API_KEY='', BOOKING_SIGNAL_SIDE_EFFECTS=False)
+class HourlyRateCacheTests(TestCase):
+    """
+    Süreç içi saatlik ücret: cache paylaşılmıyorsa (LocMemCache) TTL dolunca veritabanından
+    tekrar okunur; başka bir worker'daki değişiklik sürüm sayacı görülmese de fark edilir.
+    """
+
+    def setUp(self):
+        # Fiyat kaydı migration ile oluşturulur (singleton)
+        AppointmentPrice.objects.update(hourly_rate=Decimal('600.00'))
+        invalidate_hourly_rate()
+
+    def test_external_change_seen_after_ttl_with_local_cache(self):
+        self.assertEqual(get_cached_hourly_rate(), Decimal('600.00'))
+        # Başka bir worker'daki değişiklik: signal bu süreçte çalışmaz, sürüm artmaz
+        AppointmentPrice.objects.update(hourly_rate=Decimal('700.00'))
+        self.assertEqual(get_cached_hourly_rate(), Decimal('600.00'))
+        with override_settings(HOURLY_RATE_CACHE_TTL=0), self.assertNumQueries(1):
+            self.assertEqual(get_cached_hourly_rate(), Decimal('700.00'))
+
+
+class RepricePendingAppointmentsTests(AppointmentTestCase):
+    """Toplu fiyat güncellemesi satır satır hesaplama (calculate_session_price) ile aynı sonucu verir"""
+
+    def setUp(self):
+        slot = self.create_slot(timezone.now() + timedelta(days=2))
+        self.appointment = BookingService(self.patient).book(time_slot_id=slot.id)
+
+    def test_whole_rate_matches_row_calculation(self):
+        # Kesirsiz ücret: SQLite'ta tam sayı bölmesi 583 verirdi
+        self.assertEqual(reprice_pending_appointments(Decimal('700')), 1)
+        self.appointment.refresh_from_db()
+        expected = calculate_session_price(50, Decimal('700'))
+        self.assertEqual(expected, Decimal('583.33'))
+        self.assertEqual(self.appointment.price, expected)
+        self.assertEqual(Payment.objects.get(appointment=self.appointment).amount, expected)
+
+    def test_processing_payment_keeps_price_and_amount(self):
+        Payment.objects.filter(appointment=self.appointment).update(status='processing')
+        old_price = self.appointment.price
+        self.assertEqual(reprice_pending_appointments(Decimal('700')), 0)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.price, old_price)
+        self.assertEqual(Payment.objects.get(appointment=self.appointment).amount, old_price)
+
+    def test_reprices_only_when_rate_changes(self):
+        price = AppointmentPrice.objects.get()
+        with mock.patch('appointments.signals.reprice_pending_appointments') as reprice:
+            with self.captureOnCommitCallbacks(execute=True):
+                price.save()
+            reprice.assert_not_called()
+            price.hourly_rate += 100
+            with self.captureOnCommitCallbacks(execute=True):
+                price.save()
+            reprice.assert_called_once_with(price.hourly_rate)
+
+
+@override_settings(SENDGRID_API_KEY='', VIRTUAL_SLOT_HORIZON_DAYS=30)
+class SlotSearchAfterTests(AppointmentTestCase):
+    """'?after=T&limit=N' iki motorda da aynı sonucu verir; T varsayılan ufkun ötesinde olsa bile"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+        day = timezone.now().date() + timedelta(days=40)
+        rule = ScheduleRule.objects.create(
+            psychologist=self.psychologist, weekdays=list(range(7)),
+            day_start=time(9), day_end=time(12), session_minutes=50, break_minutes=10,
+            start_date=day, end_date=day,
+        )
+        publish_schedule_rule(rule)
+        self.starts = list(AvailableTimeSlot.objects.order_by('start_time').values_list('start_time', flat=True))
+
+    def _search(self, engine, **params):
+        with self.settings(SLOT_ENGINE=engine):
+            response = self.client.get('/api/v1/slots/', params)
+        self.assertEqual(response.status_code, 200)
+        return [slot['start_time'] for slot in response.data]
+
+    def test_after_beyond_default_window(self):
+        self.assertEqual(len(self.starts), 3)
+        after = self.starts[0].isoformat()
+        results = {engine: self._search(engine, after=after, limit=1) for engine in ('materialized', 'virtual')}
+        self.assertEqual(len(results['virtual']), 1)
+        self.assertEqual(results['virtual'], results['materialized'])
+
+
+class AvailabilityBitmapTests(AppointmentTestCase):
+    """Takvim bitmask'i: sadece tamamen boş slot içinde kalan 15 dakikalık dilimler işaretlenir"""
+
+    def test_partial_units_are_not_set(self):
+        day = timezone.now().date() + timedelta(days=3)
+        start = timezone.make_aware(datetime.combine(day, time(9, 10)), dt_timezone.utc)
+        self.create_slot(start)
+        self.create_slot(start + timedelta(hours=2), minutes=60, is_booked=True)
+
+        client = APIClient()
+        client.force_authenticate(self.patient)
+        response = client.get(f'/api/v1/slots/availability/?from={day}&to={day}&tz=UTC&encoding=hex')
+        self.assertEqual(response.status_code, 200)
+        # 09:10-10:00: 09:15, 09:30 ve 09:45 dilimleri (37-39); 09:00 dilimi yarım kaldığı için 0, dolu slot 0
+        expected = sum(1 << (95 - k) for k in (37, 38, 39))
+        self.assertEqual(response.data['days'], [expected.to_bytes(12, 'big').hex()])
+
+
+class ConditionalGetTests(AppointmentTestCase):
+    """ETag/304 sadece sürüm sayaçları worker'lar arasında paylaşılıyorsa verilir"""
+    url = '/api/v1/price-setting/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.psychologist)
+
+    def _change_price(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            price = AppointmentPrice.objects.get()
+            price.hourly_rate += 100
+            price.save()
+
+    def test_shared_cache_not_modified_until_change(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }}):
+            first = self.client.get(self.url)
+            self.assertEqual(first.status_code, 200)
+            etag = first['ETag']
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            self._change_price()
+            changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(changed.status_code, 200)
+            self.assertNotEqual(changed['ETag'], etag)
+            self.assertEqual(Decimal(changed.data[0]['hourly_rate']), AppointmentPrice.objects.get().hourly_rate)
+
+    def test_process_local_cache_never_returns_not_modified(self):
+        # LocMemCache: başka worker'daki değişiklik bu sürecin sayacını artırmaz
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(first.has_header('ETag'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"x"').status_code, 200)
+
+
+class AvailabilitySnapshotTests(AppointmentTestCase):
+    """
+    Müsaitlik özeti randevu transaction'ında kilitlenmez; commit'ten sonra sadece
+    değişen slotların günleri veritabanından tekrar okunarak güncellenir.
+    """
+
+    def setUp(self):
+        base = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots = [
+                self.create_slot(start)
+                for start in (base, base + timedelta(hours=1), base + timedelta(days=1), base + timedelta(days=1, hours=1))
+            ]
+
+    def _snapshot_ids(self):
+        return [entry[0] for entry in AvailabilitySnapshot.objects.get(psychologist=self.psychologist).free_slots]
+
+    def test_booking_and_cancel_update_snapshot_after_commit(self):
+        all_ids = [slot.id for slot in self.slots]
+        self.assertEqual(self._snapshot_ids(), all_ids)
+        with self.captureOnCommitCallbacks() as callbacks:
+            appointment = BookingService(self.patient).book(time_slot_id=self.slots[0].id)
+            # Transaction içinde özete dokunulmaz
+            self.assertEqual(self._snapshot_ids(), all_ids)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._snapshot_ids(), all_ids[1:])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_appointments(Appointment.objects.filter(id=appointment.id))
+        self.assertEqual(self._snapshot_ids(), all_ids)
+        self.assertEqual(verify_snapshots(), {})
+
+    def test_refresh_reads_only_affected_days(self):
+        # Signal tetiklemeyen yazma: ikinci günün girişi eskidi
+        AvailableTimeSlot.objects.filter(id=self.slots[2].id).update(is_booked=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            BookingService(self.patient).book(time_slot_id=self.slots[1].id)
+        # Birinci gün tekrar okundu; ikinci gün (etkilenmedi) olduğu gibi kaldı
+        self.assertEqual(self._snapshot_ids(), [self.slots[0].id, self.slots[2].id, self.slots[3].id])
+        self.assertIn(self.psychologist.id, verify_snapshots())
+
+        rebuild_all_snapshots()
+        self.assertEqual(self._snapshot_ids(), [self.slots[0].id, self.slots[3].id])
+
+
+@override_settings(SENDGRID_API_KEY='')
+class ReleaseExpiredHoldsTests(AppointmentTestCase):
+    """Sweeper sadece süresi dolmuş, ödenmemiş ve iyzico formu yakın zamanda açılmamış bekletmeleri iptal eder"""
+
+    def setUp(self):
+        start = timezone.now() + timedelta(days=2)
+        self.appointments = [
+            BookingService(self.patient).book(time_slot_id=self.create_slot(start + timedelta(hours=i)).id)
+            for i in range(4)
+        ]
+        expired, completed, processing, _ = self.appointments
+        past = timezone.now() - timedelta(minutes=5)
+        Appointment.objects.filter(id__in=[expired.id, completed.id, processing.id]).update(hold_expires_at=past)
+        Payment.objects.filter(appointment=completed).update(status='completed')
+        Payment.objects.filter(appointment=processing).update(status='processing')
+
+    def test_only_expired_unpaid_holds_are_released(self):
+        expired = self.appointments[0]
+        self.assertEqual(release_expired_holds(batch_size=1), 1)
+        statuses = dict(Appointment.objects.values_list('id', 'status'))
+        self.assertEqual(statuses.pop(expired.id), 'cancelled')
+        self.assertEqual(set(statuses.values()), {'pending_payment'})
+        self.assertFalse(AvailableTimeSlot.objects.get(id=expired.time_slot_id).is_booked)
+        self.assertEqual(Payment.objects.get(appointment=expired).status, 'cancelled')
+        # Tekrar çalıştırmak bir şey değiştirmez
+        self.assertEqual(release_expired_holds(), 0)
+
+
+@override_settings(SENDGRID_API_KEY='')
+class BulkCancelTests(AppointmentTestCase):
+    """Toplu iptal sadece seansı henüz başlamamış randevuları iptal eder; diğerleri 'skipped' içinde döner"""
+
+    def setUp(self):
+        now = timezone.now()
+
+        def appointment(start, status):
+            slot = self.create_slot(start, is_booked=True)
+            appointment = Appointment.objects.create(patient=self.patient, time_slot=slot, status=status)
+            Payment.objects.create(
+                appointment=appointment, patient=self.patient, amount=appointment.price,
+                status='completed' if status == 'paid' else 'pending',
+            )
+            return appointment
+
+        self.upcoming_pending = appointment(now + timedelta(days=2), 'pending_payment')
+        self.upcoming_paid = appointment(now + timedelta(days=3), 'paid')
+        self.past_paid = appointment(now - timedelta(days=2), 'paid')
+        self.cancelled = appointment(now + timedelta(days=4), 'cancelled')
+        self.client = APIClient()
+        self.client.force_authenticate(self.psychologist)
+
+    def test_past_and_cancelled_appointments_are_skipped(self):
+        ids = [self.upcoming_pending.id, self.upcoming_paid.id, self.past_paid.id, self.cancelled.id]
+        response = self.client.post('/api/v1/appointments/bulk-cancel/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['ids']), [self.upcoming_pending.id, self.upcoming_paid.id])
+        self.assertEqual(response.data['skipped'], sorted([self.past_paid.id, self.cancelled.id]))
+
+        self.past_paid.refresh_from_db()
+        self.assertEqual(self.past_paid.status, 'paid')
+        self.assertEqual(self.past_paid.payment.status, 'completed')
+        self.assertTrue(self.past_paid.time_slot.is_booked)
+        self.assertFalse(AvailableTimeSlot.objects.get(id=self.upcoming_paid.time_slot_id).is_booked)
+
+    def test_date_range_excludes_past_sessions(self):
+        now = timezone.now()
+        payload = {'date_from': now - timedelta(days=7), 'date_to': now + timedelta(days=7)}
+        response = self.client.post('/api/v1/appointments/bulk-cancel/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cancelled'], 2)
+        self.assertIn(self.past_paid.id, response.data['skipped'])
+        self.assertEqual(Appointment.objects.get(id=self.past_paid.id).status, 'paid')
+
+
+@override_settings(SENDGRID_API_KEY='')
+class CancelIsStatusChangeTests(AppointmentTestCase):
+    """Hasta iptali (cancel veya DELETE) randevuyu silmez; durum değişir, slot serbest kalır, geçmiş saklanır"""
+
+    def setUp(self):
+        self.slot = self.create_slot(timezone.now() + timedelta(days=2))
+        self.appointment = BookingService(self.patient).book(time_slot_id=self.slot.id)
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def _assert_cancelled(self):
+        appointment = Appointment.objects.get(id=self.appointment.id)
+        self.assertEqual(appointment.status, 'cancelled')
+        self.assertEqual(Payment.objects.get(appointment=appointment).status, 'cancelled')
+        self.assertFalse(AvailableTimeSlot.objects.get(id=self.slot.id).is_booked)
+
+    def test_cancel_action(self):
+        response = self.client.post(f'/api/v1/appointments/{self.appointment.id}/cancel/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'cancelled')
+        self._assert_cancelled()
+        # İkinci iptal reddedilir
+        self.assertEqual(self.client.post(f'/api/v1/appointments/{self.appointment.id}/cancel/').status_code, 400)
+
+    def test_patient_delete_cancels(self):
+        self.assertEqual(self.client.delete(f'/api/v1/appointments/{self.appointment.id}/').status_code, 204)
+        self._assert_cancelled()
+        # Slot tekrar alınabilir; iptal edilmiş kayıt 'appt_active_slot_uniq' kısıtına takılmaz
+        BookingService(self.patient).book(time_slot_id=self.slot.id)
+        self.assertEqual(Appointment.objects.filter(time_slot=self.slot).count(), 2)
+
+
+@override_settings(SENDGRID_API_KEY='')
+class RescheduleTests(AppointmentTestCase):
+    """Taşıma: süre, fiyat ve bekleyen ödeme tutarı yeni slottan hesaplanır; dolu slota taşınamaz"""
+
+    def setUp(self):
+        start = timezone.now() + timedelta(days=2)
+
+        def slot(hours, minutes):
+            return self.create_slot(start + timedelta(hours=hours), minutes=minutes)
+
+        self.old_slot, self.long_slot, self.same_length_slot = slot(0, 50), slot(2, 90), slot(4, 50)
+        self.appointment = BookingService(self.patient).book(time_slot_id=self.old_slot.id)
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def _reschedule(self, slot):
+        return self.client.post(
+            f'/api/v1/appointments/{self.appointment.id}/reschedule/', {'time_slot_id': slot.id}, format='json'
+        )
+
+    def test_pending_appointment_is_repriced(self):
+        response = self._reschedule(self.long_slot)
+        self.assertEqual(response.status_code, 200)
+        appointment = Appointment.objects.get(id=self.appointment.id)
+        expected = calculate_session_price(90, AppointmentPrice.get_hourly_rate())
+        self.assertEqual((appointment.time_slot_id, appointment.duration_minutes, appointment.price), (self.long_slot.id, 90, expected))
+        self.assertEqual(Payment.objects.get(appointment=appointment).amount, expected)
+        self.assertEqual(response.data['payment']['amount'], str(expected))
+        self.assertFalse(AvailableTimeSlot.objects.get(id=self.old_slot.id).is_booked)
+        self.assertTrue(AvailableTimeSlot.objects.get(id=self.long_slot.id).is_booked)
+
+    def test_conflicting_slot_changes_nothing(self):
+        other = self.create_patient('diger@example.com', first_name='Diger')
+        BookingService(other).book(time_slot_id=self.long_slot.id)
+        self.assertEqual(self._reschedule(self.long_slot).status_code, 400)
+        appointment = Appointment.objects.get(id=self.appointment.id)
+        self.assertEqual((appointment.time_slot_id, appointment.duration_minutes), (self.old_slot.id, 50))
+        self.assertTrue(AvailableTimeSlot.objects.get(id=self.old_slot.id).is_booked)
+
+    def test_paid_appointment_keeps_length_and_price(self):
+        Appointment.objects.filter(id=self.appointment.id).update(status='paid')
+        self.assertEqual(self._reschedule(self.long_slot).status_code, 400)
+        self.assertFalse(AvailableTimeSlot.objects.get(id=self.long_slot.id).is_booked)
+
+        self.assertEqual(self._reschedule(self.same_length_slot).status_code, 200)
+        appointment = Appointment.objects.get(id=self.appointment.id)
+        self.assertEqual(appointment.time_slot_id, self.same_length_slot.id)
+        self.assertEqual(appointment.price, self.appointment.price)
+
+
+@override_settings(EMAIL_OUTBOX_LEASE_SECONDS=300, EMAIL_OUTBOX_RETRY_BASE_SECONDS=30, EMAIL_OUTBOX_MAX_ATTEMPTS=3)
+class EmailOutboxTests(TestCase):
+    """Outbox: satırlar kiralanarak alınır, sonuçlar sadece kiralamayı tutan worker tarafından yazılır"""
+
+    def setUp(self):
+        enqueue_messages([
+            EmailMultiAlternatives(f'Konu {i}', 'Metin', 'bildirim@example.com', [f'hasta{i}@example.com'])
+            for i in range(3)
+        ])
+        self.now = timezone.now()
+
+    def test_claim_leases_rows_once(self):
+        first = claim_batch(2, now=self.now)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len({row.lease_token for row in first}), 1)
+        self.assertTrue(all(row.locked_until == self.now + timedelta(seconds=300) for row in first))
+        second = claim_batch(2, now=self.now)
+        self.assertEqual([row.id for row in second], [EmailOutbox.objects.order_by('id').last().id])
+        self.assertEqual(claim_batch(2, now=self.now), [])
+
+        self.assertEqual(deliver_batch(first, now=self.now), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(EmailOutbox.objects.filter(status='sent', lease_token=None).count(), 2)
+
+    def test_expired_lease_is_reclaimed_and_stale_worker_writes_nothing(self):
+        stale = claim_batch(3, now=self.now)
+        later = self.now + timedelta(seconds=301)
+        fresh = claim_batch(3, now=later)
+        self.assertEqual([row.id for row in fresh], [row.id for row in stale])
+
+        # Eski worker geç bitirdi: kiralama artık onun değil, sonuç yazılmaz
+        self.assertEqual(deliver_batch(stale, now=later), (0, 0))
+        self.assertEqual(EmailOutbox.objects.filter(status='pending', lease_token=fresh[0].lease_token).count(), 3)
+        self.assertEqual(deliver_batch(fresh, now=later), (3, 0))
+
+    def test_failed_send_backs_off_then_gives_up(self):
+        failing = mock.patch('appointments.outbox.send_each', side_effect=lambda messages: [(m, 'SMTP hatasi') for m in messages])
+        with failing:
+            self.assertEqual(deliver_batch(claim_batch(3, now=self.now), now=self.now), (0, 3))
+        for row in EmailOutbox.objects.all():
+            self.assertEqual((row.status, row.attempts, row.last_error, row.lease_token), ('pending', 1, 'SMTP hatasi', None))
+            # 30 sn * 2^0, %10 jitter
+            self.assertTrue(timedelta(seconds=30) <= row.next_attempt_at - self.now <= timedelta(seconds=33))
+        # Bekleme süresi dolmadan tekrar alınmaz
+        self.assertEqual(claim_batch(3, now=self.now + timedelta(seconds=10)), [])
+
+        EmailOutbox.objects.update(attempts=2, next_attempt_at=self.now)
+        with failing:
+            self.assertEqual(deliver_batch(claim_batch(3, now=self.now), now=self.now), (0, 3))
+        self.assertEqual(set(EmailOutbox.objects.values_list('status', 'attempts')), {('failed', 3)})
+        self.assertEqual(claim_batch(3, now=self.now + timedelta(days=1)), [])
+
+
+class EmailExecutorTests(TestCase):
+    """Sınırlı email havuzu: kuyruk doluyken istek beklemez (varsayılan: at), kapanışta kuyruk boşaltılır"""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def _blocking_send(self, messages):
+        self.started.set()
+        self.release.wait(5)
+        return len(messages)
+
+    def _message(self, i):
+        return EmailMultiAlternatives(f'Konu {i}', 'Metin', 'bildirim@example.com', [f'hasta{i}@example.com'])
+
+    def _fill(self, executor):
+        """Tek thread meşgul, tek kuyruk yeri dolu"""
+        # Temizlikte havuz boşaltılmadan önce gönderim serbest bırakılır
+        self.addCleanup(self.release.set)
+        self.assertTrue(executor.submit([self._message(0)], self._blocking_send))
+        self.assertTrue(self.started.wait(5))
+        self.assertTrue(executor.submit([self._message(1)], self._blocking_send))
+
+    def test_full_queue_drops_by_default(self):
+        executor = BoundedEmailExecutor(max_workers=1, max_queue=1)
+        self.addCleanup(executor.drain, 5)
+        self._fill(executor)
+        self.assertFalse(executor.submit([self._message(2)], self._blocking_send))
+        self.assertEqual(executor.stats()['dropped'], 1)
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_spill_writes_overflow_to_outbox(self):
+        executor = BoundedEmailExecutor(max_workers=1, max_queue=1, overflow='spill')
+        self.addCleanup(executor.drain, 5)
+        self._fill(executor)
+        self.assertFalse(executor.submit([self._message(2)], self._blocking_send))
+        self.assertEqual(executor.stats()['spilled'], 1)
+        self.assertEqual(list(EmailOutbox.objects.values_list('to', flat=True)), [['hasta2@example.com']])
+
+    def test_drain_sends_queue_or_applies_overflow_on_timeout(self):
+        executor = BoundedEmailExecutor(max_workers=1, max_queue=1)
+        self._fill(executor)
+        # Süre dolar: çalışan iş bitmemiş, kuyruktaki iş başlamamış -> overflow (drop)
+        self.assertFalse(executor.drain(0.1))
+        self.assertEqual(executor.stats()['dropped'], 1)
+        self.assertFalse(executor.submit([self._message(3)], self._blocking_send))
+
+        executor = BoundedEmailExecutor(max_workers=1, max_queue=1)
+        self._fill(executor)
+        self.release.set()
+        self.assertTrue(executor.drain(5))
+        stats = executor.stats()
+        self.assertEqual((stats['sent'], stats['dropped'], stats['depth']), (2, 0, 0))
+
+
+@override_settings(DEFAULT_FROM_EMAIL='bildirim@example.com')
+class NotificationRenderingTests(TestCase):
+    """
+    Ortak render katmanı: metin gövdesi kaçışsız, HTML gövdesi kaçışlı üretilir; ortak şablondan
+    doldurulan mesaj, aynı context ile tek tek üretilen mesajla aynıdır.
+    """
+    template = 'appointment_reminder_patient'
+    subject = 'Randevu Hatırlatması - {appointment_datetime}'
+
+    def _context(self, **overrides):
+        context = {
+            'patient_name': 'Ayşe Yılmaz', 'psychologist_name': 'Psk',
+            'appointment_date': '19 Ekim 2026', 'appointment_time': '14:30',
+            'appointment_datetime': '19 Ekim 2026, 14:30',
+        }
+        context.update(overrides)
+        return context
+
+    def test_text_is_not_escaped_html_is(self):
+        message = render_message(self.template, 'Konu', self._context(patient_name='<A & B>'), 'hasta@example.com')
+        self.assertIn('Merhaba <A & B>,', message.body)
+        html = message.alternatives[0][0]
+        self.assertIn('&lt;A &amp; B&gt;', html)
+        self.assertNotIn('<A & B>', html)
+
+    def test_html_sensitive_values_are_rendered_separately(self):
+        plain, sensitive = render_personalized(
+            self.template, self.subject,
+            [(self._context(), 'hasta1@example.com'), (self._context(patient_name='A & B'), 'hasta2@example.com')],
+        )
+        self.assertTrue(plain.substitutions)
+        # Kaçış gerektiren değer yer tutucuyla taşınmaz (SendGrid metin ve HTML'e aynı değeri yazar)
+        self.assertFalse(getattr(sensitive, 'substitutions', None))
+        self.assertEqual(sensitive.subject, 'Randevu Hatırlatması - 19 Ekim 2026, 14:30')
+        self.assertIn('Merhaba A & B,', sensitive.body)
+        self.assertIn('A &amp; B', sensitive.alternatives[0][0])
+
+    def test_resolved_message_matches_render_message(self):
+        context = self._context()
+        expected = render_message(self.template, self.subject.format(**context), context, 'hasta@example.com')
+        shared = render_personalized(self.template, self.subject, [(context, 'hasta@example.com')])[0]
+        self.assertNotEqual(shared.body, expected.body)
+        resolved = resolve_substitutions(shared)
+        self.assertEqual(
+            (resolved.subject, resolved.body, resolved.alternatives, resolved.to, resolved.from_email),
+            (expected.subject, expected.body, expected.alternatives, expected.to, expected.from_email),
+        )
+        # Yer tutucusu olmayan mesaj olduğu gibi döner
+        self.assertIs(resolve_substitutions(expected), expected)
+
+    def test_notification_context_fields(self):
+        psychologist = CustomUser(email='psikolog@example.com', first_name='Psk')
+        patient = CustomUser(email='hasta@example.com', first_name='Ayşe', last_name='Yılmaz')
+        start = datetime(2026, 10, 19, 14, 30, tzinfo=dt_timezone.utc)
+        slot = AvailableTimeSlot(psychologist=psychologist, start_time=start, end_time=start + timedelta(minutes=50))
+        ctx = NotificationContext(Appointment(patient=patient, time_slot=slot))
+        self.assertEqual(ctx.patient_context(extra=1), self._context(extra=1))
+        self.assertEqual(ctx.psychologist_context()['patient_phone'], 'Belirtilmemiş')
+
+
+@override_settings(SENDGRID_API_KEY='test', DEFAULT_FROM_EMAIL='bildirim@example.com')
+class SendGridBackendTests(TestCase):
+    """
+    SendGrid: aynı şablondan üretilen kişisel email'ler tek istekte (alıcı başına bir personalization)
+    gönderilir, istek başına en fazla SENDGRID_MAX_PERSONALIZATIONS; başarısız istek sadece kendi mesajlarını etkiler.
+    """
+
+    def _reminders(self, count):
+        return render_personalized(
+            'appointment_reminder_patient',
+            'Randevu Hatırlatması - {appointment_datetime}',
+            [
+                ({
+                    'patient_name': f'Hasta {i}', 'psychologist_name': 'Psk',
+                    'appointment_date': '19 Ekim 2026', 'appointment_time': f'{i % 24:02d}:00',
+                    'appointment_datetime': f'19 Ekim 2026, {i % 24:02d}:00',
+                }, f'hasta{i}@example.com')
+                for i in range(count)
+            ],
+        )
+
+    def test_personalized_messages_share_one_request(self):
+        messages = self._reminders(3)
+        groups = SendGridBackend()._groups(messages)
+        self.assertEqual(len(groups), 1)
+        key, chunk = groups[0]
+        payload = SendGridBackend()._payload(key, chunk)
+        self.assertEqual(payload['subject'], f"Randevu Hatırlatması - {placeholder('appointment_datetime')}")
+        self.assertIn(placeholder('patient_name'), payload['content'][0]['value'])
+        self.assertEqual(
+            [p['substitutions'][placeholder('patient_name')] for p in payload['personalizations']],
+            ['Hasta 0', 'Hasta 1', 'Hasta 2'],
+        )
+
+        # substitutions desteklemeyen gönderim yolları için yer tutucular yerel olarak doldurulur
+        resolved = resolve_substitutions(messages[1])
+        self.assertEqual(resolved.subject, 'Randevu Hatırlatması - 19 Ekim 2026, 01:00')
+        self.assertIn('Merhaba Hasta 1,', resolved.body)
+        self.assertIn('Hasta 1', resolved.alternatives[0][0])
+
+    def _transport(self, *connections):
+        transport = SendGridTransport('test', 'http://sendgrid.test')
+        transport._connect = mock.Mock(side_effect=list(connections))
+        return transport
+
+    def _connection(self, request_error=None, response_error=None):
+        connection = mock.Mock()
+        connection.request.side_effect = request_error
+        if response_error:
+            connection.getresponse.side_effect = response_error
+        else:
+            connection.getresponse.return_value = mock.Mock(status=202, will_close=False, read=mock.Mock(return_value=b''))
+        return connection
+
+    def test_transport_retries_only_unsent_requests(self):
+        # Boşta kapanmış (yeniden kullanılan) bağlantıya yazılamadı: yeni bağlantıyla bir kez tekrar
+        idle, fresh = self._connection(request_error=BrokenPipeError()), self._connection()
+        transport = self._transport(fresh)
+        transport._connection = idle
+        self.assertEqual(transport.post('/v3/mail/send', {}), (202, b''))
+        self.assertEqual(fresh.request.call_count, 1)
+
+        # İstek gönderildikten sonra bağlantı koptu: SendGrid kabul etmiş olabilir, tekrar gönderilmez
+        sent = self._connection(response_error=http.client.RemoteDisconnected('kapandi'))
+        transport = self._transport(self._connection())
+        transport._connection = sent
+        with self.assertRaises(http.client.RemoteDisconnected):
+            transport.post('/v3/mail/send', {})
+        transport._connect.assert_not_called()
+
+        # Yeni bağlantıda yazma hatası da tekrar denenmez
+        transport = self._transport(self._connection(request_error=ConnectionRefusedError()), self._connection())
+        with self.assertRaises(ConnectionRefusedError):
+            transport.post('/v3/mail/send', {})
+        self.assertEqual(transport._connect.call_count, 1)
+
+    def test_splits_at_personalization_limit(self):
+        chunks = [chunk for _, chunk in SendGridBackend()._groups(self._reminders(SENDGRID_MAX_PERSONALIZATIONS + 1))]
+        self.assertEqual([len(chunk) for chunk in chunks], [SENDGRID_MAX_PERSONALIZATIONS, 1])
+
+    def test_partial_failure_returns_sent_count(self):
+        transport = mock.Mock()
+        transport.post.side_effect = [(500, b'hata'), (202, b'')]
+        messages = self._reminders(SENDGRID_MAX_PERSONALIZATIONS + 1)
+        with mock.patch('appointments.email_backend.get_transport', return_value=transport):
+            self.assertEqual(SendGridBackend().send_messages(messages), 1)
+            # Hiçbir mesaj gönderilemezse hata fırlatılır
+            transport.post.side_effect = None
+            transport.post.return_value = (500, b'hata')
+            with self.assertRaises(Exception):
+                SendGridBackend().send_messages(messages[:1])
+
+
+@override_settings(SENDGRID_API_KEY='test', DEFAULT_FROM_EMAIL='bildirim@example.com')
+class SendGridStandinTests(TestCase):
+    """
+    Yerel SendGrid test sunucusu: SendGridBackend'in istekleri (personalization'lar) sayılır;
+    500 ve 429 yanıtları hata olarak döner ve sunucu sayaçlarına yazılır.
+    """
+
+    def _start(self, **kwargs):
+        server = StandinServer(('127.0.0.1', 0), **kwargs)
+        thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(server.shutdown)
+        settings_override = override_settings(SENDGRID_API_HOST=server.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(lambda: get_transport('test', server.url).close())
+        return server
+
+    def _messages(self):
+        return render_personalized(
+            'appointment_reminder_patient', 'Randevu Hatırlatması - {appointment_datetime}',
+            [
+                ({'patient_name': f'Hasta {i}', 'appointment_datetime': '19 Ekim 2026, 14:30'}, f'hasta{i}@example.com')
+                for i in range(3)
+            ],
+        )
+
+    def test_backend_sends_personalizations(self):
+        server = self._start()
+        self.assertEqual(SendGridBackend().send_messages(self._messages()), 3)
+        # Aynı bağlantı üzerinden ikinci istek
+        self.assertEqual(SendGridBackend().send_messages(self._messages()[:1]), 1)
+        stats = server.stats.snapshot()
+        self.assertEqual(
+            {key: stats[key] for key in ('requests', 'accepted', 'messages', 'recipients', 'connections')},
+            {'requests': 2, 'accepted': 2, 'messages': 4, 'recipients': 4, 'connections': 1},
+        )
+
+    def test_error_and_rate_limit_responses(self):
+        for options, counter, status in (({'error_rate': 1.0}, 'errors', 500), ({'rate_limit_rate': 1.0}, 'rate_limited', 429)):
+            with self.subTest(counter=counter):
+                server = self._start(**options)
+                results = SendGridBackend().deliver(self._messages())
+                self.assertEqual(len(results), 3)
+                self.assertTrue(all(f'SendGrid API hatası: {status}' in error for _, error in results))
+                with self.assertRaises(Exception):
+                    SendGridBackend().send_messages(self._messages())
+                stats = server.stats.snapshot()
+                self.assertEqual((stats['requests'], stats[counter], stats['accepted']), (2, 2, 0))
+
+
+class BookingServiceTests(AppointmentTestCase):
+    """
+    Randevu alma: slot, randevu ve ödeme tek transaction'da sabit sayıda sorgu ile yazılır,
+    email commit'ten sonra gönderilir.
+    """
+
+    def setUp(self):
+        start = timezone.now() + timedelta(days=2)
+        self.slots = [self.create_slot(start + timedelta(hours=i)) for i in range(3)]
+        # Saatlik ücret önbellekte (bütçe önbellek isabetini varsayar)
+        AppointmentPrice.get_hourly_rate()
+
+    def test_query_budget(self):
+        service = BookingService(self.patient)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks() as callbacks:
+            appointment = service.book(time_slot_id=self.slots[0].id)
+        # Transaction/savepoint komutları hariç: UPDATE slot, SELECT slot, INSERT randevu, INSERT ödeme
+        statements = [q['sql'] for q in queries if not q['sql'].upper().startswith(('SAVEPOINT', 'RELEASE', 'ROLLBACK'))]
+        self.assertEqual(len(statements), 4, statements)
+        # Email ve müsaitlik özeti commit'ten önce işlenmez
+        self.assertEqual(len(callbacks), 3)  # email + slot sürümü (ETag) + müsaitlik özeti
+
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, 'pending_payment')
+        self.assertEqual(appointment.payment.amount, appointment.price)
+        self.assertTrue(AvailableTimeSlot.objects.get(id=self.slots[0].id).is_booked)
+
+    def test_taken_slot_writes_nothing(self):
+        BookingService(self.patient).book(time_slot_id=self.slots[1].id)
+        with self.assertRaises(SlotUnavailableError):
+            BookingService(self.patient).book(time_slot_id=self.slots[1].id)
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertEqual(Payment.objects.count(), 1)
+
+
+@override_settings(SENDGRID_API_KEY='', DEFAULT_FROM_EMAIL='bildirim@example.com')
+class ReminderTests(AppointmentTestCase):
+    """
+    Hatırlatma: pencere içindeki her ödenmiş randevuya tek bir hatırlatma gider,
+    iş tekrar çalıştırıldığında ikinci email gönderilmez.
+    """
+
+    def setUp(self):
+        now = timezone.now()
+        # 5 ödenmiş randevu pencere içinde; biri ödenmemiş, biri pencere dışında
+        starts = [now + timedelta(hours=i + 1) for i in range(6)] + [now + timedelta(days=3)]
+        for i, start in enumerate(starts):
+            slot = self.create_slot(start, is_booked=True)
+            Appointment.objects.create(patient=self.patient, time_slot=slot, status='pending_payment' if i == 5 else 'paid')
+
+    def test_sends_once(self):
+        sent, failed = send_reminders(chunk_size=2)
+        self.assertEqual((sent, failed), (5, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertTrue(all(message.to == ['hasta@example.com'] for message in mail.outbox))
+        # Ortak şablonun yer tutucuları (substitutions) locmem backend'inde doldurulmuş olmalı
+        self.assertTrue(all(message.body.startswith('Merhaba Hasta,') for message in mail.outbox))
+        self.assertNotIn(placeholder('appointment_datetime'), mail.outbox[0].subject)
+        self.assertEqual(Appointment.objects.filter(reminder_sent_at__isnull=False).count(), 5)
+
+        # Tekrar çalıştırma (ör. yarıda kesilen işin yeniden başlatılması) email göndermez
+        self.assertEqual(send_reminders(chunk_size=2), (0, 0))
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(EMAIL_DELIVERY='outbox')
+    def test_outbox_mode_enqueues_with_claim(self):
+        self.assertEqual(send_reminders(), (5, 0))
+        self.assertEqual(EmailOutbox.objects.count(), 5)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+@override_settings(
+    SENDGRID_API_KEY='test', DEFAULT_FROM_EMAIL='bildirim@example.com',
+    EMAIL_DELIVERY='outbox', BOOKING_SIGNAL_SIDE_EFFECTS=False,
+)
+class PsychologistDigestTests(AppointmentTestCase):
+    """
+    Özet modu: psikolog olayları email yerine birikir, tek sorgu ve tek gönderimle
+    psikolog başına tek özet email'i olarak gönderilir.
+    """
+    psychologist_fields = {'email_digest': True}
+
+    def setUp(self):
+        start = timezone.now() + timedelta(days=2)
+        for i in range(3):
+            slot = self.create_slot(start + timedelta(hours=i))
+            BookingService(self.patient).book(time_slot_id=slot.id)
+
+    def test_events_accumulate_instead_of_email(self):
+        # Hastaya email gider, psikolog için sadece olay birikir
+        self.assertEqual(DigestEvent.objects.filter(psychologist=self.psychologist, kind='created').count(), 3)
+        self.assertEqual([row.to for row in EmailOutbox.objects.all()], [['hasta@example.com']] * 3)
+
+    @override_settings(EMAIL_DELIVERY='thread')
+    def test_flush_sends_one_digest(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(flush_digests(), (1, 3))
+        # Transaction/savepoint komutları hariç: SELECT olaylar + psikolog, UPDATE sent_at
+        statements = [q['sql'] for q in queries if not q['sql'].upper().startswith(('SAVEPOINT', 'RELEASE', 'ROLLBACK'))]
+        self.assertEqual(len(statements), 2, statements)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['psikolog@example.com'])
+        self.assertIn('3 yeni bildirim', mail.outbox[0].subject)
+
+        self.assertEqual(flush_digests(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class SendGridEventWebhookTests(TestCase):
+    """
+    SendGrid event webhook: imzasız istek reddedilir, olaylar tek istekte toplu kaydedilir,
+    tekrar gönderilen olaylar bounce sayaçlarını ikinci kez artırmaz.
+    """
+    url = '/email/events/sendgrid/'
+
+    def setUp(self):
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+
+        self.private_key = ec.generate_private_key(ec.SECP256R1())
+        public_der = self.private_key.public_key().public_bytes(
+            serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        settings_override = override_settings(SENDGRID_EVENT_WEBHOOK_PUBLIC_KEY=base64.b64encode(public_der).decode())
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _post(self, events, sign=True):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec
+
+        body = json.dumps(events)
+        timestamp = str(int(timezone.now().timestamp()))
+        headers = {}
+        if sign:
+            signature = self.private_key.sign((timestamp + body).encode(), ec.ECDSA(hashes.SHA256()))
+            headers = {SIGNATURE_HEADER: base64.b64encode(signature).decode(), TIMESTAMP_HEADER: timestamp}
+        return self.client.post(self.url, body, content_type='application/json', headers=headers)
+
+    def _events(self, count):
+        now = int(timezone.now().timestamp())
+        events = [
+            {'email': f'hasta{i}@example.com', 'event': 'delivered', 'timestamp': now, 'sg_event_id': f'd{i}', 'sg_message_id': f'm{i}.filter'}
+            for i in range(count)
+        ]
+        events += [
+            {'email': 'Bounce@Example.com', 'event': 'bounce', 'timestamp': now, 'sg_event_id': 'b1', 'reason': '550 mailbox unavailable'},
+            {'email': 'bounce@example.com', 'event': 'bounce', 'timestamp': now + 60, 'sg_event_id': 'b2'},
+            {'email': 'bounce@example.com', 'event': 'dropped', 'timestamp': now, 'sg_event_id': 'x1'},
+        ]
+        return events
+
+    def test_rejects_invalid_signature(self):
+        self.assertEqual(self._post(self._events(2), sign=False).status_code, 403)
+        response = self.client.post(
+            self.url, json.dumps(self._events(2)), content_type='application/json',
+            headers={SIGNATURE_HEADER: 'bm90LWEtc2lnbmF0dXJl', TIMESTAMP_HEADER: '1'},
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(EmailEvent.objects.exists())
+
+    def test_bulk_ingest_and_counts(self):
+        events = self._events(500)
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post(events)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json(), {'received': 503, 'stored': 503})
+        self.assertEqual(EmailEvent.objects.count(), 503)
+        # Olay sayısından bağımsız: INSERT/SELECT/UPDATE sayaçlar + olayların INSERT ... RETURNING'i
+        # (SQLite'da parametre sınırına göre birkaç INSERT'e bölünür)
+        statements = [q['sql'] for q in queries if not q['sql'].upper().startswith(('SAVEPOINT', 'RELEASE', 'ROLLBACK'))]
+        others = [sql for sql in statements if 'INTO "appointments_emailevent" ' not in sql]
+        self.assertEqual(len(others), 3, others)
+        self.assertEqual(event_counts('bounce@example.com'), {'bounce': 2, 'dropped': 1})
+
+        # Tekrar gönderilen olaylar atlanır; 'stored' sadece gerçekten eklenen olayları sayar
+        response = self._post(events + [{'email': 'bounce@example.com', 'event': 'bounce', 'timestamp': 1, 'sg_event_id': 'b3'}])
+        self.assertEqual(response.json(), {'received': 504, 'stored': 1})
+        self.assertEqual(EmailEvent.objects.count(), 504)
+        self.assertEqual(event_counts('bounce@example.com'), {'bounce': 3, 'dropped': 1})
+
+        # SendGrid tekrar denemesi: olaylar ve sayaçlar değişmez
+        self.assertEqual(self._post(events).json(), {'received': 503, 'stored': 0})
+        self.assertEqual(EmailEvent.objects.count(), 504)
+        self.assertEqual(event_counts('bounce@example.com'), {'bounce': 3, 'dropped': 1})
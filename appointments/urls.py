@@ -1,12 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AvailableTimeSlotViewSet, AppointmentViewSet, AppointmentPriceViewSet
+from .views import AvailableTimeSlotViewSet, AppointmentViewSet, AppointmentPriceViewSet, ScheduleRuleViewSet
 
 router = DefaultRouter()
 # İki yeni adres seti tanımlıyoruz
 router.register(r'slots', AvailableTimeSlotViewSet, basename='availabletimeslot')
 router.register(r'appointments', AppointmentViewSet, basename='appointment')
 router.register(r'price-setting', AppointmentPriceViewSet, basename='appointmentprice')
+router.register(r'schedule-rules', ScheduleRuleViewSet, basename='schedulerule')
 
 urlpatterns = [
     path('', include(router.urls)),
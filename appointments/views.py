@@ -1,17 +1,49 @@
 from urllib import request
 from django.shortcuts import render
-from django.db.models import Q
-from decimal import Decimal
+from django.db import IntegrityError, transaction
 
 from rest_framework.exceptions import ValidationError
 from rest_framework import viewsets, permissions, status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, BasePermission
 from rest_framework.response import Response
-
-from .models import AvailableTimeSlot, Appointment, AppointmentPrice
-from .serializers import AvailableTimeSlotSerializer, AppointmentSerializer, AppointmentPriceSerializer
-
-from datetime import datetime
+from rest_framework.decorators import action
+
+from .models import AvailableTimeSlot, Appointment, AppointmentPrice, ScheduleRule, calculate_session_price
+from .serializers import (
+    AvailableTimeSlotSerializer, AppointmentSerializer, AppointmentPriceSerializer,
+    ScheduleRuleSerializer, FreeSlotSerializer, BulkCancelSerializer, RescheduleSerializer,
+)
+from .filters import AppointmentFilterBackend, SlotSearchParams, parse_int_param
+from .pagination import AppointmentKeysetPagination
+from .booking_service import BookingService, claim_slot
+from .cancellation_service import cancel_appointments, cancel_upcoming_appointments
+from .snapshots import iter_snapshot_slots, next_available_slots, slots_changed
+from .cache_versions import bump_version
+from .email_service import schedule_notification, send_appointment_rescheduled_email
+from .email_events import SIGNATURE_HEADER, TIMESTAMP_HEADER, ingest_events, verify_signature
+from .conditional import PRICE_RESOURCE, SLOTS_RESOURCE, versioned_condition
+from .availability import (
+    BITMAP_UNIT_MINUTES, SlotUnavailableError, availability_bitmap, default_window, is_virtual_engine,
+    iter_free_slots, materialize_virtual_slot,
+)
+from .scheduling import SlotConflictError, publish_schedule_rule, retract_schedule_rule, slot_has_overlap
+
+import base64
+import json
+import logging
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+logger = logging.getLogger(__name__)
+
+SLOT_OVERLAP_MESSAGE = "Bu zaman aralığı (veya bir kısmı) zaten başka bir müsait slot ile çakışıyor."
 
 # --- Permission Sınıfları ---
 
@@ -92,6 +124,105 @@ class AvailableTimeSlotViewSet(viewsets.ModelViewSet):
         # Sadece rezerve EDİLMEMİŞ slotları listele ve tarih/saat sıralamasına göre diz
         return AvailableTimeSlot.objects.filter(is_booked=False).order_by('start_time')
 
+    # Varsayılan pencere 'şimdi'den başladığı için ETag'e dakika dilimi de eklenir
+    @versioned_condition(SLOTS_RESOURCE, time_bucket=True)
+    def list(self, request, *args, **kwargs):
+        """
+        Müsait slot araması (from, to, after, psychologist, min_duration, limit)
+        Parametreler için bkz. filters.SlotSearchParams
+        """
+        search = SlotSearchParams.from_request(request)
+        if not is_virtual_engine():
+            # Slot tablosu taranmaz; psikolog bazlı müsaitlik özetinden okunur (bkz. appointments/snapshots.py)
+            free_slots = search.filter_free_slots(iter_snapshot_slots(search.psychologist_id))
+            serializer = self.get_serializer(free_slots, many=True)
+            return Response(serializer.data)
+
+        # Sanal motor: müsaitlik kurallardan hesaplanır (bkz. appointments/availability.py)
+        # 'after' pencerenin başlangıcını ileri taşır (varsayılan ufuk da oradan sayılır)
+        window_start = max(search.start, search.after) if search.after is not None else search.start
+        window_end = search.end
+        if window_end is not None and window_end <= window_start:
+            return Response([])
+        if window_end is None:
+            default_start, default_end = default_window()
+            window_end = max(default_end, window_start + (default_end - default_start))
+        free_slots = iter_free_slots(window_start, window_end, search.psychologist_id)
+        serializer = FreeSlotSerializer(search.filter_free_slots(free_slots), many=True)
+        return Response(serializer.data)
+
+    # Bitmap endpoint'inde tek istekte istenebilecek en fazla gün
+    MAX_BITMAP_DAYS = 92
+
+    @action(detail=False, methods=['get'], url_path='availability')
+    @versioned_condition(SLOTS_RESOURCE, time_bucket=True)
+    def availability(self, request):
+        """
+        Takvim görünümü için sıkıştırılmış müsaitlik: GET /api/v1/slots/availability/
+        Her gün için 96 bitlik (15 dakikalık dilimler) maske döner; bit 1 = dilim boş bir slot içinde.
+        Parametreler: from, to (YYYY-AA-GG, dahil), psychologist, encoding (base64 | hex), tz
+        Örnek: 30 günlük ay görünümü ~600 byte.
+        """
+        tz_name = request.query_params.get('tz') or settings.AVAILABILITY_TIME_ZONE
+        try:
+            tz = ZoneInfo(tz_name)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValidationError({"tz": "Geçersiz zaman dilimi."})
+
+        encoding = request.query_params.get('encoding', 'base64')
+        if encoding not in ('base64', 'hex'):
+            raise ValidationError({"encoding": "'base64' veya 'hex' olmalıdır."})
+
+        start_date = self._parse_date_param(request, 'from') or timezone.now().astimezone(tz).date()
+        end_date = self._parse_date_param(request, 'to') or start_date + timedelta(days=30)
+        if end_date < start_date:
+            raise ValidationError({"to": "Bitiş tarihi başlangıç tarihinden önce olamaz."})
+        if (end_date - start_date).days + 1 > self.MAX_BITMAP_DAYS:
+            raise ValidationError({"to": f"En fazla {self.MAX_BITMAP_DAYS} gün istenebilir."})
+
+        masks = availability_bitmap(start_date, end_date, tz, parse_int_param(request, 'psychologist'))
+        byte_count = 24 * 60 // BITMAP_UNIT_MINUTES // 8
+        encode = (lambda raw: base64.b64encode(raw).decode('ascii')) if encoding == 'base64' else bytes.hex
+        return Response({
+            'from': start_date.isoformat(),
+            'to': end_date.isoformat(),
+            'timezone': tz_name,
+            'unit_minutes': BITMAP_UNIT_MINUTES,
+            'encoding': encoding,
+            'days': [encode(mask.to_bytes(byte_count, 'big')) for mask in masks],
+        })
+
+    @action(detail=False, methods=['get'], url_path='next-available')
+    @versioned_condition(SLOTS_RESOURCE, time_bucket=True)
+    def next_available(self, request):
+        """
+        Her psikoloğun en yakın boş slotu: GET /api/v1/slots/next-available/?psychologist=<id>
+        Müsaitlik özetinden okunur (materialized motor).
+        """
+        psychologist_id = parse_int_param(request, 'psychologist')
+        if is_virtual_engine():
+            window_start, window_end = default_window()
+            first_by_psychologist = {}
+            for slot in iter_free_slots(window_start, window_end, psychologist_id):
+                first_by_psychologist.setdefault(slot.psychologist, slot)
+            slots = list(first_by_psychologist.values())
+        else:
+            slots = next_available_slots(psychologist_id)
+        return Response(FreeSlotSerializer(slots, many=True).data)
+
+    @staticmethod
+    def _parse_date_param(request, name):
+        value = request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: "Geçersiz tarih formatı. YYYY-AA-GG bekleniyor."})
+        return parsed
+
     def create(self, request, *args, **kwargs):
         # Gelen isteğin (POST) içinden yeni slotun başlangıç ve bitiş zamanlarını al
         new_start_time_str = request.data.get('start_time')
@@ -113,37 +244,114 @@ class AvailableTimeSlotViewSet(viewsets.ModelViewSet):
             raise ValidationError({"detail": "Bitiş zamanı, başlangıç zamanından önce veya ona eşit olamaz."})
 
         # ÇAKIŞMA KONTROLÜ
-        # Veritabanında, bu yeni zaman aralığıyla *çakışan*
-        # HERHANGİ BİR slot var mı diye bak.
+        # Kontrol sadece slotu oluşturan psikoloğun kendi slotları üzerinde yapılır
+        # (bir psikoloğun slotu diğer psikologların takvimini engellemez).
+        # Slot önce kaydedilir, sonra aynı transaction içinde çakışma aranır (bkz. perform_create):
+        # - PostgreSQL: 'slot_no_overlap_per_psychologist' EXCLUDE constraint'i eşzamanlı
+        #   iki isteğin ikisinin birden geçmesini engeller (IntegrityError).
+        # - SQLite: yazma kilidi transaction'ları sıraya sokar, ikinci istek
+        #   kaydettikten sonra ilkinin slotunu görür ve geri alınır.
+        try:
+            with transaction.atomic():
+                return super().create(request, *args, **kwargs)
+        except IntegrityError:
+            raise ValidationError({"detail": SLOT_OVERLAP_MESSAGE})
 
-        # Çakışma Mantığı:
-        # (Eski.Başlangıç < Yeni.Bitiş) VE (Eski.Bitiş > Yeni.Başlangıç)
+    def update(self, request, *args, **kwargs):
+        # Güncellemede de aynı çakışma kuralları geçerli
+        try:
+            with transaction.atomic():
+                return super().update(request, *args, **kwargs)
+        except IntegrityError:
+            raise ValidationError({"detail": SLOT_OVERLAP_MESSAGE})
 
-        overlapping_slots = AvailableTimeSlot.objects.filter(
-            Q(start_time__lt=new_end_time) & 
-            Q(end_time__gt=new_start_time)
-        )
+    def perform_create(self, serializer):
+        # 'serializer.save()' demeden önce, 'psychologist' alanını o an giriş yapmış olan kullanıcı olarak ata.
+        slot = serializer.save(psychologist=self.request.user)
+        self._ensure_no_overlap(slot)
+
+    def perform_update(self, serializer):
+        slot = serializer.save()
+        self._ensure_no_overlap(slot)
+
+    def perform_destroy(self, instance):
+        # İptal edilmiş randevusu olan slot silinmez (randevu ve ödeme kayıtları korunur, bkz. Appointment.time_slot)
+        if instance.appointments.exists():
+            raise ValidationError({"detail": "Bu slotun randevu kaydı olduğu için silinemez."})
+        super().perform_destroy(instance)
 
-        # KARAR
-        if overlapping_slots.exists():
+    def _ensure_no_overlap(self, slot):
+        """
+        Kaydedilen slot, aynı psikoloğun başka bir slotu ile çakışıyorsa hata fırlat.
+        Çağıran transaction.atomic() bloğu sayesinde kayıt geri alınır.
+        """
+        if slot_has_overlap(slot):
             # EĞER ÇAKIŞMA VARSA: Hata fırlat (400 Bad Request)
-            raise ValidationError({"detail": "Bu zaman aralığı (veya bir kısmı) zaten başka bir müsait slot ile çakışıyor."})
+            raise ValidationError({"detail": SLOT_OVERLAP_MESSAGE})
+
+
+class ScheduleRuleViewSet(viewsets.ModelViewSet):
+    """
+    Tekrarlayan çalışma kuralları - Sadece admin (psikolog)
+    POST ile kural oluşturulur ve kuralın tüm slotları tek istekte üretilir
+    (SLOT_ENGINE='virtual' ise slot üretilmez, kural müsaitlik hesabında kullanılır).
+    Kurallar güncellenemez; yanlış kural silinip yenisi oluşturulur. Silinen kuralın
+    alınmamış gelecek slotları da silinir (bkz. scheduling.retract_schedule_rule).
+    """
+    serializer_class = ScheduleRuleSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    # Hata cevabında gösterilecek en fazla çakışma sayısı
+    MAX_REPORTED_CONFLICTS = 20
+
+    def get_queryset(self):
+        return ScheduleRule.objects.filter(psychologist=self.request.user).order_by('-created_at')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            with transaction.atomic():
+                rule = serializer.save(psychologist=request.user)
+                # Sanal motorda kurallar slot satırı üretmez, müsaitlik anlık hesaplanır
+                created_slots = 0 if is_virtual_engine() else publish_schedule_rule(rule)
+        except SlotConflictError as e:
+            raise ValidationError({
+                "detail": "Kuralın ürettiği slotlar mevcut slotlarla veya birbirleriyle çakışıyor.",
+                "conflicts": [
+                    {
+                        "start_time": new[0].isoformat(),
+                        "end_time": new[1].isoformat(),
+                        "conflicts_with": {"start_time": other[0].isoformat(), "end_time": other[1].isoformat()},
+                    }
+                    for new, other in e.conflicts[:self.MAX_REPORTED_CONFLICTS]
+                ],
+            })
+        except IntegrityError:
+            # PostgreSQL EXCLUDE constraint (eşzamanlı oluşturulan slotlar)
+            raise ValidationError({"detail": SLOT_OVERLAP_MESSAGE})
+
+        data = dict(serializer.data)
+        data['created_slots'] = created_slots
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def perform_destroy(self, instance):
+        rule_id = instance.id
+        deleted_slots = retract_schedule_rule(instance)
+        logger.info(f"🗑️ [VIEW] Kural silindi - ID: {rule_id}, silinen slot: {deleted_slots}")
 
-        # Çakışma yoksa, ModelViewSet'in normal 'create' işlemine devam etmesine izin ver.
-        return super().create(request, *args, **kwargs)
-    
-    def perform_create(self, serializer):
-        # 'serializer.save()' demeden önce, 'psychologist' alanını o an giriş yapmış olan kullanıcı olarak ata.
-        serializer.save(psychologist=self.request.user)
 
 class AppointmentViewSet(viewsets.ModelViewSet):
     """
     Randevular:
-    - Hasta: Yaratır (POST), Kendi randevularını Listeler (GET), Kendi randevusunu Siler (DELETE)
-    - Psikolog (Admin): Tüm randevuları Listeler (GET), Tüm randevuları Siler (DELETE)
+    - Hasta: Yaratır (POST), Kendi randevularını Listeler (GET), Kendi randevusunu İptal Eder (POST cancel / DELETE)
+    - Psikolog (Admin): Tüm randevuları Listeler (GET), İptal Eder (POST cancel, bulk-cancel), Siler (DELETE)
     """
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticatedOrOptions, IsPatientOwner] # Korumaları ekledik
+    filter_backends = [AppointmentFilterBackend]
+    pagination_class = AppointmentKeysetPagination # Sadece ?cursor / ?page_size ile devreye girer
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -166,54 +374,41 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     def get_queryset(self): # queryset = Appointment.objects.all()
         """
         Giriş yapan kullanıcıya göre listeyi filtrele.
-        Güvenli ilişki kontrolleri ile bozuk referansları filtrele.
+        Slot, hasta ve ödeme aynı sorguda JOIN ile getirilir; satır sayısından
+        bağımsız olarak liste sabit sayıda sorgu ile döner.
         """
         user = self.request.user # Giriş yapan kullanıcıyı al
+        queryset = Appointment.objects.select_related('time_slot', 'patient', 'payment').order_by('-created_at')
         if user.is_staff: # Eğer kullanıcı psikolog (admin) ise
-            # Tüm randevuları göster, ama time_slot veya patient ilişkisi bozuk olanları filtrele
-            queryset = Appointment.objects.select_related('time_slot', 'patient').order_by('-created_at')
-            # Bozuk ilişkileri filtrele
-            return queryset.filter(time_slot__isnull=False, patient__isnull=False)
-        # Değilse (yani hasta ise)
-        # Sadece kendi randevularını göster, ama time_slot ilişkisi bozuk olanları filtrele
-        queryset = Appointment.objects.select_related('time_slot', 'patient').filter(patient=user).order_by('-created_at')
-        return queryset.filter(time_slot__isnull=False)
+            # Tüm randevuları göster
+            return queryset
+        # Değilse (yani hasta ise) sadece kendi randevularını göster
+        return queryset.filter(patient=user)
     
     def list(self, request, *args, **kwargs):
         """
-        Randevu listesi döndürülürken, serialization hataları olan randevuları filtrele.
-        Her randevuyu tek tek serialize ederken ValidationError'ları yakalar ve atlar.
+        Randevu listesi tek bir toplu serialization ile döndürülür.
+        Filtreler: bkz. AppointmentFilterBackend (status, date_from, date_to, psychologist, upcoming)
+        Sayfalama: ?cursor=... veya ?page_size=... gönderilirse keyset sayfalı cevap döner,
+        gönderilmezse eskisi gibi düz dizi döner.
         """
-        try:
-            # Queryset'i al
-            queryset = self.filter_queryset(self.get_queryset())
-            
-            # Her randevuyu tek tek kontrol et ve sadece geçerli olanları ekle
-            filtered_data = []
-            for instance in queryset:
-                try:
-                    # Randevuyu serialize et - eğer ValidationError fırlatılırsa atla
-                    item_serializer = self.get_serializer(instance)
-                    item_data = item_serializer.data
-                    
-                    # Ekstra kontrol: time_slot ve patient olmalı
-                    if (item_data and 
-                        item_data.get('id') and 
-                        item_data.get('time_slot') and 
-                        item_data.get('time_slot', {}).get('start_time')):
-                        filtered_data.append(item_data)
-                except (ValidationError, Exception) as e:
-                    # Serialization hatası - bu randevuyu atla
-                    print(f"AppointmentViewSet.list: Randevu {getattr(instance, 'id', 'unknown')} atlandı: {str(e)}")
-                    continue
-            
-            # Response oluştur
-            return Response(filtered_data, status=status.HTTP_200_OK)
-            
-        except Exception as e:
-            # Genel hata durumunda boş liste döndür
-            print(f"AppointmentViewSet.list hatası: {str(e)}")
-            return Response([], status=status.HTTP_200_OK)
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def get_serializer_context(self):
+        """
+        Saatlik ücret her randevu için ayrı ayrı sorgulanmasın diye istek başına bir kez okunur.
+        """
+        context = super().get_serializer_context()
+        context['hourly_rate'] = AppointmentPrice.get_hourly_rate()
+        return context
 
     def perform_create(self, serializer):
         """
@@ -228,42 +423,180 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             raise ValidationError({"detail": "Psikologlar randevu alamaz."})
 
         # Hastanın bize POST ile yolladığı slot ID'sini al
-        time_slot_id = serializer.validated_data.pop('time_slot_id') # Randevu slot ID'si
+        time_slot_id = serializer.validated_data.pop('time_slot_id', None) # Randevu slot ID'si
+        psychologist_id = serializer.validated_data.pop('psychologist_id', None)
+        start_time = serializer.validated_data.pop('start_time', None)
+        end_time = serializer.validated_data.pop('end_time', None)
         print(f"🟢 [VIEW] time_slot_id: {time_slot_id}")
 
-        try:
-            # O ID'ye ait slotu bul
-            slot = AvailableTimeSlot.objects.get(id=time_slot_id) # Slotu veritabanından al
-            print(f"🟢 [VIEW] Slot bulundu - ID: {slot.id}, is_booked: {slot.is_booked}")
-        except AvailableTimeSlot.DoesNotExist:
-            print(f"🔴 [VIEW] Slot bulunamadı - ID: {time_slot_id}")
-            raise ValidationError({"detail": "Geçersiz zaman slotu ID'si. Belirtilen slot bulunamadı."})
-
-        # Eğer slot zaten doluysa (is_booked=True) hata ver
-        if slot.is_booked:
-            print(f"🔴 [VIEW] Slot zaten dolu - ID: {slot.id}")
-            raise ValidationError({"detail": "Bu zaman slotu zaten dolu. Lütfen başka bir slot seçin."})
+        if time_slot_id is None and not is_virtual_engine():
+            raise ValidationError({"detail": "Zaman slotu ID'si gereklidir."})
 
-        # Hata yoksa: Slotu rezerve et
-        slot.is_booked = True # Slotu dolu yap
-        slot.save() # Değişikliği kaydet
-        print(f"🟢 [VIEW] Slot rezerve edildi - ID: {slot.id}")
+        # Slot rezervasyonu, randevu ve ödeme kaydı tek transaction'da yazılır;
+        # email'ler commit'ten sonra gönderilir (bkz. appointments/booking_service.py)
+        try:
+            appointment = BookingService(user).book(
+                time_slot_id=time_slot_id,
+                psychologist_id=psychologist_id,
+                start_time=start_time,
+                end_time=end_time,
+                notes=serializer.validated_data.get('notes'),
+            )
+        except SlotUnavailableError as e:
+            logger.warning(f"🔴 [VIEW] Slot alınamadı - ID: {time_slot_id}, Hata: {e}")
+            raise ValidationError({"detail": str(e)})
+        serializer.instance = appointment
 
-        # Randevuyu yarat, 'patient'ı giriş yapan kullanıcıya,
-        # 'time_slot'u ise bulduğumuz slota ata.
-        print(f"🔄 [VIEW] Randevu oluşturuluyor - User: {user.email}, Slot: {slot.id}")
-        print(f"🔄 [VIEW] serializer.save() çağrılmadan önce...")
-        appointment = serializer.save(patient=user, time_slot=slot, status='pending_payment') # Randevuyu kaydet, status'u açıkça set et
         print(f"✅ [VIEW] Randevu oluşturuldu - ID: {appointment.id}")
-        print(f"✅ [VIEW] Appointment.patient: {appointment.patient.email}")
-        print(f"✅ [VIEW] Appointment.time_slot: {appointment.time_slot.id}")
-        print(f"✅ [VIEW] Signal tetiklenmeli... (post_save signal)")
         print(f"✅ [VIEW] perform_create() tamamlandı, response dönecek...")
 
+    @action(detail=False, methods=['post'], url_path='bulk-cancel', permission_classes=[IsAuthenticated, IsAdminUser])
+    def bulk_cancel(self, request):
+        """
+        Toplu iptal - Sadece admin (psikolog)
+        POST /api/v1/appointments/bulk-cancel/
+        Body: {"ids": [1, 2, 3]} veya {"date_from": ISO, "date_to": ISO (hariç), "psychologist": id (varsayılan: kendisi)}
+        Randevular, slotlar ve ödemeler tek transaction'da toplu UPDATE ile iptal edilir,
+        email'ler commit'ten sonra tek partide gönderilir. Sadece seansı henüz başlamamış
+        randevular iptal edilir; geçmiş ve zaten iptal edilmiş randevular 'skipped' içinde döner.
+        """
+        serializer = BulkCancelSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if 'ids' in data:
+            queryset = Appointment.objects.filter(id__in=data['ids'])
+        else:
+            queryset = Appointment.objects.filter(
+                time_slot__psychologist_id=data.get('psychologist', request.user.id),
+                time_slot__start_time__gte=data['date_from'],
+                time_slot__start_time__lt=data['date_to'],
+            )
+        cancelled_ids, skipped_ids = cancel_upcoming_appointments(queryset, cancelled_by_admin=True)
+        logger.info(f"🟠 [VIEW] Toplu iptal - {len(cancelled_ids)} randevu iptal edildi, {len(skipped_ids)} atlandi - User: {request.user.email}")
+        return Response({'cancelled': len(cancelled_ids), 'ids': cancelled_ids, 'skipped': skipped_ids})
+
+    @action(detail=True, methods=['post'], url_path='cancel')
+    def cancel(self, request, pk=None):
+        """
+        Randevu iptali (durum geçişi): POST /api/v1/appointments/<id>/cancel/
+        Randevu silinmez; durumu 'cancelled' olur, slot (seans henüz başlamadıysa) tekrar
+        müsait olur, tamamlanmamış ödeme iptal edilir. Ödeme ve randevu geçmişi raporlama için saklanır.
+        """
+        appointment = self.get_object()
+        if appointment.status == 'cancelled':
+            raise ValidationError({"detail": "Bu randevu zaten iptal edilmiş."})
+        self._cancel(appointment)
+        appointment.refresh_from_db(fields=['status'])
+        logger.info(f"🟠 [VIEW] Randevu iptal edildi - ID: {appointment.id}, User: {request.user.email}")
+        return Response(self.get_serializer(appointment).data)
+
+    @action(detail=True, methods=['post'], url_path='reschedule')
+    def reschedule(self, request, pk=None):
+        """
+        Randevuyu başka bir slota taşır: POST /api/v1/appointments/<id>/reschedule/
+        Body: {"time_slot_id": 12} veya (sanal motor) {"psychologist_id", "start_time", "end_time"}
+        Tek transaction'da: yeni slot koşullu UPDATE ile alınır, randevunun slotu, seans süresi ve
+        (ödenmemişse) fiyatı aynı koşullu UPDATE ile değiştirilir, bekleyen ödemenin tutarı güncellenir,
+        eski slot (seansı henüz başlamadıysa) serbest bırakılır. Ödenmiş randevu sadece aynı süreli
+        bir slota taşınabilir (ödenen tutar değişmez). İptal/oluşturma email'leri yerine tek bir
+        "randevu taşındı" bildirimi gönderilir.
+        """
+        appointment = self.get_object()
+        serializer = RescheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        now = timezone.now()
+        old_slot = appointment.time_slot
+        if appointment.status == 'cancelled':
+            raise ValidationError({"detail": "İptal edilmiş randevu taşınamaz."})
+        if old_slot.start_time <= now:
+            raise ValidationError({"detail": "Başlamış veya geçmiş randevu taşınamaz."})
+        if data.get('time_slot_id') == old_slot.id:
+            raise ValidationError({"detail": "Randevu zaten bu slotta."})
+
+        try:
+            with transaction.atomic():
+                try:
+                    if data.get('time_slot_id') is None:
+                        new_slot = materialize_virtual_slot(data['psychologist_id'], data['start_time'], data['end_time'])
+                    else:
+                        new_slot = claim_slot(data['time_slot_id'])
+                except SlotUnavailableError as e:
+                    raise ValidationError({"detail": str(e)})
+
+                appointment.time_slot = new_slot
+                # Yeni seans için hatırlatma tekrar gönderilir
+                appointment.reminder_sent_at = None
+                changes = {'time_slot': new_slot, 'reminder_sent_at': None}
+                if appointment.status == 'pending_payment':
+                    # Ödeme son tarihi, süre ve fiyat yeni seansa göre yeniden hesaplanır
+                    appointment.hold_expires_at = changes['hold_expires_at'] = appointment.get_hold_expires_at()
+                    appointment.duration_minutes = changes['duration_minutes'] = appointment.get_duration_minutes()
+                    appointment.price = changes['price'] = calculate_session_price(
+                        appointment.duration_minutes, AppointmentPrice.get_hourly_rate()
+                    )
+                elif new_slot.end_time - new_slot.start_time != old_slot.end_time - old_slot.start_time:
+                    raise ValidationError({"detail": "Ödenmiş randevu sadece aynı süreli bir slota taşınabilir."})
+
+                # Randevu bu arada iptal edildiyse/taşındıysa/ödendiyse hiçbir satır güncellenmez ve işlem geri alınır
+                moved = (
+                    Appointment.objects
+                    .filter(pk=appointment.pk, time_slot_id=old_slot.id, status=appointment.status)
+                    .update(**changes)
+                )
+                if not moved:
+                    raise ValidationError({"detail": "Randevu bu sırada değiştirildi, lütfen tekrar deneyin."})
+                if 'price' in changes:
+                    from payments.models import Payment
+                    # Bekleyen ödeme yeni fiyatla alınır (reprice_pending_appointments ile aynı durumlar)
+                    repriced = Payment.objects.filter(appointment_id=appointment.pk, status__in=['pending', 'failed']).update(
+                        amount=appointment.price, updated_at=now
+                    )
+                    payment = getattr(appointment, 'payment', None)
+                    if repriced and payment is not None:
+                        payment.amount = appointment.price
+
+                if AvailableTimeSlot.objects.filter(id=old_slot.id, start_time__gt=now).update(is_booked=False):
+                    slots_changed(old_slot.psychologist_id, [old_slot])
+                # Toplu UPDATE'ler signal tetiklemez: slot sürümünü (ETag) elle artır
+                transaction.on_commit(lambda: bump_version(SLOTS_RESOURCE))
+                schedule_notification(lambda: send_appointment_rescheduled_email(
+                    appointment, old_slot.start_time, rescheduled_by_admin=request.user.is_staff
+                ))
+        except IntegrityError:
+            raise ValidationError({"detail": "Bu zaman slotu zaten dolu. Lütfen başka bir slot seçin."})
+
+        logger.info(f"🔄 [VIEW] Randevu taşındı - ID: {appointment.id}, Slot: {old_slot.id} -> {new_slot.id}")
+        return Response(self.get_serializer(appointment).data)
+
+    def _cancel(self, appointment):
+        cancelled_ids = cancel_appointments(
+            Appointment.objects.filter(pk=appointment.pk), cancelled_by_admin=self.request.user.is_staff
+        )
+        if not cancelled_ids:
+            # Eşzamanlı başka bir istek randevuyu az önce iptal etti
+            raise ValidationError({"detail": "Bu randevu zaten iptal edilmiş."})
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        DELETE:
+        - Hasta: Randevu silinmez, iptal edilir (bkz. cancel)
+        - Admin: Randevu (ve ödeme kaydı) kalıcı olarak silinir
+        """
+        if request.user.is_staff:
+            return super().destroy(request, *args, **kwargs)
+        appointment = self.get_object()
+        if appointment.status != 'cancelled':
+            self._cancel(appointment)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     def perform_destroy(self, instance):
         """
-        Randevu silindiğinde (DELETE) slot'un is_booked durumunu False yap.
+        Randevu silindiğinde (DELETE, sadece admin) slot'un is_booked durumunu False yap.
         Böylece slot tekrar müsait hale gelir ve diğer hastalar tarafından görülebilir.
+        İptal edilmiş randevunun slotu zaten serbest bırakılmıştır (başka bir hasta almış olabilir), dokunulmaz.
         """
         # Admin tarafından iptal edildiğini signal'a bildirmek için
         instance._cancelled_by_admin = self.request.user.is_staff
@@ -272,7 +605,9 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             # Randevu ile ilişkili slotu al - eğer slot yoksa veya bozuk ilişki varsa hata verme
             slot = instance.time_slot
             
-            if slot:
+            if instance.status == 'cancelled':
+                logger.info(f"Randevu {instance.id} zaten iptal edilmiş, slot durumu değiştirilmedi.")
+            elif slot:
                 # Slot'un başlangıç zamanını kontrol et - eğer randevu tarihi geçmişse slot'u güncelleme
                 from datetime import datetime, timezone
                 now = datetime.now(timezone.utc)
@@ -303,24 +638,21 @@ class AppointmentPriceViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsAdminUser]
     
     def get_queryset(self):
-        # Singleton: Sadece bir tane fiyat ayari var
-        price_setting = AppointmentPrice.objects.first()
-        if price_setting:
-            return AppointmentPrice.objects.filter(id=price_setting.id)
-        # Yoksa default deger ile olustur
-        default_price = AppointmentPrice.objects.create(hourly_rate=Decimal('500.00'))
-        return AppointmentPrice.objects.filter(id=default_price.id)
+        # Singleton: Sadece bir tane fiyat ayari var (migration ile olusturulur)
+        return AppointmentPrice.objects.order_by('id')[:1]
     
+    @versioned_condition(PRICE_RESOURCE)
     def list(self, request, *args, **kwargs):
         """
         List yerine tek kayit dondur (singleton)
         """
-        queryset = self.get_queryset()
-        if queryset.exists():
-            serializer = self.get_serializer(queryset.first())
+        instance = self.get_queryset().first()
+        if instance:
+            serializer = self.get_serializer(instance)
             return Response([serializer.data])
         return Response([])
     
+    @versioned_condition(PRICE_RESOURCE)
     def retrieve(self, request, *args, **kwargs):
         """
         ID olmadan da erisilebilir - her zaman tek kayit
@@ -353,4 +685,43 @@ class AppointmentPriceViewSet(viewsets.ModelViewSet):
         """
         Fiyat ayari guncellenirken
         """
-        serializer.save(updated_by=self.request.user)
\ No newline at end of file
+        serializer.save(updated_by=self.request.user)
+
+
+@csrf_exempt  # SendGrid istekleri CSRF token taşımaz; güvenlik imza doğrulaması ile sağlanır
+@require_http_methods(["POST"])
+def sendgrid_event_webhook(request):
+    """
+    SendGrid Event Webhook endpoint'i (Normal Django view - DRF authentication'ından bağımsız)
+    POST /email/events/sendgrid/
+    Body: SendGrid olay dizisi (tek istekte binlerce olay olabilir)
+    Header: X-Twilio-Email-Event-Webhook-Signature / -Timestamp (Signed Event Webhook)
+    Olaylar tek bulk_create ile kaydedilir (bkz. appointments/email_events.py)
+    """
+    max_bytes = getattr(settings, 'SENDGRID_EVENT_WEBHOOK_MAX_BYTES', 10 * 1024 * 1024)
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > max_bytes:
+        return JsonResponse({'error': 'Istek cok buyuk'}, status=413)
+    # request.body DATA_UPLOAD_MAX_MEMORY_SIZE (2.5 MB) sınırına takılır; olay partileri daha büyük olabilir
+    payload = request.read(max_bytes + 1)
+    if len(payload) > max_bytes:
+        return JsonResponse({'error': 'Istek cok buyuk'}, status=413)
+
+    signature = request.headers.get(SIGNATURE_HEADER)
+    timestamp = request.headers.get(TIMESTAMP_HEADER)
+    if not verify_signature(payload, signature, timestamp):
+        logger.warning("⚠️ [WEBHOOK] SendGrid event webhook imzasi gecersiz")
+        return JsonResponse({'error': 'Gecersiz imza'}, status=403)
+
+    try:
+        events = json.loads(payload)
+    except ValueError:
+        return JsonResponse({'error': 'Gecersiz JSON'}, status=400)
+    if not isinstance(events, list):
+        return JsonResponse({'error': 'Olay dizisi bekleniyor'}, status=400)
+
+    received, stored = ingest_events(events)
+    return JsonResponse({'received': received, 'stored': stored})
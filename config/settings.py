@@ -195,6 +195,53 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 USE_X_FORWARDED_HOST = True
 
+# Cache
+# REDIS_URL tanımlıysa tüm gunicorn worker'ları aynı cache'i paylaşır (redis paketi gerekir).
+# Tanımlı değilse süreç içi LocMemCache kullanılır; bu durumda ETag/304 cevapları kapalıdır
+# (bkz. appointments/conditional.py).
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Saatlik ücretin süreç içinde önbellekte tutulma süresi (saniye)
+# Süre dolduğunda paylaşılan sürüm sayacı kontrol edilir; LocMemCache'te (REDIS_URL yok) değer
+# veritabanından tekrar okunur (bkz. appointments/pricing.py)
+HOURLY_RATE_CACHE_TTL = int(os.environ.get('HOURLY_RATE_CACHE_TTL', '60'))
+
+# Slot motoru:
+# - 'materialized': Her müsait zaman AvailableTimeSlot satırı olarak saklanır (varsayılan)
+# - 'virtual': Müsaitlik ScheduleRule'lardan anlık hesaplanır, satır sadece randevu alınırken oluşturulur
+SLOT_ENGINE = os.environ.get('SLOT_ENGINE', 'materialized')
+# 'virtual' modda listelenecek gün sayısı (bugünden itibaren)
+VIRTUAL_SLOT_HORIZON_DAYS = int(os.environ.get('VIRTUAL_SLOT_HORIZON_DAYS', '30'))
+# Takvim müsaitlik bitmap'inde gün sınırlarının hesaplandığı zaman dilimi (?tz ile değiştirilebilir)
+AVAILABILITY_TIME_ZONE = os.environ.get('AVAILABILITY_TIME_ZONE', 'Europe/Istanbul')
+
+# Ödeme bekletmesi (hold): ödenmeyen randevunun slotu seanstan bu kadar saat önce serbest bırakılır
+PAYMENT_DEADLINE_HOURS = int(os.environ.get('PAYMENT_DEADLINE_HOURS', '24'))
+# Seansa az kalmış randevularda hastaya verilen en kısa ödeme süresi (dakika)
+PAYMENT_HOLD_MIN_MINUTES = int(os.environ.get('PAYMENT_HOLD_MIN_MINUTES', '30'))
+# iyzico formu açık (processing) ödemeler bu süre boyunca serbest bırakılmaz (dakika)
+PAYMENT_PROCESSING_GRACE_MINUTES = int(os.environ.get('PAYMENT_PROCESSING_GRACE_MINUTES', '30'))
+
+# Hatırlatma email'i seanstan kaç saat önce gönderilir (bkz. send_reminders komutu)
+REMINDER_LEAD_HOURS = int(os.environ.get('REMINDER_LEAD_HOURS', '24'))
+
+# True: randevu post_save signal'i ödeme kaydını oluşturur ve email gönderir (eski davranış).
+# False (varsayılan): bu işler BookingService'te açıkça yapılır (bkz. appointments/booking_service.py)
+BOOKING_SIGNAL_SIDE_EFFECTS = os.environ.get('BOOKING_SIGNAL_SIDE_EFFECTS', 'False') == 'True'
+
 # DRF Pagination (ileride eklenecek). Şimdilik kapalı, frontend dizi bekliyor.
 
 # Email Configuration - SendGrid
@@ -208,6 +255,34 @@ SERVER_EMAIL = DEFAULT_FROM_EMAIL
 
 # Email backend - SendGrid için custom backend kullanıyoruz
 EMAIL_BACKEND = 'appointments.email_backend.SendGridBackend'
+# SendGrid API adresi (yük testi için yerel bir test sunucusuna yönlendirilebilir)
+SENDGRID_API_HOST = os.environ.get('SENDGRID_API_HOST', 'https://api.sendgrid.com')
+# Signed Event Webhook doğrulama anahtarı (SendGrid > Mail Settings > Event Webhook > Verification Key)
+# Tanımlı değilse /email/events/sendgrid/ istekleri reddedilir
+SENDGRID_EVENT_WEBHOOK_PUBLIC_KEY = os.environ.get('SENDGRID_EVENT_WEBHOOK_PUBLIC_KEY', '')
+# Event webhook isteği için en büyük gövde (byte); olay partileri DATA_UPLOAD_MAX_MEMORY_SIZE'dan büyük olabilir
+SENDGRID_EVENT_WEBHOOK_MAX_BYTES = int(os.environ.get('SENDGRID_EVENT_WEBHOOK_MAX_BYTES', str(10 * 1024 * 1024)))
+
+# Email gönderim modu (bkz. appointments/email_service.deliver_messages):
+# 'thread': web worker'ında sınırlı thread havuzu ile (varsayılan, bkz. appointments/email_executor.py)
+# 'outbox': EmailOutbox tablosuna yazılır, 'send_outbox_emails' komutu ayrı süreçte gönderir
+EMAIL_DELIVERY = os.environ.get('EMAIL_DELIVERY', 'thread')
+# Outbox worker: en fazla deneme, üstel bekleme tabanı (saniye), satır kiralama süresi (saniye)
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', '8'))
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get('EMAIL_OUTBOX_RETRY_BASE_SECONDS', '30'))
+EMAIL_OUTBOX_LEASE_SECONDS = int(os.environ.get('EMAIL_OUTBOX_LEASE_SECONDS', '300'))
+# 'thread' modu: havuzdaki thread sayısı, kuyrukta bekleyebilecek iş sayısı,
+# kuyruk doluyken davranış ('drop': logla ve at; 'spill': outbox tablosuna yaz - sadece
+# send_outbox_emails komutu da çalışıyorsa, aksi halde satırları gönderen olmaz),
+# SIGTERM/kapanışta kuyruğun boşaltılması için beklenecek en fazla süre (saniye)
+EMAIL_EXECUTOR_MAX_WORKERS = int(os.environ.get('EMAIL_EXECUTOR_MAX_WORKERS', '4'))
+EMAIL_EXECUTOR_MAX_QUEUE = int(os.environ.get('EMAIL_EXECUTOR_MAX_QUEUE', '200'))
+EMAIL_EXECUTOR_OVERFLOW = os.environ.get('EMAIL_EXECUTOR_OVERFLOW', 'drop')
+EMAIL_EXECUTOR_DRAIN_SECONDS = float(os.environ.get('EMAIL_EXECUTOR_DRAIN_SECONDS', '10'))
+
+# Özet modundaki psikologlara (CustomUser.email_digest) biriken bildirimlerin gönderilme aralığı (dakika)
+# (bkz. send_psychologist_digests komutu)
+PSYCHOLOGIST_DIGEST_MINUTES = int(os.environ.get('PSYCHOLOGIST_DIGEST_MINUTES', '60'))
 
 # iYZICO Configuration
 IYZICO_API_KEY = os.environ.get('IYZICO_API_KEY', '')
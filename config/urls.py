@@ -25,6 +25,7 @@ from rest_framework_simplejwt.views import ( # JWT ile ilgili view'ları import
 
 # iyzico callback endpoint'ini doğrudan import et (DRF router'ından bağımsız)
 from payments.views import payment_callback
+from appointments.views import sendgrid_event_webhook
 
 def health(_request):
     return JsonResponse({"status": "ok"})
@@ -42,6 +43,9 @@ urlpatterns = [
     # Bu endpoint iyzico'dan geldiği için authentication gerektirmez
     # Farklı bir URL path kullanarak DRF authentication middleware'inden kaçınıyoruz
     path('payments/callback/', payment_callback, name='payment-callback-public'),
+
+    # SendGrid event webhook (bounce/drop vb.) - public, imza ile doğrulanır
+    path('email/events/sendgrid/', sendgrid_event_webhook, name='sendgrid-event-webhook'),
     
     # /api/v1/ ile başlayan tüm istekleri users.urls'e yönlendir. (Kullanıcı CRUD işlemleri için)
     
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Beklemede'), ('processing', 'Isleniyor'), ('completed', 'Tamamlandi'), ('failed', 'Basarisiz'), ('cancelled', 'Iptal Edildi'), ('refunded', 'Iade Edildi'), ('refund_required', 'Iade Gerekli')], default='pending', max_length=20),
+        ),
+    ]
@@ -14,6 +14,8 @@ class Payment(models.Model):
         ('failed', 'Basarisiz'),
         ('cancelled', 'Iptal Edildi'),
         ('refunded', 'Iade Edildi'),
+        # Odeme alindi ama randevu onaylanamadi (slot baskasina verildi): iade / manuel inceleme
+        ('refund_required', 'Iade Gerekli'),
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -1,3 +1,73 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
\ No newline at end of file
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from appointments.booking_service import BookingService
+from appointments.cancellation_service import release_expired_holds
+from appointments.models import Appointment, AvailableTimeSlot
+from appointments.testing import AppointmentTestCase
+from .models import Payment
+
+
+@override_settings(SENDGRID_API_KEY='')
+class LatePaymentTests(AppointmentTestCase):
+    """
+    Ödeme süresi dolup randevu iptal edildikten sonra gelen başarılı ödeme:
+    slot hâlâ boşsa tekrar alınır, başkasına verildiyse ödeme iade için işaretlenir.
+    """
+
+    def setUp(self):
+        self.slot = self.create_slot(timezone.now() + timedelta(days=2))
+        self.appointment = BookingService(self.patient).book(time_slot_id=self.slot.id)
+        self.payment = self.appointment.payment
+        Payment.objects.filter(id=self.payment.id).update(iyzico_conversation_id='conv-1', status='processing')
+        # Ödeme süresi doldu ve sweeper randevuyu iptal etti
+        Appointment.objects.filter(id=self.appointment.id).update(hold_expires_at=timezone.now() - timedelta(hours=2))
+        Payment.objects.filter(id=self.payment.id).update(updated_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(release_expired_holds(), 1)
+
+    def _callback(self):
+        result = {'status': 'success', 'conversation_id': 'conv-1', 'payment_id': 'iyz-1'}
+        with mock.patch('payments.views.IyzicoService.retrieve_payment', return_value=result):
+            return self.client.post('/payments/callback/', {'token': 'tok'})
+
+    def test_late_callback_reclaims_free_slot(self):
+        response = self._callback()
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('payment_success=true', response['Location'])
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'paid')
+        self.assertTrue(AvailableTimeSlot.objects.get(id=self.slot.id).is_booked)
+        self.assertEqual(Payment.objects.get(id=self.payment.id).status, 'completed')
+
+        # Tekrar gelen callback hiçbir şeyi değiştirmez
+        self.assertIn('payment_success=true', self._callback()['Location'])
+        self.assertEqual(Appointment.objects.filter(status='paid').count(), 1)
+
+    def test_late_callback_for_taken_slot_requires_refund(self):
+        other = self.create_patient('diger@example.com', first_name='Diger')
+        other_appointment = BookingService(other).book(time_slot_id=self.slot.id)
+
+        response = self._callback()
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('status=refund_required', response['Location'])
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'cancelled')
+        payment = Payment.objects.get(id=self.payment.id)
+        self.assertEqual(payment.status, 'refund_required')
+        self.assertEqual(payment.iyzico_payment_id, 'iyz-1')
+        self.assertEqual(Appointment.objects.get(id=other_appointment.id).status, 'pending_payment')
+
+    def test_late_verify_for_taken_slot_returns_conflict(self):
+        BookingService(self.create_patient('diger@example.com')).book(time_slot_id=self.slot.id)
+        client = APIClient()
+        client.force_authenticate(self.patient)
+        result = {'status': 'success', 'payment_id': 'iyz-1'}
+        with mock.patch('payments.views.IyzicoService.retrieve_payment', return_value=result):
+            response = client.post(f'/api/v1/payments/{self.payment.id}/verify/', {'token': 'tok'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['status'], 'refund_required')
+        self.assertEqual(Appointment.objects.get(id=self.appointment.id).status, 'cancelled')
@@ -7,6 +7,7 @@ from django.shortcuts import get_object_or_404, redirect
 from django.http import HttpResponseRedirect, JsonResponse
 from django.utils import timezone
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import uuid
@@ -16,10 +17,78 @@ import json
 from .models import Payment
 from .serializers import PaymentSerializer, PaymentInitSerializer
 from .iyzico_service import IyzicoService
+from appointments.availability import SlotUnavailableError
+from appointments.booking_service import claim_slot
 from appointments.models import Appointment
+from appointments.email_service import schedule_notification, send_payment_completed_email
 
 logger = logging.getLogger(__name__)
 
+# Gec gelen odemede randevu onaylanamadiginda hastaya gosterilen mesaj
+REFUND_REQUIRED_MESSAGE = 'Odeme alindi ancak randevu onaylanamadi (odeme suresi doldu ve slot baskasina verildi). Odeme iade edilecek.'
+
+
+def complete_payment(payment_id, iyzico_payment_id, payment_method):
+    """
+    iyzico'nun basarili dedigi odemeyi kaydeder; verify ve callback ayni yolu kullanir.
+    Odeme ve randevu satirlari kilitlenir (select_for_update), boylece release_expired_holds
+    ile yarisilmaz. Odeme suresi dolup randevu iptal edildiyse slot claim_slot ile tekrar alinir;
+    slot bu arada baskasina verildiyse (veya seans basladiysa) randevu 'paid' yapilmaz, odeme
+    'refund_required' olarak iade/manuel inceleme icin isaretlenir.
+    (payment, sonuc) dondurur; sonuc: 'paid', 'already_paid' veya 'refund_required'.
+    """
+    appointment_id = Payment.objects.values_list('appointment_id', flat=True).get(pk=payment_id)
+    with transaction.atomic():
+        # Kilit sirasi sweeper ile ayni: once randevu, sonra odeme (deadlock olmaz)
+        appointment = Appointment.objects.select_for_update().select_related('time_slot').get(pk=appointment_id)
+        payment = Payment.objects.select_for_update().get(pk=payment_id)
+        if payment.status in ('completed', 'refund_required'):
+            # Ayni odeme icin tekrar gelen callback/verify: tekrar yazilmaz, email tekrar gitmez
+            return payment, 'already_paid' if payment.status == 'completed' else 'refund_required'
+
+        payment.iyzico_payment_id = iyzico_payment_id
+        payment.payment_method = payment_method
+        payment.paid_at = timezone.now()
+
+        confirmed = True
+        if appointment.status == 'cancelled':
+            # Sadece suresi dolan bekletme geri alinir; hasta/admin iptali geri alinmaz
+            hold_expired = appointment.hold_expires_at is not None and appointment.hold_expires_at <= payment.paid_at
+            confirmed = hold_expired and appointment.time_slot.start_time > payment.paid_at
+            if confirmed:
+                try:
+                    with transaction.atomic():
+                        claim_slot(appointment.time_slot_id)
+                        appointment.status = 'paid'
+                        appointment.save()
+                except (SlotUnavailableError, IntegrityError):
+                    confirmed = False
+        else:
+            appointment.status = 'paid'
+            appointment.save()
+
+        if not confirmed:
+            payment.status = 'refund_required'
+            payment.error_message = REFUND_REQUIRED_MESSAGE
+            payment.save()
+            logger.warning(
+                f"⚠️ Gec gelen odeme randevuya baglanamadi, iade gerekli - Payment ID: {payment.id}, "
+                f"Appointment ID: {appointment.id}"
+            )
+            return payment, 'refund_required'
+
+        payment.status = 'completed'
+        payment.save()
+        payment.appointment = appointment
+        # Ödeme tamamlandı email'i gönder (commit'ten sonra)
+        try:
+            schedule_notification(lambda: send_payment_completed_email(payment))
+            logger.info(f"Ödeme tamamlanma email'i planlandi - Payment ID: {payment.id}")
+        except Exception as e:
+            logger.error(f"Ödeme tamamlanma email'i gönderilirken hata: {str(e)}", exc_info=True)
+            # Email hatası ödeme işlemini engellememeli
+    return payment, 'paid'
+
 
 class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -60,9 +129,19 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
         try:
             appointment = Appointment.objects.get(id=appointment_id)
             
+            # Odeme suresi dolan (veya iptal edilen) randevunun slotu serbest birakilmis olabilir
+            if appointment.status == 'cancelled':
+                return Response(
+                    {'error': 'Bu randevu iptal edilmis veya odeme suresi dolmus.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
             # Amount hesapla: Eger gonderilmediyse randevu suresine gore hesapla
             if requested_amount:
                 amount = requested_amount
+            elif appointment.price is not None:
+                # Randevu alinirken kaydedilen fiyat
+                amount = appointment.price
             else:
                 amount = appointment.calculate_price()
             
@@ -255,26 +334,19 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
                 )
             
             if result_status == 'success':
-                # Odeme basarili
-                payment.status = 'completed'
-                payment.iyzico_payment_id = result.get('payment_id')
-                payment.payment_method = result.get('payment_method', 'card')
-                payment.paid_at = timezone.now()
-                payment.save()
-                
-                # Randevu status'unu 'paid' olarak guncelle
-                appointment = payment.appointment
-                appointment.status = 'paid'
-                appointment.save()
-                
-                # Ödeme tamamlandı email'i gönder
-                try:
-                    from appointments.email_service import send_payment_completed_email
-                    send_payment_completed_email(payment)
-                    logger.info(f"Ödeme tamamlanma email'i gönderildi (verify) - Payment ID: {payment.id}")
-                except Exception as e:
-                    logger.error(f"Ödeme tamamlanma email'i gönderilirken hata (verify): {str(e)}", exc_info=True)
-                    # Email hatası ödeme işlemini engellememeli
+                # Odeme, randevu durumu ve (outbox modunda) email kuyrugu tek transaction'da yazilir
+                payment, outcome = complete_payment(
+                    payment.pk, result.get('payment_id'), result.get('payment_method', 'card')
+                )
+                if outcome == 'refund_required':
+                    return Response(
+                        {
+                            'status': 'refund_required',
+                            'error': REFUND_REQUIRED_MESSAGE,
+                            'payment': PaymentSerializer(payment).data
+                        },
+                        status=status.HTTP_409_CONFLICT
+                    )
                 
                 return Response({
                     'status': 'success',
@@ -412,28 +484,13 @@ def payment_callback(request):
             try:
                 logger.info(f"Payment bulundu - ID: {payment.id}, Appointment ID: {payment.appointment.id}")
                 
-                # Odeme basarili
-                payment.status = 'completed'
-                payment.iyzico_payment_id = result.get('payment_id')
-                payment.payment_method = 'card'
-                payment.paid_at = timezone.now()
-                payment.save()
-                logger.info(f"Payment guncellendi - Status: {payment.status}")
-                
-                # Randevu status'unu 'paid' olarak guncelle
-                appointment = payment.appointment
-                appointment.status = 'paid'
-                appointment.save()
-                logger.info(f"Appointment status guncellendi - ID: {appointment.id}, Status: {appointment.status}")
-                
-                # Ödeme tamamlandı email'i gönder
-                try:
-                    from appointments.email_service import send_payment_completed_email
-                    send_payment_completed_email(payment)
-                    logger.info(f"Ödeme tamamlanma email'i gönderildi - Payment ID: {payment.id}")
-                except Exception as e:
-                    logger.error(f"Ödeme tamamlanma email'i gönderilirken hata: {str(e)}", exc_info=True)
-                    # Email hatası ödeme işlemini engellememeli
+                # Odeme, randevu durumu ve (outbox modunda) email kuyrugu tek transaction'da yazilir
+                payment, outcome = complete_payment(payment.pk, result.get('payment_id'), 'card')
+                logger.info(f"Payment guncellendi - Status: {payment.status}, Sonuc: {outcome}")
+                if outcome == 'refund_required':
+                    frontend_url = settings.FRONTEND_URL if hasattr(settings, 'FRONTEND_URL') else 'http://localhost:5173'
+                    redirect_url = f"{frontend_url}/payment/callback?token={token}&status=refund_required&error={REFUND_REQUIRED_MESSAGE}"
+                    return HttpResponseRedirect(redirect_url)
                 
                 # Basarili sayfasina redirect yap (payment/callback yerine patient-panel'e success parametresi ile)
                 frontend_url = settings.FRONTEND_URL if hasattr(settings, 'FRONTEND_URL') else 'http://localhost:5173'
@@ -68,6 +68,10 @@ class CustomUser(AbstractUser):
     # Roller
     is_patient = models.BooleanField(default=True)  # Hasta rolü
 
+    # Psikolog bildirimleri: True ise randevu/iptal/ödeme email'leri tek tek gönderilmez,
+    # periyodik özet email'inde toplanır (bkz. appointments/digest.py)
+    email_digest = models.BooleanField(default=False, verbose_name='Özet Email')
+
     objects = CustomUserManager()
 
     USERNAME_FIELD = 'email' # Giriş için email kullanılır